@@ -11,12 +11,15 @@ then
   echo "PostgreSQL:transportation started."
 fi
 
-PGPASSWORD=$DB_PASS psql -h $DB_HOST -U $DB_USER -tc "SELECT 1 FROM pg_database WHERE datname = '$DB_NAME'" | grep -q 1 | psql -h $DB_HOST -U $DB_USER -c "CREATE DATABASE $DB_NAME"
+export PGPASSWORD=$DB_PASS
+psql -h $DB_HOST -U $DB_USER -tc "SELECT 1 FROM pg_database WHERE datname = '$DB_NAME'" | grep -q 1 || psql -h $DB_HOST -U $DB_USER -c "CREATE DATABASE $DB_NAME"
 
-
-python manage.py migrate
-python manage.py loaddata initial
-python manage.py createsuperuser --no-input
-python manage.py collectstatic --no-input --clear
+# Applies pending migrations and collects changed static files, skipping
+# either when there is nothing to do. One-time setup (initial data and the
+# superuser) lives in `manage.py initialize`, run by the init service.
+if [ "$TP_SKIP_STARTUP" != "true" ]
+then
+  python manage.py startup
+fi
 
 exec "$@"
@@ -0,0 +1,18 @@
+#!/bin/bash
+
+# TP_SERVER selects how the application is served:
+#   gunicorn  - production server configured by server/gunicorn.conf.py (default)
+#   runserver - Django development server
+
+if [ "${TP_SERVER:-gunicorn}" = "runserver" ]
+then
+  exec python manage.py runserver 0.0.0.0:8000
+fi
+
+# Workers write their request metrics here so /metrics can report every worker,
+# cleared so totals from a previous run are not reported again.
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/tp-metrics}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+exec gunicorn server.wsgi:application --config server/gunicorn.conf.py
@@ -0,0 +1,63 @@
+"""
+Smoke benchmark for a running Transportation Portal server.
+
+Hammers a URL from several threads for a fixed duration and reports
+requests/sec and latency percentiles, e.g. to compare runserver & gunicorn:
+
+    python server/benchmark.py http://localhost:8000/sign-in/ --concurrency 8 --duration 10
+"""
+
+import argparse
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def worker(url, deadline, latencies, errors, lock):
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            with urllib.request.urlopen(url) as response:
+                response.read()
+        except (urllib.error.URLError, ConnectionError):
+            with lock:
+                errors.append(1)
+            continue
+        elapsed = time.monotonic() - started
+        with lock:
+            latencies.append(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('url')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(args.url, deadline, latencies, errors, lock))
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if not latencies:
+        print(f'No successful requests ({len(errors)} errors)')
+        return
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    print(f'{args.url}')
+    print(f'  requests: {len(latencies)} ({len(errors)} errors) in {args.duration:.0f}s')
+    print(f'  requests/sec: {len(latencies) / args.duration:.1f}')
+    print(f'  p50: {statistics.median(latencies) * 1000:.1f}ms  p95: {p95 * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
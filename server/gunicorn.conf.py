@@ -0,0 +1,54 @@
+"""
+Gunicorn configuration for the Transportation Portal.
+
+Used by serve.sh when TP_SERVER=gunicorn (the default). Every value can be
+overridden with a TP_GUNICORN_* environment variable.
+
+Send HUP to the master to gracefully replace workers, e.g. after a config
+change. With preload enabled code changes need a restart (or USR2 + TERM).
+"""
+
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+bind = os.environ.get('TP_GUNICORN_BIND', '0.0.0.0:8000')
+
+# Workers/threads derived from the CPU count; threads let a worker overlap
+# database waits without the memory cost of another process.
+workers = _env_int('TP_GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1)
+threads = _env_int('TP_GUNICORN_THREADS', 2)
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Import Django once in the master so workers fork with it already loaded.
+# Code reloading needs a fresh import per worker, so the two are exclusive.
+reload = os.environ.get('TP_GUNICORN_RELOAD', default='false') == 'true'
+preload_app = not reload
+
+timeout = _env_int('TP_GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('TP_GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('TP_GUNICORN_KEEPALIVE', 5)
+
+# Recycle workers periodically to bound memory growth; jitter avoids
+# restarting them all at once.
+max_requests = _env_int('TP_GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('TP_GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# Heartbeat files on tmpfs so a slow container disk can't stall workers.
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('TP_GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('TP_GUNICORN_LOG_LEVEL', 'info')
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a recycled worker; its counters stay in the totals.
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'corsheaders',
     'social_django',
     'oauth2_provider',
+    'rest_framework',
     'rest_framework_social_oauth2',
     'crispy_forms',
     'django_tables2',
@@ -52,6 +53,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Serves STATIC_ROOT, as nothing else does in front of gunicorn.
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -59,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'social_django.middleware.SocialAuthExceptionMiddleware',
+    'transportation.middleware.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'server.urls'
@@ -116,11 +120,53 @@ DATABASES = {
 
 # Cache
 # https://docs.djangoproject.com/en/3.0/ref/settings/#caches
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Set REDIS_URL to share one cache between all workers; without it (e.g. in
+# tests) each process falls back to its own local-memory cache.
+REDIS_URL = os.environ.get('REDIS_URL', default=None)
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'tp',
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                # Treat an unreachable Redis as a cache miss instead of a 500.
+                'IGNORE_EXCEPTIONS': True,
+            }
+        }
     }
-}
+    DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS = True
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds cached lookups (orgs, departments, budgets, moderators)
+# live before being reloaded; model saves & deletes invalidate them sooner.
+TP_LOOKUP_CACHE_TIMEOUT = int(os.environ.get('TP_LOOKUP_CACHE_TIMEOUT', default=3600))
+
+# Most drivers returned by the requested driver autocomplete.
+TP_AUTOCOMPLETE_LIMIT = int(os.environ.get('TP_AUTOCOMPLETE_LIMIT', default=10))
+
+# Seconds a computed report is reused for the same report & parameters.
+TP_REPORT_CACHE_TIMEOUT = int(os.environ.get('TP_REPORT_CACHE_TIMEOUT', default=900))
+
+# Seconds the daily rollups checkpoint trails each refresh, so rows from
+# transactions committing late are still picked up.
+TP_ROLLUP_LAG = int(os.environ.get('TP_ROLLUP_LAG', default=60))
+
+# Requests slower than this (milliseconds) are logged with their slowest
+# TP_SLOW_REQUEST_QUERIES queries.
+TP_SLOW_REQUEST_MS = int(os.environ.get('TP_SLOW_REQUEST_MS', default=1000))
+TP_SLOW_REQUEST_QUERIES = int(os.environ.get('TP_SLOW_REQUEST_QUERIES', default=5))
+
+# Bearer token a Prometheus scraper can use for /metrics instead of a staff
+# session. Unset disables token access.
+TP_METRICS_TOKEN = os.environ.get('TP_METRICS_TOKEN', default='')
 
 # Logging
 # https://docs.djangoproject.com/en/3.0/topics/logging/
@@ -204,6 +250,12 @@ AUTH_PASSWORD_VALIDATORS = [
 
 LANGUAGE_CODE = os.environ.get('TP_LANG', default='en-us')
 
+# The depart date indexes on trip requests (migration 0016) are built on
+# depart_est converted to this zone, which PostgreSQL fixes into the index
+# expression. After changing TP_TZ, drop triprequest_status_date_idx &
+# triprequest_depart_date_idx and create them again from
+# `manage.py sqlmigrate transportation 0016`, or date range filters on trip
+# requests stop using them.
 TIME_ZONE = os.environ.get('TP_TZ', default='UTC')
 
 TEMPUS_DOMINUS_LOCALIZE = False
@@ -245,6 +297,48 @@ EMAIL_PORT = os.environ.get('EMAIL_PORT', default=25)
 EMAIL_USE_TLS = os.environ.get('EMAIL_TLS', default='false') == 'true'
 TP_DEFAULT_FROM_EMAIL = os.environ.get('TP_FROM_EMAIL', default=EMAIL_HOST_USER)
 
+# Maximum number of IDs accepted by the print, report & bulk transition endpoints.
+TP_MAX_BATCH_SIZE = int(os.environ.get('TP_MAX_BATCH_SIZE', default=500))
+
+# Rows fetched per database round-trip when streaming CSV exports.
+TP_EXPORT_CHUNK_SIZE = int(os.environ.get('TP_EXPORT_CHUNK_SIZE', default=2000))
+
+# REST API (transportation.api), served under api/v1/.
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
+        'rest_framework_social_oauth2.authentication.SocialAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'transportation.api.permissions.IsModeratorOrReadOnly',
+    ],
+    'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.NamespaceVersioning',
+    'ALLOWED_VERSIONS': ['v1'],
+    'DEFAULT_PAGINATION_CLASS': 'transportation.api.pagination.CursorPagination',
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+}
+TP_API_PAGE_SIZE = int(os.environ.get('TP_API_PAGE_SIZE', default=100))
+TP_API_MAX_PAGE_SIZE = int(os.environ.get('TP_API_MAX_PAGE_SIZE', default=1000))
+
+# Change feeds only return rows older than the lag (seconds), and deletions
+# are remembered for the retention period (days).
+TP_CHANGE_FEED_LAG = int(os.environ.get('TP_CHANGE_FEED_LAG', default=5))
+TP_CHANGE_FEED_RETENTION_DAYS = int(os.environ.get('TP_CHANGE_FEED_RETENTION_DAYS', default=30))
+
+# Calendar feeds list trips departing up to this many days ago, and rendered
+# feeds are cached for up to the timeout (seconds).
+TP_CALENDAR_PAST_DAYS = int(os.environ.get('TP_CALENDAR_PAST_DAYS', default=30))
+TP_CALENDAR_CACHE_TIMEOUT = int(os.environ.get('TP_CALENDAR_CACHE_TIMEOUT', default=3600))
+
+# Dispatch boards are cached for up to this many seconds, or until a trip or
+# vehicle changes.
+TP_DISPATCH_CACHE_TIMEOUT = int(os.environ.get('TP_DISPATCH_CACHE_TIMEOUT', default=600))
+
+# Outbound emails are queued and delivered by `manage.py sendemails`.
+TP_EMAIL_MAX_ATTEMPTS = int(os.environ.get('TP_EMAIL_MAX_ATTEMPTS', default=5))
+TP_EMAIL_RETRY_DELAY = int(os.environ.get('TP_EMAIL_RETRY_DELAY', default=60))
+
 
 SOCIAL_AUTH_AZUREAD_OAUTH2_KEY = os.environ.get('AZUREAD_KEY', None)
 SOCIAL_AUTH_AZUREAD_OAUTH2_SECRET = os.environ.get('AZUREAD_SECRET', None)
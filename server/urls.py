@@ -11,6 +11,7 @@ from django.urls import path, include
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('rest_framework_social_oauth2.urls')),
+    path('api/v1/', include('transportation.api.urls', namespace='v1')),
     path('', include('social_django.urls', namespace='social')),
     path('', include('transportation.urls'))
 
@@ -25,3 +25,4 @@ admin.site.register(models.Vehicle)
 admin.site.register(models.VehicleActivity)
 admin.site.register(models.VehicleMaintenance)
 admin.site.register(models.Setting)
+admin.site.register(models.OutboundEmail)
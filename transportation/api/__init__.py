@@ -0,0 +1,16 @@
+"""
+Transportation REST API
+
+Versioned (api/v1/) read & write access to trip requests, drivers,
+vehicles, maintenance and the organization lookups for kiosk, reporting
+and other integrations:
+
+- ``?fields=a,b`` returns only the listed fields, and only joins the
+  relations those fields need.
+- Lists are cursor paginated, ordered by ``updated`` where the model has it
+  so ``?updated__gt=`` pulls just the changes since the last sync.
+- Responses carry an ETag; a matching If-None-Match gets a 304, for lists of
+  models with ``updated`` without serializing anything.
+- POST a list to a collection to create, or PATCH a list of objects with
+  their ``id`` to update, many objects in one transaction.
+"""
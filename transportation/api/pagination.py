@@ -0,0 +1,21 @@
+from django.conf import settings
+
+from rest_framework import pagination
+
+
+class CursorPagination(pagination.CursorPagination):
+    """Cursor pagination in the view's ``cursor_ordering``.
+
+    The same attribute transportation.pagination.CursorPaginationMixin reads
+    for the HTML tables.
+    """
+
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = settings.TP_API_PAGE_SIZE
+        self.max_page_size = settings.TP_API_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', self.ordering)
@@ -0,0 +1,19 @@
+from rest_framework import permissions
+
+
+class IsModeratorOrReadOnly(permissions.BasePermission):
+    """ Reads for any signed in user, writes for moderators. """
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        return request.method in permissions.SAFE_METHODS or user.is_moderator or user.is_superuser
+
+
+class IsModerator(permissions.BasePermission):
+    """ Moderators only, like the drivers, vehicles & maintenance pages. """
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.is_moderator or user.is_superuser))
@@ -0,0 +1,341 @@
+from itertools import chain
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import permissions, serializers
+
+from transportation import dispatch, emails, models, search, signals
+
+
+BATCH_SIZE = 500
+
+
+def requested_fields(request):
+    """ Field names in a read's ``fields`` query parameter, or None for every field. """
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return None
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def insert(model, objects):
+    """bulk_create objects, making sure they get their primary keys.
+
+    Backends that can't return the keys from a bulk insert (SQLite before
+    Django 4.0) insert the objects one at a time instead, still bypassing
+    the models' own save().
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+    for obj in objects:
+        obj.save_base(force_insert=True)
+    return objects
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """ Resolves the IDs BulkListSerializer preloaded instead of querying for each. """
+
+    preloaded = None
+
+    def to_internal_value(self, data):
+        if self.preloaded is not None:
+            try:
+                obj = self.preloaded.get(self.get_queryset().model._meta.pk.to_python(data))
+            except (DjangoValidationError, TypeError):
+                obj = None
+            if obj is not None:
+                return obj
+        return super().to_internal_value(data)
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """ Validates, creates & updates many objects with a fixed number of queries. """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.preload(data)
+        return super().to_internal_value(data)
+
+    def preload(self, data):
+        """ Load every related object data refers to, one query per relation. """
+        for name, field in self.child.fields.items():
+            if not isinstance(field, PreloadedPrimaryKeyRelatedField) or field.read_only:
+                continue
+            queryset = field.get_queryset()
+            keys = set()
+            for item in data:
+                value = item.get(name) if isinstance(item, dict) else None
+                try:
+                    if value is not None:
+                        keys.add(queryset.model._meta.pk.to_python(value))
+                except (DjangoValidationError, TypeError):
+                    pass
+            field.preloaded = queryset.in_bulk(keys) if keys else {}
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        with transaction.atomic():
+            return self.child.create_many([model(**attrs) for attrs in validated_data])
+
+    def update(self, instances, validated_data):
+        fields = set()
+        for instance, attrs in zip(instances, validated_data):
+            for name, value in attrs.items():
+                setattr(instance, name, value)
+            fields.update(attrs)
+        with transaction.atomic():
+            self.child.update_many(instances, fields)
+        return instances
+
+
+class BulkModelSerializer(serializers.ModelSerializer):
+    """Model serializer with sparse fieldsets & bulk writes.
+
+    Single & bulk writes both go through create_many() and update_many(),
+    which subclasses extend with what their model's save() would have done.
+    ``select_related`` maps fields to the relations they read, for plan().
+    """
+
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+    select_related = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - fields - {'id'}:
+                self.fields.pop(name)
+
+    @classmethod
+    def plan(cls, queryset, request):
+        """ queryset joined to the relations of the requested fields. """
+        fields = requested_fields(request)
+        related = {
+            path for name, path in cls.select_related.items() if fields is None or name in fields
+        }
+        return queryset.select_related(*related) if related else queryset
+
+    @property
+    def user(self):
+        request = self.context.get('request')
+        return request.user if request is not None else None
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            return self.create_many([self.Meta.model(**validated_data)])[0]
+
+    def update(self, instance, validated_data):
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
+        with transaction.atomic():
+            self.update_many([instance], set(validated_data))
+        return instance
+
+    def create_many(self, objects):
+        return insert(self.Meta.model, objects)
+
+    def update_many(self, objects, fields):
+        if fields:
+            self.Meta.model.objects.bulk_update(objects, fields, batch_size=BATCH_SIZE)
+
+
+class OrganizationSerializer(BulkModelSerializer):
+    class Meta:
+        model = models.Organization
+        fields = ('id', 'name')
+        list_serializer_class = BulkListSerializer
+
+
+class DepartmentSerializer(BulkModelSerializer):
+    class Meta:
+        model = models.Department
+        fields = ('num', 'org', 'name')
+        list_serializer_class = BulkListSerializer
+
+
+class BudgetSerializer(BulkModelSerializer):
+    class Meta:
+        model = models.Budget
+        fields = ('num', 'org', 'name')
+        list_serializer_class = BulkListSerializer
+
+
+class DriverSerializer(BulkModelSerializer):
+    full_name = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = models.Driver
+        fields = (
+            'id', 'status', 'first_name', 'last_name', 'full_name', 'license_num',
+            'expiration_date', 'birth_date', 'state', 'phone', 'email', 'restrictions', 'has_cdl',
+            'notes'
+        )
+        list_serializer_class = BulkListSerializer
+
+    def create_many(self, objects):
+        # As Driver.save() does.
+        for driver in objects:
+            driver.search_name = search.normalize_name(driver.full_name)
+        insert(models.Driver, objects)
+        search.invalidate_prefix_index()
+        search.invalidate_recommendations(*objects)
+        return objects
+
+    def update_many(self, objects, fields):
+        renamed = []
+        if {'first_name', 'last_name'} & fields:
+            for driver in objects:
+                search_name = search.normalize_name(driver.full_name)
+                if search_name != driver.search_name:
+                    renamed.append(driver)
+                driver.search_name = search_name
+            fields = fields | {'search_name'}
+        super().update_many(objects, fields)
+        search.invalidate_prefix_index()
+        if renamed:
+            search.invalidate_recommendations(*renamed)
+
+
+def log_vehicle_activities(vehicle_ids, activity_type, user):
+    models.VehicleActivity.objects.bulk_create(
+        (models.VehicleActivity(vehicle_id=pk, user=user, type=activity_type)
+         for pk in vehicle_ids),
+        batch_size=BATCH_SIZE)
+
+
+class VehicleSerializer(BulkModelSerializer):
+    name = serializers.CharField(source='__str__', read_only=True)
+
+    class Meta:
+        model = models.Vehicle
+        fields = (
+            'id', 'org', 'num', 'name', 'type', 'status', 'year', 'make', 'model', 'title_num',
+            'vin', 'license_plate', 'reg_expire_date', 'mileage', 'purchase_date', 'purchase_cost',
+            'storage_location', 'notes'
+        )
+        list_serializer_class = BulkListSerializer
+
+    def create_many(self, objects):
+        insert(models.Vehicle, objects)
+        log_vehicle_activities([vehicle.pk for vehicle in objects],
+                               models.VehicleActivity.TYPE_CREATED, self.user)
+        dispatch.invalidate()
+        return objects
+
+    def update_many(self, objects, fields):
+        # bulk_update leaves auto_now alone, and the change feed needs ``updated``.
+        now = timezone.now()
+        for vehicle in objects:
+            vehicle.updated = now
+        super().update_many(objects, fields | {'updated'})
+        log_vehicle_activities([vehicle.pk for vehicle in objects],
+                               models.VehicleActivity.TYPE_EDITED, self.user)
+        dispatch.invalidate()
+
+
+class VehicleMaintenanceSerializer(BulkModelSerializer):
+    class Meta:
+        model = models.VehicleMaintenance
+        fields = ('id', 'vehicle', 'date', 'category', 'cost', 'mileage', 'notes', 'updated')
+        read_only_fields = ('updated',)
+        list_serializer_class = BulkListSerializer
+
+    def raise_vehicle_mileage(self, objects):
+        # As VehicleMaintenance.save() does, one UPDATE per vehicle. ``updated``
+        # is set too, as update() leaves auto_now alone & the change feed needs it.
+        now = timezone.now()
+        highest = {}
+        for maintenance in objects:
+            highest[maintenance.vehicle_id] = max(
+                highest.get(maintenance.vehicle_id, 0), maintenance.mileage)
+        for vehicle_id, mileage in highest.items():
+            models.Vehicle.objects.filter(pk=vehicle_id, mileage__lt=mileage).update(
+                mileage=mileage, updated=now)
+
+    def create_many(self, objects):
+        insert(models.VehicleMaintenance, objects)
+        log_vehicle_activities([maintenance.vehicle_id for maintenance in objects],
+                               models.VehicleActivity.TYPE_CREATED_MAINTENANCE, self.user)
+        self.raise_vehicle_mileage(objects)
+        return objects
+
+    def update_many(self, objects, fields):
+        # bulk_update leaves auto_now alone, and the rollups need ``updated``.
+        now = timezone.now()
+        for maintenance in objects:
+            maintenance.updated = now
+        if 'date' in fields:
+            signals.mark_moved_rollup_dates(objects, signals.saved_rollup_dates(
+                models.VehicleMaintenance, [maintenance.pk for maintenance in objects]))
+        super().update_many(objects, fields | {'updated'})
+        log_vehicle_activities([maintenance.vehicle_id for maintenance in objects],
+                               models.VehicleActivity.TYPE_EDITED_MAINTENANCE, self.user)
+        self.raise_vehicle_mileage(objects)
+
+
+class TripRequestSerializer(BulkModelSerializer):
+    requestor_name = serializers.CharField(source='requestor_fullname', read_only=True)
+    driver_name = serializers.CharField(source='driver_fullname', read_only=True)
+    vehicle_name = serializers.StringRelatedField(source='vehicle', read_only=True)
+
+    select_related = {
+        'requestor_name': 'requestor',
+        'driver_name': 'driver',
+        'vehicle_name': 'vehicle',
+    }
+
+    class Meta:
+        model = models.TripRequest
+        fields = (
+            'id', 'status', 'org', 'department', 'budget', 'requestor', 'requestor_name', 'manager',
+            'contact_fn', 'contact_ln', 'contact_phone', 'contact_email', 'requested_driver',
+            'driver', 'driver_name', 'vehicle_type', 'vehicle', 'vehicle_name', 'party_count',
+            'depart_est', 'return_est', 'depart_act', 'return_act', 'destination', 'purpose',
+            'trailer', 'mileage_est', 'mileage_act', 'card_num', 'key_color', 'fuel_cost',
+            'submitted', 'updated'
+        )
+        # Statuses change through the transition endpoints.
+        read_only_fields = ('status', 'requestor', 'submitted', 'updated')
+        list_serializer_class = BulkListSerializer
+
+    def validate(self, attrs):
+        depart, returns = attrs.get('depart_est'), attrs.get('return_est')
+        if depart is not None and returns is not None and depart >= returns:
+            raise serializers.ValidationError(_('The return must be after the departure'))
+        return attrs
+
+    def create_many(self, objects):
+        for triprequest in objects:
+            triprequest.requestor = self.user
+        insert(models.TripRequest, objects)
+        models.TripRequestActivity.log_many(
+            [triprequest.pk for triprequest in objects], models.TripRequestActivity.TYPE_CREATED,
+            self.user)
+        models.OutboundEmail.objects.bulk_create(chain.from_iterable(
+            emails.TripRequestCreatedEmail(triprequest).outbound() for triprequest in objects))
+        dispatch.invalidate()
+        return objects
+
+    def update_many(self, objects, fields):
+        # bulk_update leaves auto_now alone, and the rollups need ``updated``.
+        now = timezone.now()
+        for triprequest in objects:
+            triprequest.updated = now
+        booked = [t for t in objects if t.status in models.TripRequest.BOOKED_STATUSES]
+        if 'depart_est' in fields:
+            signals.mark_moved_rollup_dates(objects, signals.saved_rollup_dates(
+                models.TripRequest, [triprequest.pk for triprequest in objects]))
+        try:
+            with models.guard_bookings(booked):
+                super().update_many(objects, fields | {'updated'})
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        models.TripRequestActivity.log_many(
+            [triprequest.pk for triprequest in objects], models.TripRequestActivity.TYPE_EDITED,
+            self.user)
+        dispatch.invalidate()
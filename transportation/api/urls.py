@@ -0,0 +1,31 @@
+from django.urls import path
+
+from rest_framework import routers
+
+from transportation.api import views
+
+
+class BulkRouter(routers.DefaultRouter):
+    """ DefaultRouter that also routes PATCH on a collection to the viewset's bulk_update. """
+
+    routes = [
+        routers.DefaultRouter.routes[0]._replace(
+            mapping={**routers.DefaultRouter.routes[0].mapping, 'patch': 'bulk_update'}),
+        *routers.DefaultRouter.routes[1:]
+    ]
+
+
+app_name = 'api'
+
+router = BulkRouter()
+router.register('requests', views.TripRequestViewSet, basename='request')
+router.register('drivers', views.DriverViewSet, basename='driver')
+router.register('vehicles', views.VehicleViewSet, basename='vehicle')
+router.register('maintenance', views.VehicleMaintenanceViewSet, basename='maintenance')
+router.register('organizations', views.OrganizationViewSet, basename='organization')
+router.register('departments', views.DepartmentViewSet, basename='department')
+router.register('budgets', views.BudgetViewSet, basename='budget')
+
+urlpatterns = router.urls + [
+    path('changes/<str:feed>/', views.ChangeFeedView.as_view(), name='changes'),
+]
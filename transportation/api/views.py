@@ -0,0 +1,217 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from transportation import changes, models
+from transportation.api import permissions, serializers
+
+
+def not_modified(request, etag):
+    """ Whether the request's If-None-Match already has etag. """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    etags = [tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(if_none_match)]
+    return '*' in etags or etag in etags
+
+
+class ConditionalMixin:
+    """ETags on reads, answering a matching If-None-Match with a 304.
+
+    Lists of models with an ``updated`` field are tagged from their count &
+    latest update, so an unchanged list is answered with one aggregate
+    query. Other responses, and lists with fields read from joined rows
+    (whose changes don't touch ``updated``), are tagged with a hash of their
+    content.
+    """
+
+    def get_list_etag(self, queryset):
+        if not any(field.name == 'updated' for field in queryset.model._meta.fields):
+            return None
+        fields = serializers.requested_fields(self.request)
+        joined = getattr(self.get_serializer_class(), 'select_related', {})
+        if joined and (fields is None or fields & set(joined)):
+            return None
+        stats = queryset.order_by().aggregate(count=Count('pk'), updated=Max('updated'))
+        key = '|'.join((
+            self.request.get_full_path(), self.request.accepted_renderer.format,
+            str(stats['count']), stats['updated'].isoformat() if stats['updated'] else ''
+        ))
+        return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag(self.filter_queryset(self.get_queryset()))
+        if etag is not None and not_modified(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = super().list(request, *args, **kwargs)
+        if etag is not None:
+            response['ETag'] = etag
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and response.status_code == status.HTTP_200_OK \
+                and not response.has_header('ETag'):
+            response.render()
+            etag = quote_etag(hashlib.sha1(response.content).hexdigest())
+            if not_modified(request, etag):
+                response = HttpResponseNotModified()
+            response['ETag'] = etag
+        return response
+
+
+class BulkModelViewSet(ConditionalMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                       mixins.UpdateModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Read, create & update, one object or a list of them at a time.
+
+    POST a list to the collection to create many objects, PATCH a list of
+    objects with their ``id`` to update many. Either applies all or none.
+    """
+
+    cursor_ordering = ('id',)
+
+    def get_queryset(self):
+        return self.get_serializer_class().plan(super().get_queryset(), self.request)
+
+    def check_batch(self, data):
+        if not isinstance(data, list):
+            raise ValidationError(_('Expected a list of objects'))
+        if len(data) > settings.TP_MAX_BATCH_SIZE:
+            raise ValidationError(
+                _(f'Unable to process more than {settings.TP_MAX_BATCH_SIZE} objects at once'))
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        self.check_batch(request.data)
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request, *args, **kwargs):
+        self.check_batch(request.data)
+        ids = []
+        for item in request.data:
+            try:
+                ids.append(int(item['id']))
+            except (TypeError, KeyError, ValueError):
+                ids.append(None)
+        found = self.get_queryset().in_bulk([pk for pk in ids if pk is not None])
+        errors = [{} if pk in found else {'id': [_('No object with this id')]} for pk in ids]
+        if any(errors):
+            raise ValidationError(errors)
+        serializer = self.get_serializer(
+            [found[pk] for pk in ids], data=request.data, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+
+class TripRequestViewSet(BulkModelViewSet):
+    queryset = models.TripRequest.objects.all()
+    serializer_class = serializers.TripRequestSerializer
+    permission_classes = [permissions.IsModeratorOrReadOnly]
+    cursor_ordering = ('updated', 'id')
+    filterset_fields = {
+        'status': ['exact', 'in'],
+        'updated': ['gt', 'gte'],
+        'depart_est': ['gte', 'lt'],
+        'org': ['exact'],
+        'requestor': ['exact'],
+        'driver': ['exact'],
+        'vehicle': ['exact'],
+    }
+
+    def get_queryset(self):
+        # As TripRequestFilter: requestors only see their own requests.
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_staff or user.is_moderator:
+            return queryset
+        return queryset.filter(requestor=user)
+
+
+class DriverViewSet(BulkModelViewSet):
+    queryset = models.Driver.objects.all()
+    serializer_class = serializers.DriverSerializer
+    permission_classes = [permissions.IsModerator]
+    filterset_fields = ['status', 'has_cdl']
+
+
+class VehicleViewSet(BulkModelViewSet):
+    queryset = models.Vehicle.objects.all()
+    serializer_class = serializers.VehicleSerializer
+    permission_classes = [permissions.IsModerator]
+    filterset_fields = ['org', 'type', 'status']
+
+
+class VehicleMaintenanceViewSet(BulkModelViewSet):
+    queryset = models.VehicleMaintenance.objects.all()
+    serializer_class = serializers.VehicleMaintenanceSerializer
+    permission_classes = [permissions.IsModerator]
+    cursor_ordering = ('updated', 'id')
+    filterset_fields = {
+        'vehicle': ['exact'],
+        'category': ['exact'],
+        'date': ['gte', 'lte'],
+        'updated': ['gt', 'gte'],
+    }
+
+
+class OrganizationViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = models.Organization.objects.all()
+    serializer_class = serializers.OrganizationSerializer
+    permission_classes = [permissions.IsModeratorOrReadOnly]
+    cursor_ordering = ('id',)
+
+
+class DepartmentViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = models.Department.objects.all()
+    serializer_class = serializers.DepartmentSerializer
+    permission_classes = [permissions.IsModeratorOrReadOnly]
+    cursor_ordering = ('num',)
+    filterset_fields = ['org']
+
+
+class BudgetViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = models.Budget.objects.all()
+    serializer_class = serializers.BudgetSerializer
+    permission_classes = [permissions.IsModeratorOrReadOnly]
+    cursor_ordering = ('num',)
+    filterset_fields = ['org']
+
+
+class ChangeFeedView(APIView):
+    """Rows of a feed changed or deleted since the ``since`` cursor.
+
+    Follow each response's ``cursor`` for the next read, right away while
+    ``more`` is true and otherwise on the next poll.
+    """
+
+    permission_classes = [permissions.IsModerator]
+
+    def get(self, request, feed, **kwargs):
+        if feed not in changes.FEEDS:
+            raise Http404
+        try:
+            limit = int(request.query_params.get('limit', 0))
+            if limit < 0:
+                raise ValueError
+        except ValueError:
+            raise ValidationError({'limit': [_('Expected a positive number')]})
+        try:
+            since = request.query_params.get('since')
+            return Response(changes.read(feed, since, limit or None, request))
+        except changes.InvalidCursor:
+            raise ValidationError({'since': [_('Invalid cursor')]})
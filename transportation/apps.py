@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TransportationAppConfig(AppConfig):
     name = 'transportation'
+
+    def ready(self):
+        from transportation import signals  # noqa: F401
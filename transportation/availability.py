@@ -0,0 +1,62 @@
+"""
+Transportation Driver & Vehicle Availability
+
+Answers "who/what is free between start and end" for the whole fleet with a
+single query. A driver or vehicle is busy when it is assigned to a trip that
+is not denied or cancelled and whose estimated interval overlaps the window.
+"""
+
+from django.db.models import Q
+
+from transportation import models
+
+
+def _busy_trips(start, end, exclude_request=None):
+    queryset = models.TripRequest.objects.blocking().overlapping(start, end)
+    if exclude_request is not None and exclude_request.pk is not None:
+        queryset = queryset.exclude(pk=exclude_request.pk)
+    return queryset
+
+
+def busy_driver_ids(start, end, exclude_request=None):
+    """ Subquery of driver IDs assigned to trips overlapping [start, end). """
+    return _busy_trips(start, end, exclude_request).filter(
+        driver__isnull=False).values('driver_id')
+
+
+def busy_vehicle_ids(start, end, exclude_request=None):
+    """ Subquery of vehicle IDs assigned to trips overlapping [start, end). """
+    return _busy_trips(start, end, exclude_request).filter(
+        vehicle__isnull=False).values('vehicle_id')
+
+
+def available_drivers(start, end, exclude_request=None, include=None):
+    """Active drivers with no overlapping trip between start and end.
+
+    Arguments:
+        start {datetime} -- Start of the window
+        end {datetime} -- End of the window
+        exclude_request {TripRequest} -- Trip to ignore, typically the one being assigned
+        include {int} -- Driver ID to keep regardless, e.g. the current assignment
+    """
+    condition = Q(status=models.Driver.STATUS_ACTIVE) & \
+        ~Q(pk__in=busy_driver_ids(start, end, exclude_request))
+    if include is not None:
+        condition |= Q(pk=include)
+    return models.Driver.objects.filter(condition)
+
+
+def available_vehicles(start, end, exclude_request=None, include=None):
+    """Active vehicles with no overlapping trip between start and end.
+
+    Arguments:
+        start {datetime} -- Start of the window
+        end {datetime} -- End of the window
+        exclude_request {TripRequest} -- Trip to ignore, typically the one being assigned
+        include {int} -- Vehicle ID to keep regardless, e.g. the current assignment
+    """
+    condition = Q(status=models.Vehicle.STATUS_ACTIVE) & \
+        ~Q(pk__in=busy_vehicle_ids(start, end, exclude_request))
+    if include is not None:
+        condition |= Q(pk=include)
+    return models.Vehicle.objects.filter(condition)
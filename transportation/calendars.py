@@ -0,0 +1,171 @@
+"""
+Transportation Calendar Feeds
+
+iCalendar (.ics) feeds of the trips of one driver, vehicle or organization,
+for calendar apps to subscribe to. Feed URLs carry a signature instead of
+requiring a sign in, as calendar apps can't.
+
+Calendar apps poll often, so a feed's ETag & Last-Modified come from one
+aggregate query and an unchanged feed is answered with a 304 before any
+trip is read. Rendered feeds are cached until a trip in them is saved or
+deleted (see transportation.signals), and the cached copy is only served
+while its ETag still matches, so bulk updates that skip the signals can't
+serve a stale feed. Feeds also show driver, vehicle & organization names,
+so the ETag follows edits to those too.
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.http import quote_etag
+
+from transportation import models
+
+
+SALT = 'transportation.calendars'
+CACHE_KEY = 'calendars:{scope}:{pk}'
+NAMES_KEY = 'calendars:names'
+
+# Scope name -> (model, TripRequest field)
+SCOPES = {
+    'driver': (models.Driver, 'driver'),
+    'vehicle': (models.Vehicle, 'vehicle'),
+    'org': (models.Organization, 'org'),
+}
+
+STATUSES = (
+    models.TripRequest.STATUS_APPROVED,
+    models.TripRequest.STATUS_RETURNED,
+    models.TripRequest.STATUS_COMPLETED,
+)
+
+FIELDS = (
+    'id', 'depart_est', 'return_est', 'destination', 'purpose', 'updated', 'driver__first_name',
+    'driver__last_name', 'vehicle__num', 'vehicle__year', 'vehicle__make', 'vehicle__model'
+)
+
+
+def make_token(scope, pk):
+    return signing.Signer(salt=SALT).signature(f'{scope}:{pk}')
+
+
+def check_token(scope, pk, token):
+    return constant_time_compare(make_token(scope, pk), token)
+
+
+def feed_url(scope, pk):
+    return reverse('calendar-feed',
+                   kwargs={'scope': scope, 'pk': pk, 'token': make_token(scope, pk)})
+
+
+def invalidate(scope, *pks):
+    cache.delete_many([CACHE_KEY.format(scope=scope, pk=pk) for pk in pks if pk is not None])
+
+
+def touch_names():
+    """ Change every feed's ETag once the current transaction commits. """
+    # Drivers & organizations have no ``updated`` to aggregate, and are rarely edited.
+    transaction.on_commit(lambda: cache.set(NAMES_KEY, timezone.now(), None))
+
+
+def get_trips(scope, pk):
+    """ The feed's trips: approved or later, departing TP_CALENDAR_PAST_DAYS ago or since. """
+    since = timezone.now() - timedelta(days=settings.TP_CALENDAR_PAST_DAYS)
+    return models.TripRequest.objects.filter(
+        **{f'{SCOPES[scope][1]}_id': pk}, status__in=STATUSES, depart_est__gte=since)
+
+
+def get_validators(scope, pk):
+    """(ETag, Last-Modified) of the feed, from the count & latest update of its trips.
+
+    Trips leaving the feed (cancelled, reassigned) are updated too, so the
+    latest update is taken over all of the scope's trips. Their vehicles'
+    latest update and the last touch_names() are included for the names the
+    feed shows. The day is part of the ETag, as old trips drop out of the
+    window daily.
+    """
+    stats = models.TripRequest.objects.filter(**{f'{SCOPES[scope][1]}_id': pk}).aggregate(
+        count=Count('pk'), updated=Max('updated'), vehicle_updated=Max('vehicle__updated'))
+    names = cache.get(NAMES_KEY)
+    key = (f'{scope}|{pk}|{stats["count"]}|{stats["updated"]}|{stats["vehicle_updated"]}|'
+           f'{names}|{timezone.localdate()}')
+    updated = max((value for value in (stats['updated'], stats['vehicle_updated'], names)
+                   if value is not None), default=None)
+    return quote_etag(hashlib.sha1(key.encode()).hexdigest()), updated
+
+
+def escape(value):
+    """ value as RFC 5545 TEXT. """
+    return str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def fold(line):
+    """ line split into 75 octet lines, continuations starting with a space. """
+    data = line.encode()
+    lines = []
+    while len(data) > 75:
+        cut = 75 if not lines else 74
+        # Don't split a UTF-8 sequence.
+        while cut and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        lines.append(data[:cut].decode())
+        data = data[cut:]
+    lines.append(data.decode())
+    return '\r\n '.join(lines)
+
+
+def _timestamp(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render(scope, pk, name):
+    """ The .ics body of the feed named name. """
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Transportation Portal//Trips//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{escape(name)}',
+    ]
+    for trip in get_trips(scope, pk).order_by('depart_est', 'id').values(*FIELDS):
+        details = [trip['purpose']]
+        if trip['driver__last_name'] is not None:
+            details.append(f'Driver: {trip["driver__first_name"]} {trip["driver__last_name"]}')
+        if trip['vehicle__num'] is not None:
+            details.append(f'Vehicle: #{trip["vehicle__num"]} - {trip["vehicle__year"]} '
+                           f'{trip["vehicle__make"]} {trip["vehicle__model"]}')
+        description = '\n'.join(details)
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:triprequest-{trip["id"]}@transportation',
+            f'DTSTAMP:{_timestamp(trip["updated"])}',
+            f'LAST-MODIFIED:{_timestamp(trip["updated"])}',
+            f'DTSTART:{_timestamp(trip["depart_est"])}',
+            f'DTEND:{_timestamp(trip["return_est"])}',
+            f'SUMMARY:{escape(trip["destination"])}',
+            f'LOCATION:{escape(trip["destination"])}',
+            f'DESCRIPTION:{escape(description)}',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return ''.join(fold(line) + '\r\n' for line in lines)
+
+
+def get_feed(scope, pk, name, etag):
+    """ The rendered feed, from the cache while etag still matches the cached copy. """
+    key = CACHE_KEY.format(scope=scope, pk=pk)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == etag:
+        return cached[1]
+    body = render(scope, pk, name)
+    cache.set(key, (etag, body), settings.TP_CALENDAR_CACHE_TIMEOUT)
+    return body
@@ -0,0 +1,116 @@
+"""
+Transportation Change Feeds
+
+Everything modified after a cursor, so consumers sync in O(changes) rather
+than re-reading whole tables. Changed rows are read in (updated, id) order
+by seeking on that index and deletions come from the DeletedRecord
+tombstones, each from its own position in the opaque cursor.
+
+Only rows at least TP_CHANGE_FEED_LAG seconds old are returned: a slow
+transaction may commit a row stamped earlier than one already read, and the
+lag leaves it time to land before the cursor moves past it.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from transportation.api import serializers
+from transportation.models import DeletedRecord, TripRequest, Vehicle
+
+
+SALT = 'transportation.changes'
+
+FEEDS = {
+    'requests': (TripRequest, serializers.TripRequestSerializer),
+    'vehicles': (Vehicle, serializers.VehicleSerializer),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def dump_cursor(changed, deleted):
+    """ Opaque cursor for the (timestamp, id) positions in the changed & deleted rows. """
+    return signing.dumps({
+        'c': [changed[0].isoformat(), changed[1]] if changed is not None else None,
+        'd': [deleted[0].isoformat(), deleted[1]],
+    }, salt=SALT, compress=True)
+
+
+def load_cursor(cursor):
+    """ (changed, deleted) positions of a dump_cursor() cursor. """
+    try:
+        data = signing.loads(cursor, salt=SALT)
+        changed = None
+        if data['c'] is not None:
+            changed = (parse_datetime(data['c'][0]), int(data['c'][1]))
+        deleted = (parse_datetime(data['d'][0]), int(data['d'][1]))
+    except (signing.BadSignature, KeyError, IndexError, TypeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    if deleted[0] is None or (changed is not None and changed[0] is None):
+        raise InvalidCursor('Invalid cursor')
+    return changed, deleted
+
+
+def after(queryset, field, position):
+    """ Rows of queryset past position in (field, id) order. """
+    if position is None:
+        return queryset
+    value, pk = position
+    return queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+
+
+def read(feed, cursor=None, limit=None, request=None):
+    """Changes to the feed's rows since cursor.
+
+    Without a cursor every row is returned as changed, and deletions are
+    reported from then on.
+
+    Arguments:
+        feed {str} -- Key of FEEDS
+        cursor {str} -- Cursor returned by the previous read, if any
+        limit {int} -- Maximum changed & deleted rows each
+        request {Request} -- API request, for the serializer's context
+
+    Returns:
+        dict -- 'changed' objects, 'deleted' IDs, the next 'cursor' & whether
+                there are 'more' changes to read right away
+    """
+    model, serializer_class = FEEDS[feed]
+    limit = min(limit or settings.TP_API_PAGE_SIZE, settings.TP_API_MAX_PAGE_SIZE)
+    horizon = timezone.now() - timedelta(seconds=settings.TP_CHANGE_FEED_LAG)
+    changed_position, deleted_position = load_cursor(cursor) if cursor else (None, (horizon, 0))
+
+    changed = after(model.objects.filter(updated__lte=horizon), 'updated', changed_position)
+    changed = list(serializer_class.plan(changed, request).order_by('updated', 'id')[:limit + 1])
+    deleted = DeletedRecord.objects.filter(model=model._meta.model_name, deleted__lte=horizon)
+    deleted = after(deleted, 'deleted', deleted_position)
+    deleted = list(deleted.order_by('deleted', 'id').only('id', 'object_id', 'deleted')[:limit + 1])
+    more = len(changed) > limit or len(deleted) > limit
+    changed, deleted = changed[:limit], deleted[:limit]
+
+    if changed:
+        changed_position = (changed[-1].updated, changed[-1].pk)
+    if deleted:
+        deleted_position = (deleted[-1].deleted, deleted[-1].pk)
+    return {
+        'changed': serializer_class(changed, many=True, context={'request': request}).data,
+        'deleted': [record.object_id for record in deleted],
+        'cursor': dump_cursor(changed_position, deleted_position),
+        'more': more,
+    }
+
+
+def prune(days=None):
+    """ Delete tombstones older than days, by default TP_CHANGE_FEED_RETENTION_DAYS. """
+    if days is None:
+        days = settings.TP_CHANGE_FEED_RETENTION_DAYS
+    since = timezone.now() - timedelta(days=days)
+    count, _ = DeletedRecord.objects.filter(deleted__lt=since).delete()
+    return count
@@ -0,0 +1,119 @@
+"""
+Transportation Dispatch Board
+
+The fleet's trips over a week or month, as compact interval arrays per
+vehicle for the dispatch board to lay out client side. The trips come from
+one range query on the estimated [depart, return) interval and the result
+is cached per organization & window. Any committed trip or vehicle change
+moves the cache generation on (see transportation.signals), which orphans
+every cached board at once rather than working out which windows a change hit.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from transportation import models
+
+
+GENERATION_KEY = 'dispatch:generation'
+
+SPANS = {
+    'week': relativedelta(weeks=1),
+    'month': relativedelta(months=1),
+}
+
+
+def _next_generation():
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def invalidate():
+    """ Orphan every cached board once the current transaction commits. """
+    # Sooner, a board rebuilt before the commit would cache the old trips.
+    transaction.on_commit(_next_generation)
+
+
+def get_window(day, span):
+    """(start, end) of the week (from Monday) or month containing day.
+
+    Arguments:
+        day {date} -- Any day in the window
+        span {str} -- Key of SPANS
+
+    Returns:
+        tuple -- Aware local midnights starting & ending the window
+    """
+    if span == 'week':
+        day -= timedelta(days=day.weekday())
+    else:
+        day = day.replace(day=1)
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(day + SPANS[span], datetime.min.time()))
+    return start, end
+
+
+def _timestamp(value):
+    return int(value.timestamp())
+
+
+def build_board(start, end, org=None):
+    """The vehicles of org (or every organization) & their trips overlapping [start, end).
+
+    Each trip is an array of [id, status, depart, return, driver ID], times
+    in epoch seconds, sorted by departure. Trips without a vehicle yet are
+    listed under 'unassigned'.
+    """
+    vehicles = models.Vehicle.objects.order_by('num', 'id')
+    if org is not None:
+        vehicles = vehicles.filter(org_id=org)
+    rows = {
+        vehicle['id']: {
+            'id': vehicle['id'],
+            'name': f'#{vehicle["num"]} - {vehicle["year"]} {vehicle["make"]} {vehicle["model"]}',
+            'type': vehicle['type'],
+            'status': vehicle['status'],
+            'trips': [],
+        }
+        for vehicle in vehicles.values('id', 'num', 'year', 'make', 'model', 'type', 'status')
+    }
+
+    trips = models.TripRequest.objects.blocking().overlapping(start, end)
+    if org is not None:
+        trips = trips.filter(Q(vehicle_id__in=list(rows)) | Q(vehicle=None, org_id=org))
+    trips = trips.order_by('depart_est', 'id').values_list(
+        'id', 'status', 'depart_est', 'return_est', 'driver_id', 'vehicle_id',
+        'driver__first_name', 'driver__last_name')
+
+    unassigned, drivers = [], {}
+    for pk, status, depart, returns, driver_id, vehicle_id, first_name, last_name in trips:
+        interval = [pk, status, _timestamp(depart), _timestamp(returns), driver_id]
+        if driver_id is not None:
+            drivers[driver_id] = f'{first_name} {last_name}'
+        row = rows.get(vehicle_id)
+        if row is not None:
+            row['trips'].append(interval)
+        elif vehicle_id is None:
+            unassigned.append(interval)
+
+    return {
+        'start': _timestamp(start),
+        'end': _timestamp(end),
+        'vehicles': list(rows.values()),
+        'unassigned': unassigned,
+        'drivers': drivers,
+    }
+
+
+def get_board(start, end, org=None):
+    """ build_board(), from the cache while no trip or vehicle has changed. """
+    generation = cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+    key = f'dispatch:{generation}:{org}:{_timestamp(start)}:{_timestamp(end)}'
+    return cache.get_or_set(
+        key, lambda: build_board(start, end, org), settings.TP_DISPATCH_CACHE_TIMEOUT)
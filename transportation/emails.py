@@ -1,16 +1,88 @@
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
 from django.urls import reverse, reverse_lazy
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 import logging
 
-from .models import TripRequest
+from .models import TripRequest, OutboundEmail
 
 
 logger = logging.getLogger(__name__)
 
 
+def outbound_mail(subject, body, from_email, recipient_list):
+    """ Unsaved outbox email, e.g. to queue many with bulk_create. """
+    return OutboundEmail(
+        subject=subject,
+        body=body,
+        from_email=from_email,
+        recipients=','.join(recipient_list)
+    )
+
+
+def enqueue_mail(subject, body, from_email, recipient_list):
+    """ Queue an email in the outbox, to be delivered by `manage.py sendemails`. """
+    email = outbound_mail(subject, body, from_email, recipient_list)
+    email.save()
+    return email
+
+
+def deliver_outbox(batch_size=100, max_attempts=None, retry_delay=None, connection=None):
+    """Deliver due outbox emails over a single mail connection.
+
+    Arguments:
+        batch_size {int} -- Maximum number of emails to deliver
+        max_attempts {int} -- Attempts before an email is marked failed
+        retry_delay {int} -- Base backoff in seconds, doubled on each failed attempt
+        connection -- Mail backend connection to reuse, opened from EMAIL_BACKEND if omitted
+
+    Returns:
+        tuple -- (sent, failed) counts
+    """
+    if max_attempts is None:
+        max_attempts = settings.TP_EMAIL_MAX_ATTEMPTS
+    if retry_delay is None:
+        retry_delay = settings.TP_EMAIL_RETRY_DELAY
+    if connection is None:
+        connection = get_connection(fail_silently=False)
+
+    sent = failed = 0
+    with transaction.atomic():
+        queryset = OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+            status=OutboundEmail.STATUS_PENDING,
+            next_attempt__lte=timezone.now()
+        )[:batch_size]
+        outbox = list(queryset)
+        if not outbox:
+            return sent, failed
+
+        connection.open()
+        try:
+            for email in outbox:
+                message = EmailMessage(
+                    email.subject,
+                    email.body,
+                    email.from_email,
+                    email.recipient_list,
+                    connection=connection
+                )
+                try:
+                    message.send()
+                except Exception as e:
+                    logger.error(f'Failed to deliver outbound email {email.pk}: {e}')
+                    email.mark_failed(e, max_attempts, retry_delay)
+                    failed += 1
+                else:
+                    email.mark_sent()
+                    sent += 1
+        finally:
+            connection.close()
+    return sent, failed
+
+
 class TripRequestEmail:
     def __init__(self, triprequest, requestor_subject, requestor_body, manager_notify=False, manager_subject=None, manager_body=None):
         self.triprequest = triprequest
@@ -37,7 +109,7 @@ class TripRequestEmail:
                 params={'triprequest': self.triprequest,
                         'requestor_subject': self.requestor_subject, 'requestor_body': self.requestor_body}
             )
-        mail = send_mail(
+        enqueue_mail(
             self.manager_subject,
             self.manager_body,
             self.from_email,
@@ -45,13 +117,25 @@ class TripRequestEmail:
         )
 
     def send_requestor(self, emails=None):
-        mail = send_mail(
+        enqueue_mail(
             self.requestor_subject,
             self.requestor_body,
             self.from_email,
             self._recipients(extra_emails=emails)
         )
 
+    def outbound(self, emails=None):
+        """ Unsaved outbox emails send() would queue. """
+        outbox = []
+        if self.manager_notify:
+            outbox.append(outbound_mail(
+                self.manager_subject, self.manager_body, self.from_email,
+                self._recipients(manager_only=True)))
+        outbox.append(outbound_mail(
+            self.requestor_subject, self.requestor_body, self.from_email,
+            self._recipients(extra_emails=emails)))
+        return outbox
+
     def send(self, emails=None):
         if self.manager_notify:
             try:
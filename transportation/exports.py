@@ -0,0 +1,129 @@
+"""
+Transportation CSV Exports
+
+Exports are streamed straight from a ``values_list()`` iterator so that large
+date ranges run in constant memory: rows are never materialized as model
+instances and only one chunk is held at a time.
+"""
+
+import csv
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from transportation import models
+
+
+def _datetime(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M')
+
+
+def _choice(choices):
+    return dict(choices).get
+
+
+# (header, field lookup, formatter)
+TRIPREQUEST_COLUMNS = (
+    ('ID', 'id', None),
+    ('Status', 'status', _choice(models.TripRequest.STATUS_CHOICES)),
+    ('Submitted', 'submitted', _datetime),
+    ('Organization', 'org__name', None),
+    ('Department #', 'department__num', None),
+    ('Department', 'department__name', None),
+    ('Budget #', 'budget__num', None),
+    ('Budget', 'budget__name', None),
+    ('First Name', 'contact_fn', None),
+    ('Last Name', 'contact_ln', None),
+    ('Email Address', 'contact_email', None),
+    ('Phone #', 'contact_phone', None),
+    ('Destination', 'destination', None),
+    ('Party Count', 'party_count', None),
+    ('Vehicle Type', 'vehicle_type', _choice(models.TripRequest.TYPE_CHOICES)),
+    ('Vehicle #', 'vehicle__num', None),
+    ('Driver First Name', 'driver__first_name', None),
+    ('Driver Last Name', 'driver__last_name', None),
+    ('Depart Time (Estimate)', 'depart_est', _datetime),
+    ('Return Time (Estimate)', 'return_est', _datetime),
+    ('Depart Time (Actual)', 'depart_act', _datetime),
+    ('Return Time (Actual)', 'return_act', _datetime),
+    ('Mileage (Estimate)', 'mileage_est', None),
+    ('Mileage (Actual)', 'mileage_act', None),
+    ('Fuel Cost', 'fuel_cost', None),
+    ('Card #', 'card_num', None),
+)
+
+VEHICLE_COLUMNS = (
+    ('ID', 'id', None),
+    ('Organization', 'org__name', None),
+    ('Vehicle #', 'num', None),
+    ('Status', 'status', _choice(models.Vehicle.STATUS_CHOICES)),
+    ('Vehicle Type', 'type', _choice(models.Vehicle.TYPE_CHOICES)),
+    ('Year', 'year', None),
+    ('Make', 'make', None),
+    ('Model', 'model', None),
+    ('VIN #', 'vin', None),
+    ('Title #', 'title_num', None),
+    ('Plate #', 'license_plate', None),
+    ('Registration', 'reg_expire_date', None),
+    ('Mileage', 'mileage', None),
+    ('Purchase Date', 'purchase_date', None),
+    ('Purchase Price', 'purchase_cost', None),
+    ('Storage Location', 'storage_location', None),
+)
+
+DRIVER_COLUMNS = (
+    ('ID', 'id', None),
+    ('Status', 'status', _choice(models.Driver.STATUS_CHOICES)),
+    ('First Name', 'first_name', None),
+    ('Last Name', 'last_name', None),
+    ('Email Address', 'email', None),
+    ('Phone #', 'phone', None),
+    ('License #', 'license_num', None),
+    ('License Expiration Date', 'expiration_date', None),
+    ('State', 'state', None),
+    ('CDL Status', 'has_cdl', None),
+)
+
+VEHICLE_MAINTENANCE_COLUMNS = (
+    ('ID', 'id', None),
+    ('Vehicle #', 'vehicle__num', None),
+    ('Maintenance Date', 'date', None),
+    ('Category', 'category', _choice(models.VehicleMaintenance.CATEGORY_CHOICES)),
+    ('Mileage', 'mileage', None),
+    ('Cost', 'cost', None),
+    ('Notes', 'notes', None),
+)
+
+
+class Echo:
+    """ File-like object that hands each written CSV line back to the caller. """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(queryset, columns, filename):
+    """Stream a queryset as a CSV attachment.
+
+    Arguments:
+        queryset {QuerySet} -- Filtered & ordered queryset to export
+        columns {tuple} -- (header, field lookup, formatter) triples
+        filename {str} -- Attachment filename
+    """
+    rows = queryset.values_list(*[field for _, field, _ in columns]).iterator(
+        chunk_size=settings.TP_EXPORT_CHUNK_SIZE)
+    formatters = [formatter for _, _, formatter in columns]
+    writer = csv.writer(Echo())
+
+    def generate():
+        yield writer.writerow([header for header, _, _ in columns])
+        for row in rows:
+            yield writer.writerow([
+                value if formatter is None or value is None else formatter(value)
+                for value, formatter in zip(row, formatters)
+            ])
+
+    response = StreamingHttpResponse(generate(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -5,6 +5,7 @@ For more information regarding Django forms, see:
     https://docs.djangoproject.com/en/2.2/topics/forms/
 """
 
+from copy import copy
 from datetime import datetime
 from functools import partial
 from itertools import groupby
@@ -23,7 +24,7 @@ from tempus_dominus.widgets import DatePicker, TimePicker, DateTimePicker
 
 from phone_field.forms import PhoneFormField, PhoneWidget
 
-from transportation import models
+from transportation import models, availability, lookups
 
 from .validators import validate_future
 
@@ -36,16 +37,20 @@ class GroupedModelChoiceIterator(ModelChoiceIterator):
     def __iter__(self):
         if self.field.empty_label is not None:
             yield ("", self.field.empty_label)
-        queryset = self.queryset
-        # Can't use iterator() when queryset uses prefetch_related()
-        if not queryset._prefetch_related_lookups:
-            queryset = queryset.iterator()
+        if self.field.choices_loader is not None:
+            queryset = self.field.choices_loader()
+        else:
+            queryset = self.queryset
+            # Can't use iterator() when queryset uses prefetch_related()
+            if not queryset._prefetch_related_lookups:
+                queryset = queryset.iterator()
         for group, objs in groupby(queryset, self.groupby):
             yield (group, [self.choice(obj) for obj in objs])
 
 
 class GroupedModelChoiceField(ModelChoiceField):
-    def __init__(self, *args, choices_groupby, **kwargs):
+    def __init__(self, *args, choices_groupby, choices_loader=None, **kwargs):
+        self.choices_loader = choices_loader
         if isinstance(choices_groupby, str):
             choices_groupby = attrgetter(choices_groupby)
         elif not callable(choices_groupby):
@@ -56,7 +61,8 @@ class GroupedModelChoiceField(ModelChoiceField):
 
 
 class GroupedModelMultipleChoiceField(ModelMultipleChoiceField):
-    def __init__(self, *args, choices_groupby, **kwargs):
+    def __init__(self, *args, choices_groupby, choices_loader=None, **kwargs):
+        self.choices_loader = choices_loader
         if isinstance(choices_groupby, str):
             choices_groupby = attrgetter(choices_groupby)
         elif not callable(choices_groupby):
@@ -66,6 +72,27 @@ class GroupedModelMultipleChoiceField(ModelMultipleChoiceField):
         super().__init__(*args, **kwargs)
 
 
+class CachedModelChoiceField(ModelChoiceField):
+    """ ModelChoiceField validated against a cached list instead of the queryset. """
+
+    def __init__(self, *args, choices_loader, **kwargs):
+        self.choices_loader = choices_loader
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        key = self.to_field_name or 'pk'
+        for obj in self.choices_loader():
+            if str(getattr(obj, key)) == str(value):
+                return obj
+        raise ValidationError(
+            self.error_messages['invalid_choice'],
+            code='invalid_choice',
+            params={'value': value}
+        )
+
+
 class OrganizationForm(forms.ModelForm):
     class Meta:
         model = models.Organization
@@ -168,8 +195,9 @@ class TripRequestForm(forms.ModelForm):
     status = forms.ChoiceField(choices=models.TripRequest.STATUS_CHOICES, required=True,
                                initial=models.TripRequest.STATUS_PENDING, widget=forms.HiddenInput())
 
-    manager = forms.ModelChoiceField(
+    manager = CachedModelChoiceField(
         queryset=models.User.objects.filter(is_moderator=True),
+        choices_loader=lookups.get_moderators,
         required=False,
         initial=None,
         widget=forms.HiddenInput()
@@ -183,12 +211,14 @@ class TripRequestForm(forms.ModelForm):
 
     department = GroupedModelChoiceField(
         queryset=models.Department.objects,
-        choices_groupby='org'
+        choices_groupby='org',
+        choices_loader=lookups.get_departments
     )
 
     budget = GroupedModelChoiceField(
         queryset=models.Budget.objects,
-        choices_groupby='org'
+        choices_groupby='org',
+        choices_loader=lookups.get_budgets
     )
 
     depart_est = forms.SplitDateTimeField(
@@ -249,8 +279,9 @@ class TripRequestAdminForm(forms.ModelForm):
     status = forms.ChoiceField(choices=models.TripRequest.STATUS_CHOICES,
                                required=True, widget=forms.HiddenInput())
 
-    manager = forms.ModelChoiceField(
+    manager = CachedModelChoiceField(
         queryset=models.User.objects.filter(is_moderator=True),
+        choices_loader=lookups.get_moderators,
         required=False,
         widget=forms.HiddenInput()
     )
@@ -263,12 +294,14 @@ class TripRequestAdminForm(forms.ModelForm):
 
     department = GroupedModelChoiceField(
         queryset=models.Department.objects,
-        choices_groupby='org'
+        choices_groupby='org',
+        choices_loader=lookups.get_departments
     )
 
     budget = GroupedModelChoiceField(
         queryset=models.Budget.objects,
-        choices_groupby='org'
+        choices_groupby='org',
+        choices_loader=lookups.get_budgets
     )
 
     depart_est = forms.SplitDateTimeField(
@@ -343,10 +376,34 @@ class TripRequestAdminForm(forms.ModelForm):
         self.fields['purpose'].widget.attrs.update({'class': 'form-control'})
         self.fields['is_vehicle_clean'].widget.attrs.update({'class': 'largerCheckbox'})
         self.fields['is_vehicle_parked_proper'].widget.attrs.update({'class': 'largerCheckbox'})
+        if self.instance.depart_est is not None and self.instance.return_est is not None:
+            # Only offer drivers & vehicles that are free for this trip's window.
+            window = (self.instance.depart_est, self.instance.return_est)
+            self.fields['driver'].queryset = availability.available_drivers(
+                *window, exclude_request=self.instance, include=self.instance.driver_id)
+            self.fields['vehicle'].queryset = availability.available_vehicles(
+                *window, exclude_request=self.instance, include=self.instance.vehicle_id)
         self.helper = FormHelper()
         self.helper.form_class = 'form-horizontal'
         self.helper.form_show_labels = False
 
+    def clean(self):
+        cleaned_data = super().clean()
+        status = int(cleaned_data.get('status') or self.instance.status)
+        if 'approve' in self.data:
+            status = models.TripRequest.STATUS_APPROVED
+        if status in models.TripRequest.BOOKED_STATUSES:
+            # The database refuses double bookings too; this names the conflict.
+            triprequest = copy(self.instance)
+            for name in ('driver', 'vehicle', 'depart_est', 'return_est'):
+                if name in cleaned_data:
+                    setattr(triprequest, name, cleaned_data[name])
+            conflicts = models.TripRequest.objects.booking_conflicts([triprequest])
+            for _triprequest, field, other in conflicts:
+                error = models.booking_error(triprequest, field, other)
+                self.add_error(field, error.error_dict[field])
+        return cleaned_data
+
     class Meta:
         model = models.TripRequest
         fields = [
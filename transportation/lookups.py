@@ -0,0 +1,51 @@
+"""
+Transportation Cached Lookups
+
+Organizations, departments, budgets and moderators rarely change
+but are read on nearly every form render. They are kept in the shared cache
+and invalidated by the model signal handlers in transportation.signals.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from transportation import models
+
+
+ORGANIZATIONS_KEY = 'lookups:organizations'
+DEPARTMENTS_KEY = 'lookups:departments'
+BUDGETS_KEY = 'lookups:budgets'
+MODERATORS_KEY = 'lookups:moderators'
+
+
+def _cached(key, loader):
+    return cache.get_or_set(key, loader, settings.TP_LOOKUP_CACHE_TIMEOUT)
+
+
+def invalidate(*keys):
+    """ Drop keys once the current transaction commits. """
+    # Sooner, a concurrent read could cache the old rows again until the timeout.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_organizations():
+    return _cached(ORGANIZATIONS_KEY, lambda: list(
+        models.Organization.objects.order_by('name')))
+
+
+def get_departments():
+    """ All departments, ordered (and so groupable) by organization. """
+    return _cached(DEPARTMENTS_KEY, lambda: list(
+        models.Department.objects.select_related('org').order_by('org__name', 'org_id', 'name')))
+
+
+def get_budgets():
+    """ All budgets, ordered (and so groupable) by organization. """
+    return _cached(BUDGETS_KEY, lambda: list(
+        models.Budget.objects.select_related('org').order_by('org__name', 'org_id', 'name')))
+
+
+def get_moderators():
+    return _cached(MODERATORS_KEY, lambda: list(
+        models.User.objects.filter(is_moderator=True).order_by('last_name', 'first_name')))
@@ -0,0 +1,136 @@
+import json
+import math
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from transportation import models
+
+
+BENCHMARK_USERNAME = 'benchmark'
+
+# Slowdowns smaller than this (ms) are noise whatever the tolerance.
+MIN_SLOWDOWN_MS = 5
+
+
+def percentile(values, percent):
+    """ Nearest-rank percentile of values. """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Time the main views through the test client & report latency percentiles and '
+            'query counts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--tickets', type=int, default=25,
+                            help='Trip requests printed per print-tickets request.')
+        parser.add_argument('--save', metavar='PATH', help='Write the results to PATH as JSON.')
+        parser.add_argument('--baseline', metavar='PATH',
+                            help='Fail when slower than, or running more queries than, the '
+                                 'results in PATH.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p50 slowdown against the baseline, as a fraction.')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('At least one iteration is required.')
+        client = Client()
+        client.force_login(self.get_user())
+
+        results = {}
+        for name, url in self.get_scenarios(options['tickets']):
+            results[name] = self.measure(client, url, options['iterations'], options['warmup'])
+
+        self.stdout.write(f'{"view":<24}{"p50 ms":>10}{"p95 ms":>10}{"queries":>10}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<24}{result["p50"]:>10.1f}{result["p95"]:>10.1f}{result["queries"]:>10}')
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = self.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+
+    def get_user(self):
+        user, created = models.User.objects.get_or_create(
+            username=BENCHMARK_USERNAME,
+            defaults={'is_staff': True, 'is_moderator': True, 'first_name': 'Benchmark'}
+        )
+        if created:
+            user.set_unusable_password()
+            user.save()
+        return user
+
+    def get_scenarios(self, tickets):
+        """ (name, URL) of each view to time, against the largest objects in the database. """
+        triprequests = list(models.TripRequest.objects.order_by('-depart_est').values_list(
+            'pk', flat=True)[:tickets])
+        vehicle = models.Vehicle.objects.annotate(
+            maintenance_count=Count('maintenances')).order_by('-maintenance_count').first()
+        org_ids = ','.join(
+            str(pk) for pk in models.Organization.objects.values_list('pk', flat=True)[:5])
+        driver = models.Driver.objects.first()
+        if not triprequests or vehicle is None or driver is None:
+            raise CommandError('Nothing to benchmark, run "manage.py seed" first.')
+
+        return [
+            ('request-list', reverse('request-list')),
+            ('request-list-filtered', reverse('request-list') + '?status=4'),
+            ('request-detail', reverse('request-detail', kwargs={'pk': triprequests[0]})),
+            ('vehicle-detail', reverse('vehicle-detail', kwargs={'vehicle_pk': vehicle.pk})),
+            ('print-tickets',
+             reverse('print-tickets') + '?pk_list=' + ','.join(map(str, triprequests))),
+            ('load-departments', reverse('load-departments') + f'?orgs={org_ids}'),
+            ('load-budgets', reverse('load-budgets') + f'?orgs={org_ids}'),
+            ('query-drivers', reverse('query-drivers') + f'?q={driver.last_name[:3]}'),
+        ]
+
+    def measure(self, client, url, iterations, warmup):
+        for _ in range(warmup):
+            client.get(url)
+        durations, queries = [], []
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = client.get(url)
+                durations.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'GET {url} returned {response.status_code}')
+            queries.append(len(context.captured_queries))
+        return {
+            'url': url,
+            'p50': percentile(durations, 50),
+            'p95': percentile(durations, 95),
+            'queries': int(statistics.median(queries)),
+        }
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            if result['queries'] > expected['queries']:
+                regressions.append(
+                    f'{name}: {result["queries"]} queries, was {expected["queries"]}')
+            # The median, as the tail of a few iterations is mostly scheduling noise.
+            slowdown = result['p50'] - expected['p50']
+            if slowdown > expected['p50'] * tolerance and slowdown > MIN_SLOWDOWN_MS:
+                regressions.append(
+                    f'{name}: p50 {result["p50"]:.1f}ms, was {expected["p50"]:.1f}ms')
+        return regressions
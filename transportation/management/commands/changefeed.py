@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from transportation import changes
+
+
+class Command(BaseCommand):
+    help = 'Print the changes to a feed since a cursor as JSON, or prune old deletion records.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('feed', nargs='?', choices=sorted(changes.FEEDS))
+        parser.add_argument('--since', metavar='CURSOR',
+                            help='Cursor returned by the previous read.')
+        parser.add_argument('--limit', type=int)
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete deletion records older than '
+                                 'TP_CHANGE_FEED_RETENTION_DAYS.')
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            self.stdout.write(f'changefeed: pruned {changes.prune()} deletion record(s)')
+            return
+        if options['feed'] is None:
+            raise CommandError('A feed is required unless pruning.')
+        if options['limit'] is not None and options['limit'] < 1:
+            raise CommandError('The limit must be positive.')
+        try:
+            result = changes.read(options['feed'], options['since'], options['limit'])
+        except changes.InvalidCursor as e:
+            raise CommandError(str(e))
+        self.stdout.write(json.dumps(result, cls=DjangoJSONEncoder))
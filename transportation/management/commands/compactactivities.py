@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from transportation.models import TripRequest, TripRequestActivity
+
+
+# Activity types whose transition used to be preceded by an extra "edited" row.
+TRANSITION_TYPES = {
+    TripRequestActivity.TYPE_APPROVED,
+    TripRequestActivity.TYPE_DENIED,
+    TripRequestActivity.TYPE_FINISHED,
+    TripRequestActivity.TYPE_CANCELLED,
+}
+
+
+class Command(BaseCommand):
+    help = ('Delete the "edited" activity logged just before each status transition by older '
+            'releases.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=float, default=5,
+                            help='Maximum seconds between the edited & transition activities of '
+                                 'a pair.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count the pairs without deleting.')
+
+    def handle(self, *args, **options):
+        window = timedelta(seconds=options['window'])
+        duplicates, requests = [], set()
+        previous = None
+        rows = TripRequestActivity.objects.order_by('request_id', 'timestamp', 'id').values_list(
+            'id', 'request_id', 'user_id', 'type', 'timestamp')
+        for row in rows.iterator(chunk_size=options['batch_size']):
+            pk, request_id, user_id, activity_type, timestamp = row
+            if previous is not None and previous[1] == request_id \
+                    and previous[3] == TripRequestActivity.TYPE_EDITED \
+                    and activity_type in TRANSITION_TYPES \
+                    and previous[2] in (None, user_id) \
+                    and timestamp - previous[4] <= window:
+                duplicates.append(previous[0])
+                requests.add(request_id)
+            previous = row
+
+        if not options['dry_run']:
+            batch_size = options['batch_size']
+            with transaction.atomic():
+                for i in range(0, len(duplicates), batch_size):
+                    TripRequestActivity.objects.filter(pk__in=duplicates[i:i + batch_size]).delete()
+                # Deleting nulls last_activity on requests that pointed at a removed row.
+                latest = TripRequestActivity.objects.filter(
+                    request=OuterRef('pk')).order_by('-timestamp', '-id').values('id')[:1]
+                TripRequest.objects.filter(last_activity=None, activities__isnull=False).update(
+                    last_activity=Subquery(latest))
+
+        action = 'would delete' if options['dry_run'] else 'deleted'
+        self.stdout.write(
+            f'compactactivities: {action} {len(duplicates)} duplicate activities on '
+            f'{len(requests)} trip request(s)')
@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'One-time setup of a new deployment: migrate, load initial data & create the superuser.'
+
+    def handle(self, *args, **options):
+        call_command('migrate', interactive=False)
+        call_command('loaddata', 'initial')
+
+        User = get_user_model()
+        if User.objects.filter(is_superuser=True).exists():
+            self.stdout.write('Superuser already exists, skipping.')
+        else:
+            # Reads DJANGO_SUPERUSER_USERNAME/EMAIL/PASSWORD from the environment.
+            call_command('createsuperuser', interactive=False)
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from transportation import rollups
+
+
+class Command(BaseCommand):
+    help = 'Refresh the daily trip & maintenance rollups for the days changed since the last run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild the rollups for every day.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        days = rollups.refresh(full=options['full'])
+        scope = 'all days' if days is None else f'{days} day(s)'
+        self.stdout.write(f'rollupstats: refreshed {scope} in {time.monotonic() - started:.2f}s')
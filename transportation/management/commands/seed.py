@@ -0,0 +1,272 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from transportation import models, dispatch, lookups, rollups
+from transportation.search import normalize_name
+
+
+FIRST_NAMES = (
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda',
+    'William', 'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica',
+    'Thomas', 'Sarah', 'Charles', 'Karen', 'Daniel', 'Nancy', 'Matthew', 'Lisa',
+)
+LAST_NAMES = (
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+    'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson',
+    'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White',
+)
+DESTINATIONS = (
+    'Richmond, VA', 'Charlottesville, VA', 'Roanoke, VA', 'Washington, DC',
+    'Raleigh, NC', 'Blacksburg, VA', 'Norfolk, VA', 'Harrisonburg, VA',
+)
+VEHICLE_MODELS = (
+    ('Ford', 'Transit'), ('Chevrolet', 'Express'), ('Toyota', 'Camry'),
+    ('Honda', 'Odyssey'), ('Ford', 'F-150'), ('Blue Bird', 'Vision'),
+)
+
+# Share of generated trips in each status, in order of TripRequest.STATUS_CHOICES.
+STATUS_WEIGHTS = {
+    models.TripRequest.STATUS_PENDING: 10,
+    models.TripRequest.STATUS_APPROVED: 15,
+    models.TripRequest.STATUS_DENIED: 5,
+    models.TripRequest.STATUS_RETURNED: 5,
+    models.TripRequest.STATUS_COMPLETED: 60,
+    models.TripRequest.STATUS_CANCELLED: 5,
+}
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with synthetic organizations, drivers, vehicles, trips & maintenance.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orgs', type=int, default=10)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--drivers', type=int, default=2000)
+        parser.add_argument('--vehicles', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=200000)
+        parser.add_argument('--maintenance', type=int, default=20,
+                            help='Maintenance records per vehicle.')
+        parser.add_argument('--years', type=float, default=3,
+                            help='Years of history the trips are spread over.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable data.')
+        parser.add_argument('--prefix', help='Prefix of unique names, seed<seed> by default. '
+                                             'Change it to seed the same database again.')
+
+    def handle(self, *args, **options):
+        if options['orgs'] < 1 or options['users'] < 1:
+            raise CommandError('At least one organization & user are required.')
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.prefix = options['prefix'] or f'seed{options["seed"]}'
+
+        with transaction.atomic():
+            orgs = self.step('organizations', self.create_orgs, options['orgs'])
+            users = self.step('users', self.create_users, options['users'])
+            drivers = self.step('drivers', self.create_drivers, options['drivers'])
+            vehicles = self.step('vehicles', self.create_vehicles, orgs, options['vehicles'])
+            self.step('trip requests', self.create_triprequests, orgs, users, drivers, vehicles,
+                      options['requests'], options['years'])
+            self.step('maintenance', self.create_maintenance, vehicles, options['maintenance'],
+                      options['years'])
+        # bulk_create sends no signals, so clear what their handlers would have.
+        lookups.invalidate(lookups.ORGANIZATIONS_KEY, lookups.DEPARTMENTS_KEY,
+                           lookups.BUDGETS_KEY, lookups.MODERATORS_KEY)
+        dispatch.invalidate()
+        self.step('rollups', lambda: rollups.refresh(full=True))
+
+    def step(self, name, func, *args):
+        started = time.monotonic()
+        result = func(*args)
+        count = len(result) if isinstance(result, list) else result
+        count = f' {count}' if isinstance(count, int) else ''
+        self.stdout.write(f'seed: {name}{count} in {time.monotonic() - started:.2f}s')
+        return result
+
+    def bulk_create(self, model, objects):
+        return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def name(self):
+        return self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+
+    def create_orgs(self, count):
+        self.bulk_create(models.Organization, [
+            models.Organization(name=f'Organization {self.prefix}-{i}') for i in range(count)
+        ])
+        # bulk_create only returns primary keys on backends that support it.
+        orgs = list(models.Organization.objects.filter(
+            name__startswith=f'Organization {self.prefix}-'))
+        departments, budgets = [], []
+        for org in orgs:
+            for i in range(self.random.randint(3, 8)):
+                num = f'S{org.pk}-{i}'
+                departments.append(models.Department(org=org, num=num, name=f'Department {num}'))
+                budgets.append(models.Budget(org=org, num=num, name=f'Budget {num}'))
+        self.bulk_create(models.Department, departments)
+        self.bulk_create(models.Budget, budgets)
+        self.departments = {}
+        for department in models.Department.objects.filter(org__in=orgs):
+            self.departments.setdefault(department.org_id, []).append(department.pk)
+        self.budgets = {}
+        for budget in models.Budget.objects.filter(org__in=orgs):
+            self.budgets.setdefault(budget.org_id, []).append(budget.pk)
+        return orgs
+
+    def create_users(self, count):
+        password = make_password(None)
+        self.bulk_create(models.User, [
+            models.User(
+                username=f'{self.prefix}-user{i}', password=password,
+                first_name=first_name, last_name=last_name,
+                email=f'{self.prefix}-user{i}@example.com',
+                is_moderator=i % 50 == 0
+            )
+            for i, (first_name, last_name) in enumerate(self.name() for _ in range(count))
+        ])
+        return list(models.User.objects.filter(username__startswith=f'{self.prefix}-'))
+
+    def create_drivers(self, count):
+        drivers = []
+        for _ in range(count):
+            first_name, last_name = self.name()
+            drivers.append(models.Driver(
+                first_name=first_name, last_name=last_name,
+                # bulk_create skips Driver.save(), which keeps search_name.
+                search_name=normalize_name(f'{first_name} {last_name}'),
+                status=self.random.choices(
+                    (models.Driver.STATUS_ACTIVE, models.Driver.STATUS_INACTIVE,
+                     models.Driver.STATUS_RETIRED),
+                    weights=(85, 10, 5))[0],
+                license_num=f'{self.random.randrange(10 ** 9):09}', state='VA',
+                expiration_date=(self.now + timedelta(days=self.random.randint(-30, 1500))).date(),
+            ))
+        first_pk = models.Driver.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        self.bulk_create(models.Driver, drivers)
+        return list(models.Driver.objects.filter(pk__gt=first_pk).values_list('pk', flat=True))
+
+    def create_vehicles(self, orgs, count):
+        first_pk = models.Vehicle.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        self.bulk_create(models.Vehicle, [
+            models.Vehicle(
+                org=self.random.choice(orgs), num=i + 1,
+                type=self.random.choice(models.Vehicle.TYPE_CHOICES[1:])[0],
+                status=models.Vehicle.STATUS_ACTIVE,
+                year=self.random.randint(2005, 2021), make=make, model=model,
+                title_num=f'T{i:06}', vin=f'VIN{self.random.randrange(10 ** 14):014}',
+                license_plate=f'TP{i:05}',
+                reg_expire_date=(self.now + timedelta(days=self.random.randint(0, 700))).date(),
+                mileage=self.random.randint(1000, 150000),
+            )
+            for i, (make, model)
+            in enumerate(self.random.choice(VEHICLE_MODELS) for _ in range(count))
+        ])
+        return list(models.Vehicle.objects.filter(pk__gt=first_pk).values_list(
+            'pk', 'org_id', 'type'))
+
+    def create_triprequests(self, orgs, users, drivers, vehicles, count, years):
+        TripRequest = models.TripRequest
+        Activity = models.TripRequestActivity
+        start = self.now - timedelta(days=365 * years)
+        # Trips depart in time order, a little under one spacing apart, so
+        # each driver & vehicle can be handed the next trip once it is free.
+        spacing = (self.now + timedelta(days=90) - start) / max(count, 1)
+        driver_free = [start] * len(drivers)
+        vehicle_free = [start] * len(vehicles)
+        statuses, weights = zip(*STATUS_WEIGHTS.items())
+        assigned = {
+            TripRequest.STATUS_APPROVED, TripRequest.STATUS_RETURNED, TripRequest.STATUS_COMPLETED
+        }
+        moderators = [user for user in users if user.is_moderator] or users[:1]
+
+        first_pk = TripRequest.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        for offset in range(0, count, self.batch_size):
+            triprequests = []
+            for i in range(offset, min(offset + self.batch_size, count)):
+                org = orgs[i % len(orgs)]
+                depart = start + spacing * i + spacing * self.random.random() * 0.9
+                returns = depart + timedelta(hours=self.random.randint(2, 10))
+                status = self.random.choices(statuses, weights=weights)[0]
+                mileage = self.random.randint(5, 400)
+                first_name, last_name = self.name()
+                triprequest = TripRequest(
+                    status=status, org=org,
+                    department_id=self.random.choice(self.departments[org.pk]),
+                    budget_id=self.random.choice(self.budgets[org.pk]),
+                    requestor=users[i % len(users)], manager=self.random.choice(moderators),
+                    contact_fn=first_name, contact_ln=last_name,
+                    contact_phone='434-582-2000',
+                    contact_email=f'{first_name}.{last_name}@example.com'.lower(),
+                    destination=self.random.choice(DESTINATIONS), purpose='Synthetic trip',
+                    party_count=self.random.randint(1, 14),
+                    depart_est=depart, return_est=returns, mileage_est=mileage,
+                    agreement_accepted=True,
+                )
+                if status in assigned:
+                    if drivers and driver_free[i % len(drivers)] <= depart:
+                        triprequest.driver_id = drivers[i % len(drivers)]
+                        driver_free[i % len(drivers)] = returns
+                    if vehicles and vehicle_free[i % len(vehicles)] <= depart:
+                        vehicle_pk, _, vehicle_type = vehicles[i % len(vehicles)]
+                        triprequest.vehicle_id = vehicle_pk
+                        triprequest.vehicle_type = vehicle_type
+                        vehicle_free[i % len(vehicles)] = returns
+                if status == TripRequest.STATUS_COMPLETED:
+                    triprequest.depart_act = depart
+                    triprequest.return_act = returns
+                    triprequest.mileage_act = mileage + self.random.randint(-5, 25)
+                    triprequest.fuel_cost = Decimal(mileage) * Decimal('0.12')
+                triprequests.append(triprequest)
+            self.bulk_create(TripRequest, triprequests)
+
+        pks = TripRequest.objects.filter(pk__gt=first_pk).values_list(
+            'pk', 'status', 'manager_id', 'requestor_id')
+        activity_types = {
+            TripRequest.STATUS_APPROVED: Activity.TYPE_APPROVED,
+            TripRequest.STATUS_DENIED: Activity.TYPE_DENIED,
+            TripRequest.STATUS_RETURNED: Activity.TYPE_APPROVED,
+            TripRequest.STATUS_COMPLETED: Activity.TYPE_FINISHED,
+            TripRequest.STATUS_CANCELLED: Activity.TYPE_CANCELLED,
+        }
+        activities = []
+        for pk, status, manager_id, requestor_id in pks.iterator(chunk_size=self.batch_size):
+            activities.append(
+                Activity(request_id=pk, user_id=requestor_id, type=Activity.TYPE_CREATED))
+            if status in activity_types:
+                activities.append(
+                    Activity(request_id=pk, user_id=manager_id, type=activity_types[status]))
+            if len(activities) >= self.batch_size:
+                self.bulk_create(Activity, activities)
+                activities = []
+        self.bulk_create(Activity, activities)
+
+        # bulk_create skips TripRequestActivity.save(), which keeps last_activity,
+        # and auto_now_add stamps every trip as submitted now.
+        latest = Activity.objects.filter(
+            request=OuterRef('pk')).order_by('-timestamp', '-id').values('id')[:1]
+        TripRequest.objects.filter(pk__gt=first_pk).update(
+            last_activity=Subquery(latest), submitted=F('depart_est') - timedelta(days=14))
+        return count
+
+    def create_maintenance(self, vehicles, per_vehicle, years):
+        days = int(365 * years)
+        records = []
+        for vehicle_pk, _, _ in vehicles:
+            for _ in range(per_vehicle):
+                records.append(models.VehicleMaintenance(
+                    vehicle_id=vehicle_pk,
+                    date=(self.now - timedelta(days=self.random.randint(0, days))).date(),
+                    category=self.random.choice(models.VehicleMaintenance.CATEGORY_CHOICES)[0],
+                    cost=Decimal(self.random.randint(2000, 150000)) / 100,
+                    mileage=self.random.randint(1000, 150000),
+                ))
+        self.bulk_create(models.VehicleMaintenance, records)
+        return records
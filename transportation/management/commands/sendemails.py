@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from transportation.emails import deliver_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbound emails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Maximum number of emails delivered per connection.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the outbox instead of exiting once drained.')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep between polls when looping.')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed = deliver_outbox(batch_size=options['batch_size'])
+            except Exception as e:
+                # Relay unreachable; leave the outbox untouched and try again later.
+                self.stderr.write(self.style.ERROR(f'Unable to deliver outbox: {e}'))
+                sent, failed = 0, 0
+                if not options['loop']:
+                    raise
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} email(s), {failed} failed')
+            if not options['loop']:
+                if sent + failed < options['batch_size']:
+                    break
+                continue
+            if sent + failed < options['batch_size']:
+                time.sleep(options['interval'])
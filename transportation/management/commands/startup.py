@@ -0,0 +1,67 @@
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+class Command(BaseCommand):
+    help = 'Prepare the application for serving, skipping work that is already done.'
+
+    fingerprint_name = '.fingerprint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-migrate', action='store_true',
+                            help='Do not check for or apply pending migrations.')
+        parser.add_argument('--skip-static', action='store_true',
+                            help='Do not check for or collect changed static files.')
+
+    def handle(self, *args, **options):
+        total = time.monotonic()
+        if not options['skip_migrate']:
+            self.phase('migrate', self.migrate)
+        if not options['skip_static']:
+            self.phase('collectstatic', self.collectstatic)
+        self.stdout.write(f'startup: done in {time.monotonic() - total:.2f}s')
+
+    def phase(self, name, func):
+        started = time.monotonic()
+        result = func()
+        self.stdout.write(f'startup: {name} {result} in {time.monotonic() - started:.2f}s')
+
+    def migrate(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            return 'skipped (no pending migrations)'
+        call_command('migrate', interactive=False, verbosity=0)
+        return f'applied {len(plan)} migration(s)'
+
+    def static_fingerprint(self):
+        """ Hash of every source static file's path, size & modification time. """
+        digest = hashlib.sha1()
+        for finder in get_finders():
+            for path, storage in finder.list(['CVS', '.*', '*~']):
+                stat = os.stat(storage.path(path))
+                digest.update(f'{path}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+        return digest.hexdigest()
+
+    def collectstatic(self):
+        fingerprint = self.static_fingerprint()
+        fingerprint_path = os.path.join(settings.STATIC_ROOT, self.fingerprint_name)
+        try:
+            with open(fingerprint_path) as f:
+                if f.read() == fingerprint:
+                    return 'skipped (static files unchanged)'
+        except FileNotFoundError:
+            pass
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(fingerprint_path, 'w') as f:
+            f.write(fingerprint)
+        return 'collected'
@@ -0,0 +1,151 @@
+"""
+Transportation Request Instrumentation
+
+RequestMetricsMiddleware times every request and counts its SQL queries
+(through a database execute wrapper) and template rendering, tagged by URL
+name. Slow requests are logged with their slowest queries, and the totals
+are kept in prometheus_client metrics, aggregated across gunicorn workers
+and rendered by the metrics view in the Prometheus text format.
+"""
+
+import contextvars
+import logging
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends import django as django_backend
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the response time histogram buckets.
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """ Measurements of one request. """
+
+    def __init__(self):
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+        self.queries = []
+
+    def record_query(self, sql, duration):
+        self.query_count += 1
+        self.sql_time += duration
+        self.queries.append((duration, sql))
+
+    def slowest_queries(self, count):
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:count]
+
+
+# Request metrics. Under gunicorn, serve.sh points PROMETHEUS_MULTIPROC_DIR at
+# a directory every worker writes its values to, so the totals survive worker
+# recycling & a scrape of any worker reports all of them.
+REQUESTS = Counter('tp_requests', 'Requests served.', ['view', 'method', 'status'])
+DURATION = Histogram('tp_request_duration_seconds', 'Response time.', ['view'],
+                     buckets=DURATION_BUCKETS)
+QUERIES = Counter('tp_db_queries', 'SQL queries executed.', ['view'])
+SQL_TIME = Counter('tp_db_duration_seconds', 'Time spent executing SQL.', ['view'])
+TEMPLATE_TIME = Counter('tp_template_duration_seconds', 'Time spent rendering templates.', ['view'])
+
+
+def observe(view, method, status, duration, metrics):
+    REQUESTS.labels(view, method, str(status)).inc()
+    DURATION.labels(view).observe(duration)
+    QUERIES.labels(view).inc(metrics.query_count)
+    SQL_TIME.labels(view).inc(metrics.sql_time)
+    TEMPLATE_TIME.labels(view).inc(metrics.template_time)
+
+
+def render():
+    """ Metrics of every worker, or of this process alone, in the Prometheus text format. """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def _instrument_templates():
+    """ Wrap the Django template backend so renders count toward the current request. """
+    template_class = django_backend.Template
+    if getattr(template_class.render, 'instrumented', False):
+        return
+    render = template_class.render
+
+    def instrumented_render(self, *args, **kwargs):
+        metrics = _current.get()
+        # Templates rendered from within a template, e.g. by render_table,
+        # are already part of the outer render's time.
+        if metrics is None or metrics.rendering:
+            return render(self, *args, **kwargs)
+        metrics.rendering = True
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics.rendering = False
+
+    instrumented_render.instrumented = True
+    template_class.render = instrumented_render
+
+
+class RequestMetricsMiddleware:
+    """Records query count, SQL, template & response time for every request.
+
+    Requests slower than TP_SLOW_REQUEST_MS are logged along with their
+    TP_SLOW_REQUEST_QUERIES slowest queries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrument_templates()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                metrics.record_query(sql, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None and match.view_name else 'unresolved'
+        observe(view, request.method, response.status_code, duration, metrics)
+
+        if duration * 1000 >= settings.TP_SLOW_REQUEST_MS:
+            queries = '\n'.join(
+                f'  {query_time * 1000:.1f}ms {sql[:300]}'
+                for query_time, sql in metrics.slowest_queries(settings.TP_SLOW_REQUEST_QUERIES)
+            )
+            logger.warning(
+                f'Slow request {request.method} {request.path} ({view}): {duration * 1000:.0f}ms, '
+                f'{metrics.query_count} queries in {metrics.sql_time * 1000:.0f}ms, '
+                f'templates {metrics.template_time * 1000:.0f}ms\n{queries}'
+            )
+        return response
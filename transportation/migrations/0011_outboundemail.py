@@ -0,0 +1,41 @@
+# Generated by Django 3.2.6 on 2026-10-18 20:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0010_auto_20200721_0815'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('status', models.PositiveSmallIntegerField(
+                    choices=[(0, 'Pending'), (1, 'Sent'), (2, 'Failed')], default=0,
+                    verbose_name='Status')),
+                ('subject', models.CharField(max_length=255, verbose_name='Subject')),
+                ('body', models.TextField(verbose_name='Body')),
+                ('from_email', models.CharField(
+                    blank=True, max_length=255, null=True, verbose_name='From')),
+                ('recipients', models.TextField(verbose_name='Recipients')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('next_attempt', models.DateTimeField(
+                    default=django.utils.timezone.now, verbose_name='Next Attempt')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('sent', models.DateTimeField(blank=True, null=True, verbose_name='Sent')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last Error')),
+            ],
+            options={
+                'ordering': ['next_attempt', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(fields=['status', 'next_attempt'], name='outbox_status_next_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.6 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0011_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='triprequest',
+            index=models.Index(fields=['driver', 'depart_est', 'return_est'],
+                               name='triprequest_driver_span_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='triprequest',
+            index=models.Index(fields=['vehicle', 'depart_est', 'return_est'],
+                               name='triprequest_vehicle_span_idx'),
+        ),
+    ]
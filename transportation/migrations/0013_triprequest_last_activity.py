@@ -0,0 +1,32 @@
+# Generated by Django 3.2.6 on 2026-10-18 20:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_last_activity(apps, schema_editor):
+    TripRequest = apps.get_model('transportation', 'TripRequest')
+    TripRequestActivity = apps.get_model('transportation', 'TripRequestActivity')
+    latest = TripRequestActivity.objects.filter(
+        request=models.OuterRef('pk')
+    ).order_by('-timestamp', '-id').values('id')[:1]
+    TripRequest.objects.update(last_activity=models.Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0012_triprequest_span_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='triprequest',
+            name='last_activity',
+            field=models.ForeignKey(
+                blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                related_name='+', to='transportation.triprequestactivity',
+                verbose_name='Last Activity'),
+        ),
+        migrations.RunPython(backfill_last_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.6 on 2026-10-18 20:59
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def normalize_name(name):
+    # Copy of transportation.search.normalize_name() as of this migration.
+    name = unicodedata.normalize('NFKD', name or '')
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^\w]+', ' ', name.casefold()).split())
+
+
+def populate_search_name(apps, schema_editor):
+    Driver = apps.get_model('transportation', 'Driver')
+    drivers = list(Driver.objects.only('id', 'first_name', 'last_name'))
+    for driver in drivers:
+        driver.search_name = normalize_name(f'{driver.first_name} {driver.last_name}')
+    Driver.objects.bulk_update(drivers, ['search_name'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0014_driver_name_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driver',
+            name='search_name',
+            field=models.CharField(
+                blank=True, db_index=True, default='', editable=False, max_length=65),
+        ),
+        migrations.RunPython(populate_search_name, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='triprequest',
+            name='recommended_driver',
+            field=models.ForeignKey(
+                blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                related_name='+', to='transportation.driver', verbose_name='Recommended Driver'),
+        ),
+        migrations.AddField(
+            model_name='triprequest',
+            name='requested_driver_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.6 on 2026-10-18 21:00
+
+from django.db import migrations, models
+import django.db.models.functions.datetime
+
+
+# The contact name & email filters are icontains, i.e. UPPER(col::text) LIKE
+# UPPER('%q%'), which only a trigram index can serve (PostgreSQL only).
+TRIGRAM_INDEXES = (
+    ('triprequest_contact_fn_trgm_idx', 'contact_fn'),
+    ('triprequest_contact_ln_trgm_idx', 'contact_ln'),
+    ('triprequest_contact_email_trgm_idx', 'contact_email'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON transportation_triprequest '
+            f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0015_driver_search_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='triprequest',
+            index=models.Index(
+                models.F('status'), django.db.models.functions.datetime.TruncDate('depart_est'),
+                name='triprequest_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='triprequest',
+            index=models.Index(fields=['requestor', 'submitted'],
+                               name='triprequest_requestor_sub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='triprequest',
+            index=models.Index(django.db.models.functions.datetime.TruncDate('depart_est'),
+                               name='triprequest_depart_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='triprequest',
+            index=models.Index(fields=['submitted'], name='triprequest_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='triprequest',
+            index=models.Index(fields=['updated'], name='triprequest_updated_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 3.2.6 on 2026-10-18 21:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0016_triprequest_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('name', models.CharField(
+                    max_length=32, primary_key=True, serialize=False, verbose_name='Name')),
+                ('refreshed', models.DateTimeField(verbose_name='Refreshed')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StaleRollupDate',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False, verbose_name='Date')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='vehiclemaintenance',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Updated'),
+        ),
+        migrations.CreateModel(
+            name='DailyTripStat',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='Date')),
+                ('vehicle_type', models.PositiveSmallIntegerField(choices=[
+                    (0, 'Unknown'), (1, 'Car'), (2, 'Passenger Van'), (3, 'Cargo Van'), (4, 'Bus'),
+                    (5, 'Coach Bus'), (6, 'Road Bus'), (7, 'Truck'), (8, 'Non-CDL Bus'),
+                    (9, 'Golf Cart')
+                ], verbose_name='Vehicle Type')),
+                ('trips', models.PositiveIntegerField(default=0, verbose_name='Trips')),
+                ('party_count', models.PositiveIntegerField(
+                    default=0, verbose_name='Party Count')),
+                ('mileage_est', models.PositiveIntegerField(
+                    default=0, verbose_name='Estimated Mileage')),
+                ('mileage_act', models.PositiveIntegerField(
+                    default=0, verbose_name='Actual Mileage')),
+                ('fuel_cost', models.DecimalField(
+                    decimal_places=2, default=0, max_digits=12, verbose_name='Fuel Cost')),
+                ('budget', models.ForeignKey(
+                    blank=True, null=True, on_delete=django.db.models.deletion.CASCADE,
+                    related_name='+', to='transportation.budget', verbose_name='Budget')),
+                ('department', models.ForeignKey(
+                    blank=True, null=True, on_delete=django.db.models.deletion.CASCADE,
+                    related_name='+', to='transportation.department', verbose_name='Department')),
+                ('org', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='+',
+                    to='transportation.organization', verbose_name='Organization')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyMaintenanceStat',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='Date')),
+                ('vehicle_type', models.PositiveSmallIntegerField(choices=[
+                    (0, 'Unknown'), (1, 'Car'), (2, 'Passenger Van'), (3, 'Cargo Van'), (4, 'Bus'),
+                    (5, 'Coach Bus'), (6, 'Road Bus'), (7, 'Truck'), (8, 'Non-CDL Bus'),
+                    (9, 'Golf Cart')
+                ], verbose_name='Vehicle Type')),
+                ('count', models.PositiveIntegerField(
+                    default=0, verbose_name='Maintenance Count')),
+                ('cost', models.DecimalField(
+                    decimal_places=2, default=0, max_digits=12, verbose_name='Maintenance Cost')),
+                ('org', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='+',
+                    to='transportation.organization', verbose_name='Organization')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dailytripstat',
+            index=models.Index(fields=['date', 'org'], name='dailytripstat_date_org_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailymaintenancestat',
+            index=models.Index(fields=['date', 'org'], name='dailymaintstat_date_org_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.6 on 2026-10-18 21:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0017_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedRecord',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=32, verbose_name='Model')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Object ID')),
+                ('deleted', models.DateTimeField(
+                    default=django.utils.timezone.now, verbose_name='Deleted')),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='triprequest',
+            name='triprequest_updated_idx',
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Updated'),
+        ),
+        migrations.AddIndex(
+            model_name='triprequest',
+            index=models.Index(fields=['updated', 'id'], name='triprequest_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['updated', 'id'], name='vehicle_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedrecord',
+            index=models.Index(fields=['model', 'deleted', 'id'], name='deletedrecord_model_idx'),
+        ),
+    ]
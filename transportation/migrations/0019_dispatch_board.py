@@ -0,0 +1,18 @@
+# Generated by Django 3.2.6 on 2026-10-18 21:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0018_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='triprequest',
+            index=models.Index(fields=['return_est', 'depart_est'],
+                               name='triprequest_return_span_idx'),
+        ),
+    ]
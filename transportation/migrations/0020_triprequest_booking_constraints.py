@@ -0,0 +1,60 @@
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+
+# Approved & returned trips (TripRequest.BOOKED_STATUSES) can't overlap for
+# one vehicle or driver. The exclusion constraints are PostgreSQL only, so
+# they're created here rather than declared in TripRequest.Meta.constraints;
+# other databases fall back to the checks in models.guard_bookings().
+BOOKED_STATUSES = '2, 7'
+# An empty range for the odd trip returning before it departs, which would
+# otherwise make tstzrange() raise.
+RANGE = "tstzrange(depart_est, GREATEST(depart_est, return_est), '[)')"
+CONSTRAINTS = (
+    ('triprequest_vehicle_no_overlap', 'vehicle_id'),
+    ('triprequest_driver_no_overlap', 'driver_id'),
+)
+
+
+def create_constraints(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in CONSTRAINTS:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT a.id, b.id FROM transportation_triprequest a '
+                f'JOIN transportation_triprequest b ON a.{column} = b.{column} AND a.id < b.id '
+                f'AND a.depart_est < b.return_est AND b.depart_est < a.return_est '
+                f'WHERE a.status IN ({BOOKED_STATUSES}) AND b.status IN ({BOOKED_STATUSES}) '
+                f'LIMIT 20'
+            )
+            overlaps = cursor.fetchall()
+        if overlaps:
+            raise RuntimeError(
+                f'Trip requests are double booked by {column}, reassign or cancel one of each pair '
+                f'before migrating: {overlaps}')
+        schema_editor.execute(
+            f'ALTER TABLE transportation_triprequest ADD CONSTRAINT {name} '
+            f'EXCLUDE USING gist ({column} WITH =, {RANGE} WITH &&) '
+            f'WHERE (status IN ({BOOKED_STATUSES}) AND {column} IS NOT NULL)'
+        )
+
+
+def drop_constraints(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in CONSTRAINTS:
+        schema_editor.execute(
+            f'ALTER TABLE transportation_triprequest DROP CONSTRAINT IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0019_dispatch_board'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.RunPython(create_constraints, drop_constraints),
+    ]
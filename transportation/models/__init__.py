@@ -4,3 +4,6 @@ from .triprequests import *
 from .users import *
 from .vehicles import *
 from .settings import *
+from .outbox import *
+from .rollups import *
+from .changes import *
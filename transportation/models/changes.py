@@ -0,0 +1,30 @@
+from django.db import models
+from django.utils import timezone
+
+
+class DeletedRecord(models.Model):
+    """ Tombstone of a deleted row, so the change feed can report deletions. """
+
+    id = models.AutoField(primary_key=True)
+
+    model = models.CharField(
+        max_length=32,
+        verbose_name='Model'
+    )
+
+    object_id = models.PositiveIntegerField(
+        verbose_name='Object ID'
+    )
+
+    deleted = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Deleted'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'deleted', 'id'], name='deletedrecord_model_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id} deleted {self.deleted}'
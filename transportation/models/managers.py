@@ -1,5 +1,93 @@
 from django.db import models
+from django.db.models import F, Q
 
 
 class DriverManager(models.Manager):
     pass
+
+
+class TripRequestQuerySet(models.QuerySet):
+    # Columns rendered by tables.TripRequestTable, including the related
+    # names used by org_department.
+    TABLE_FIELDS = (
+        'id', 'status', 'submitted', 'depart_est',
+        'contact_fn', 'contact_ln', 'contact_email',
+        'vehicle_type',
+        'org', 'org__name',
+        'department', 'department__name',
+    )
+
+    def for_table(self):
+        """ Queryset planned for TripRequestTable, one query per page. """
+        return self.select_related('org', 'department').only(*self.TABLE_FIELDS)
+
+    def blocking(self):
+        """ Trips that hold their driver & vehicle, i.e. not denied or cancelled. """
+        return self.exclude(status__in=(self.model.STATUS_DENIED, self.model.STATUS_CANCELLED))
+
+    def overlapping(self, start, end):
+        """ Trips whose estimated [depart, return) interval intersects [start, end). """
+        return self.filter(depart_est__lt=end, return_est__gt=start)
+
+    def booked(self):
+        """ Trips that hold their driver & vehicle exclusively, i.e. approved or returned. """
+        return self.filter(status__in=self.model.BOOKED_STATUSES)
+
+    def reportable(self):
+        """ Trips that took or will take place, i.e. approved, returned or completed. """
+        return self.filter(
+            status__in=self.model.BOOKED_STATUSES + (self.model.STATUS_COMPLETED,))
+
+    def booking_conflicts(self, triprequests):
+        """Double bookings booking triprequests would make, with one query.
+
+        triprequests are checked in order against the other booked trips &
+        the ones before them, as if booked one at a time.
+
+        Arguments:
+            triprequests {list} -- Trip requests to book, saved or not
+
+        Returns:
+            list -- (trip request, field, conflicting trip request) tuples, field being
+                    'vehicle' or 'driver'
+        """
+        # Trips returning before they depart book nothing, as in the constraints.
+        triprequests = [
+            t for t in triprequests
+            if t.depart_est is not None and t.return_est is not None and t.depart_est < t.return_est
+        ]
+        vehicles = {t.vehicle_id for t in triprequests if t.vehicle_id is not None}
+        drivers = {t.driver_id for t in triprequests if t.driver_id is not None}
+        if not vehicles and not drivers:
+            return []
+        booked = list(
+            self.booked()
+            .overlapping(min(t.depart_est for t in triprequests),
+                         max(t.return_est for t in triprequests))
+            .filter(Q(vehicle_id__in=vehicles) | Q(driver_id__in=drivers),
+                    return_est__gt=F('depart_est'))
+            .exclude(pk__in=[t.pk for t in triprequests if t.pk is not None])
+            .order_by('depart_est', 'id')
+            .only('id', 'vehicle_id', 'driver_id', 'depart_est', 'return_est')
+        )
+        conflicts = []
+        for triprequest in triprequests:
+            for other in booked:
+                if other.depart_est >= triprequest.return_est \
+                        or other.return_est <= triprequest.depart_est:
+                    continue
+                field = next((
+                    f for f in ('vehicle', 'driver')
+                    if getattr(triprequest, f'{f}_id') is not None
+                    and getattr(triprequest, f'{f}_id') == getattr(other, f'{f}_id')
+                ), None)
+                if field is not None:
+                    conflicts.append((triprequest, field, other))
+                    break
+            else:
+                booked.append(triprequest)
+        return conflicts
+
+
+class TripRequestManager(models.Manager.from_queryset(TripRequestQuerySet)):
+    pass
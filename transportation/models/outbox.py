@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
+
+
+class OutboundEmail(models.Model):
+    STATUS_PENDING = 0
+    STATUS_SENT = 1
+    STATUS_FAILED = 2
+    STATUS_CHOICES = (
+        (STATUS_PENDING,    'Pending'),
+        (STATUS_SENT,       'Sent'),
+        (STATUS_FAILED,     'Failed'),
+    )
+
+    id = models.AutoField(primary_key=True)
+
+    status = models.PositiveSmallIntegerField(
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name='Status'
+    )
+
+    subject = models.CharField(
+        max_length=255,
+        verbose_name='Subject'
+    )
+
+    body = models.TextField(
+        verbose_name='Body'
+    )
+
+    from_email = models.CharField(
+        max_length=255,
+        null=True, blank=True,
+        verbose_name='From'
+    )
+
+    recipients = models.TextField(
+        verbose_name='Recipients'
+    )
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created'
+    )
+
+    next_attempt = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Next Attempt'
+    )
+
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Attempts'
+    )
+
+    sent = models.DateTimeField(
+        null=True, blank=True,
+        verbose_name='Sent'
+    )
+
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Last Error'
+    )
+
+    @property
+    def recipient_list(self):
+        return [r for r in self.recipients.split(',') if r]
+
+    def __str__(self):
+        return f'{self.subject} to {self.recipients}'
+
+    def mark_sent(self):
+        self.status = OutboundEmail.STATUS_SENT
+        self.sent = timezone.now()
+        self.attempts += 1
+        self.last_error = ''
+        self.save(update_fields=['status', 'sent', 'attempts', 'last_error'])
+
+    def mark_failed(self, error, max_attempts, retry_delay):
+        """ Record a failed delivery, backing off exponentially until max_attempts. """
+        self.attempts += 1
+        self.last_error = str(error)
+        if self.attempts >= max_attempts:
+            self.status = OutboundEmail.STATUS_FAILED
+        else:
+            delay = retry_delay * (2 ** (self.attempts - 1))
+            self.next_attempt = timezone.now() + timedelta(seconds=delay)
+        self.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt'])
+
+    class Meta:
+        ordering = ['next_attempt', 'id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt'], name='outbox_status_next_idx'),
+        ]
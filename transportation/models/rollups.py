@@ -0,0 +1,108 @@
+from django.db import models
+
+from .vehicles import Vehicle
+
+
+class DailyTripStat(models.Model):
+    """ Trips departing on one day, per org, department, budget & vehicle type. """
+
+    id = models.AutoField(primary_key=True)
+
+    date = models.DateField(verbose_name='Date')
+
+    org = models.ForeignKey(
+        'Organization',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Organization'
+    )
+
+    department = models.ForeignKey(
+        'Department',
+        null=True, blank=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Department'
+    )
+
+    budget = models.ForeignKey(
+        'Budget',
+        null=True, blank=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Budget'
+    )
+
+    vehicle_type = models.PositiveSmallIntegerField(
+        choices=Vehicle.TYPE_CHOICES,
+        verbose_name='Vehicle Type'
+    )
+
+    trips = models.PositiveIntegerField(default=0, verbose_name='Trips')
+    party_count = models.PositiveIntegerField(default=0, verbose_name='Party Count')
+    mileage_est = models.PositiveIntegerField(default=0, verbose_name='Estimated Mileage')
+    mileage_act = models.PositiveIntegerField(default=0, verbose_name='Actual Mileage')
+
+    fuel_cost = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name='Fuel Cost'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'org'], name='dailytripstat_date_org_idx'),
+        ]
+
+
+class DailyMaintenanceStat(models.Model):
+    """ Vehicle maintenance on one day, per org & vehicle type. """
+
+    id = models.AutoField(primary_key=True)
+
+    date = models.DateField(verbose_name='Date')
+
+    org = models.ForeignKey(
+        'Organization',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Organization'
+    )
+
+    vehicle_type = models.PositiveSmallIntegerField(
+        choices=Vehicle.TYPE_CHOICES,
+        verbose_name='Vehicle Type'
+    )
+
+    count = models.PositiveIntegerField(default=0, verbose_name='Maintenance Count')
+
+    cost = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name='Maintenance Cost'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'org'], name='dailymaintstat_date_org_idx'),
+        ]
+
+
+class StaleRollupDate(models.Model):
+    """Day whose rollups must be recomputed although no changed row departs on it.
+
+    Recorded when a trip or maintenance record is deleted or moved to
+    another day, which the ``updated`` watermark alone cannot see.
+    """
+
+    date = models.DateField(primary_key=True, verbose_name='Date')
+
+
+class RollupCheckpoint(models.Model):
+    """ When a rollup was last refreshed, i.e. its ``updated`` watermark. """
+
+    name = models.CharField(max_length=32, primary_key=True, verbose_name='Name')
+
+    refreshed = models.DateTimeField(verbose_name='Refreshed')
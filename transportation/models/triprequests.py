@@ -1,4 +1,8 @@
-from django.db import models
+from contextlib import contextmanager
+
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import TruncDate
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -9,6 +13,10 @@ from phone_field import PhoneField
 
 from transportation import validators
 
+from .managers import (
+    TripRequestManager
+)
+
 
 class TripRequest(models.Model):
     STATUS_NONE = 0
@@ -30,6 +38,14 @@ class TripRequest(models.Model):
         (STATUS_RETURNED,       'Returned'),
     )
 
+    # Statuses holding the trip's driver & vehicle exclusively, enforced by the
+    # exclusion constraints named in BOOKING_CONSTRAINTS on PostgreSQL.
+    BOOKED_STATUSES = (STATUS_APPROVED, STATUS_RETURNED)
+    BOOKING_CONSTRAINTS = {
+        'vehicle': 'triprequest_vehicle_no_overlap',
+        'driver': 'triprequest_driver_no_overlap',
+    }
+
     TYPE_UNKNOWN = 0
     TYPE_CAR = 1
     TYPE_PVAN = 2
@@ -68,6 +84,8 @@ class TripRequest(models.Model):
         (KEY_WHITE,  'White')
     )
 
+    objects = TripRequestManager()
+
     id = models.AutoField(primary_key=True)
 
     status = models.PositiveSmallIntegerField(
@@ -147,6 +165,24 @@ class TripRequest(models.Model):
         null=True, blank=True
     )
 
+    # Best match for requested_driver, resolved once by
+    # search.recommend_driver & re-resolved when requested_driver_key no
+    # longer matches the normalized requested_driver.
+    recommended_driver = models.ForeignKey(
+        'Driver',
+        null=True, blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Recommended Driver'
+    )
+
+    requested_driver_key = models.CharField(
+        max_length=255,
+        blank=True, default='',
+        editable=False
+    )
+
     driver = models.ForeignKey(
         'Driver',
         null=True, blank=True,
@@ -255,14 +291,24 @@ class TripRequest(models.Model):
         null=True, blank=True
     )
 
+    last_activity = models.ForeignKey(
+        'TripRequestActivity',
+        null=True, blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Last Activity'
+    )
+
     @property
     def is_modifiable(self):
         return self.status != 3 and self.status != 4 and self.status != 5
 
     @property
     def last_updator(self):
-        last_activity = TripRequestActivity.objects.filter(request=self).latest()
-        return last_activity.user
+        if self.last_activity is None:
+            return None
+        return self.last_activity.user
 
     @property
     def fuel_cost_display(self):
@@ -407,7 +453,14 @@ class TripRequest(models.Model):
         return reverse('request-detail', kwargs={'pk': self.id})
 
     def save(self, *args, **kwargs):
+        """Save, logging one activity: created, edited or ``activity_type``.
+
+        Arguments:
+            user {User} -- Who made the change, recorded on the activity
+            activity_type {int} -- TripRequestActivity type, for updates other than a plain edit
+        """
         user = kwargs.pop('user', None)
+        activity_type = kwargs.pop('activity_type', None)
 
         activity = TripRequestActivity()
         activity.type = TripRequestActivity.TYPE_CREATED if self.pk is None else TripRequestActivity.TYPE_EDITED
@@ -424,10 +477,33 @@ class TripRequest(models.Model):
                     _(f'Unable to create new request with status != {TripRequest.STATUS_PENDING}'),
                     params={'raised': ve, 'triprequest': self}
                 )
+            super().save(*args, **kwargs)
+            activity.request = self
+            activity.save()
+            return
 
-        super().save(*args, **kwargs)
-        activity.request = self
-        activity.save()
+        if activity_type is not None:
+            activity.type = activity_type
+        # The activity goes in first so the request's own UPDATE can point
+        # last_activity at it.
+        with guard_bookings([self] if self.status in TripRequest.BOOKED_STATUSES else []):
+            activity.request = self
+            activity.save(update_request=False)
+            self.last_activity = activity
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'updated', 'last_activity'}
+            super().save(*args, **kwargs)
+
+    def transition(self, status, activity_type, user=None):
+        """Move to status with one UPDATE & one activity of activity_type.
+
+        Arguments:
+            status {int} -- New TripRequest status
+            activity_type {int} -- TripRequestActivity type to log
+            user {User} -- Who made the change
+        """
+        self.status = status
+        self.save(user=user, activity_type=activity_type, update_fields=['status'])
 
     def assign_moderator(self, commit=False, *args, **kwargs):
         self.manager = kwargs.get('user', None)
@@ -440,41 +516,22 @@ class TripRequest(models.Model):
         if self.vehicle is not None and self.driver is not None:
             self.status = TripRequest.STATUS_APPROVED
             if commit:
-                self.save()
-                user = kwargs.pop('user', None)
-                real_user = user is not None
-                activity = TripRequestActivity()
-                activity.user = user
-                activity.request = self
-                activity.type = TripRequestActivity.TYPE_APPROVED
-                activity.save()
+                self.transition(
+                    self.status, TripRequestActivity.TYPE_APPROVED, kwargs.pop('user', None))
         else:
             raise ValidationError(_(f'Must meet requirements'))
 
     def deny(self, commit=False, *args, **kwargs):
         self.status = TripRequest.STATUS_DENIED
         if commit:
-            self.save()
-            user = kwargs.pop('user', None)
-            real_user = user is not None
-            activity = TripRequestActivity()
-            activity.user = user
-            activity.request = self
-            activity.type = TripRequestActivity.TYPE_DENIED
-            activity.save()
+            self.transition(self.status, TripRequestActivity.TYPE_DENIED, kwargs.pop('user', None))
 
     def return_vehicle(self, commit=False, *args, **kwargs):
         if self.vehicle is not None and self.driver is not None:
             self.status = TripRequest.STATUS_RETURNED
             if commit:
-                self.save()
-                user = kwargs.pop('user', None)
-                real_user = user is not None
-                activity = TripRequestActivity()
-                activity.user = user
-                activity.request = self
-                activity.type = TripRequestActivity.TYPE_FINISHED
-                activity.save()
+                self.transition(
+                    self.status, TripRequestActivity.TYPE_FINISHED, kwargs.pop('user', None))
         else:
             raise ValidationError(_(f'Must meet requirements'))
 
@@ -482,32 +539,91 @@ class TripRequest(models.Model):
         if self.vehicle is not None and self.driver is not None:
             self.status = TripRequest.STATUS_COMPLETED
             if commit:
-                self.save()
-                user = kwargs.pop('user', None)
-                real_user = user is not None
-                activity = TripRequestActivity()
-                activity.user = user
-                activity.request = self
-                activity.type = TripRequestActivity.TYPE_FINISHED
-                activity.save()
+                self.transition(
+                    self.status, TripRequestActivity.TYPE_FINISHED, kwargs.pop('user', None))
         else:
             raise ValidationError(_(f'Must meet requirements'))
 
     def cancel(self, commit=False, *args, **kwargs):
         self.status = TripRequest.STATUS_CANCELLED
         if commit:
-            self.save()
-            user = kwargs.pop('user', None)
-            real_user = user is not None
-            activity = TripRequestActivity()
-            activity.user = user
-            activity.request = self
-            activity.type = TripRequestActivity.TYPE_CANCELLED
-            activity.save()
+            self.transition(
+                self.status, TripRequestActivity.TYPE_CANCELLED, kwargs.pop('user', None))
 
     class Meta:
         get_latest_by = 'updated'
         ordering = ['updated']
+        indexes = [
+            models.Index(fields=['driver', 'depart_est', 'return_est'],
+                         name='triprequest_driver_span_idx'),
+            models.Index(fields=['vehicle', 'depart_est', 'return_est'],
+                         name='triprequest_vehicle_span_idx'),
+            # The dispatch board's fleet-wide overlap query. Trips overlapping a
+            # window end after its start, which (unlike departing before its
+            # end) excludes the whole history before a recent window.
+            models.Index(fields=['return_est', 'depart_est'],
+                         name='triprequest_return_span_idx'),
+            # TripRequestFilter: status with a depart date range, a requestor's
+            # own requests in list order, and the date range on its own. The
+            # range filters compare depart_est's date in TIME_ZONE, hence the
+            # expressions, which have to be rebuilt if TIME_ZONE changes.
+            models.Index(F('status'), TruncDate('depart_est'),
+                         name='triprequest_status_date_idx'),
+            models.Index(fields=['requestor', 'submitted'],
+                         name='triprequest_requestor_sub_idx'),
+            models.Index(TruncDate('depart_est'),
+                         name='triprequest_depart_date_idx'),
+            models.Index(fields=['submitted'],
+                         name='triprequest_submitted_idx'),
+            # Change feed & API cursor order (see transportation.changes).
+            models.Index(fields=['updated', 'id'],
+                         name='triprequest_updated_id_idx'),
+        ]
+
+
+def booking_error(triprequest, field, other):
+    """ ValidationError for triprequest's field double booking it with trip request other. """
+    depart, returns = timezone.localtime(other.depart_est), timezone.localtime(other.return_est)
+    when = f'{depart:%Y-%m-%d %H:%M} - {returns:%Y-%m-%d %H:%M}'
+    return ValidationError(
+        {field: ValidationError(
+            _(f'{field.capitalize()} is already booked by trip request {other.pk} ({when})'),
+            code='double_booked',
+            params={'triprequest': triprequest, 'conflict': other}
+        )}
+    )
+
+
+@contextmanager
+def guard_bookings(triprequests):
+    """Raise a booking_error() rather than let the enclosed writes double book triprequests.
+
+    PostgreSQL enforces this with exclusion constraints, whose violations are
+    turned into the error. Elsewhere the bookings are checked after the
+    writes in their transaction, which on SQLite holds the database lock
+    until commit, so a concurrent booking can't slip in between.
+
+    Arguments:
+        triprequests {list} -- Trip requests the writes book
+    """
+    with transaction.atomic():
+        if not triprequests:
+            yield
+            return
+        try:
+            with transaction.atomic():
+                yield
+        except IntegrityError as e:
+            if not any(name in str(e) for name in TripRequest.BOOKING_CONSTRAINTS.values()):
+                raise
+            conflicts = TripRequest.objects.booking_conflicts(triprequests)
+            if not conflicts:
+                raise
+            raise booking_error(*conflicts[0]) from e
+        if connection.vendor != 'postgresql':
+            conflicts = TripRequest.objects.booking_conflicts(triprequests)
+            if conflicts:
+                raise booking_error(*conflicts[0])
 
 
 class TripRequestActivity(models.Model):
@@ -550,5 +666,32 @@ class TripRequestActivity(models.Model):
         verbose_name='Trip Request'
     )
 
+    @classmethod
+    def log_many(cls, request_ids, activity_type, user=None, **update):
+        """Log one activity of activity_type on each trip request, with bulk queries.
+
+        Arguments:
+            request_ids {list} -- Trip request IDs
+            activity_type {int} -- Activity type
+            user {User} -- Who made the change
+            update -- Other TripRequest fields to set in the same UPDATE as last_activity
+        """
+        cls.objects.bulk_create(
+            cls(request_id=pk, user=user, type=activity_type) for pk in request_ids)
+        latest = cls.objects.filter(
+            request=OuterRef('pk')).order_by('-timestamp', '-id').values('id')[:1]
+        TripRequest.objects.filter(pk__in=request_ids).update(
+            last_activity=Subquery(latest), **update)
+
+    def save(self, *args, update_request=True, **kwargs):
+        super().save(*args, **kwargs)
+        if not update_request:
+            return
+        # Keep TripRequest.last_activity pointing at the newest activity so
+        # pages can show who touched a request last without querying the log.
+        TripRequest.objects.filter(pk=self.request_id).update(last_activity=self)
+        if TripRequestActivity.request.is_cached(self):
+            self.request.last_activity = self
+
     class Meta:
         get_latest_by = 'timestamp'
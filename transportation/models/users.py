@@ -127,6 +127,14 @@ class Driver(models.Model):
 
     notes = models.TextField(blank=True)
 
+    # Normalized full name (see search.normalize_name), kept in sync on save.
+    search_name = models.CharField(
+        max_length=65,
+        blank=True, default='',
+        editable=False,
+        db_index=True
+    )
+
     @property
     def full_name(self):
         return f'{self.first_name} {self.last_name}'
@@ -141,10 +149,21 @@ class Driver(models.Model):
     def __str__(self):
         return self.full_name
 
+    def save(self, *args, **kwargs):
+        from transportation.search import normalize_name
+        search_name = normalize_name(self.full_name)
+        # Read by the signal handlers, only renames affect recommended drivers.
+        self._renamed = search_name != self.__dict__.get('search_name')
+        self.search_name = search_name
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'first_name', 'last_name'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'search_name'}
+        super().save(*args, **kwargs)
+
     def is_available(self, start, end):
-        queryset = self.get_assigned_trips(future_only=True)
-        range_count = queryset.filter(depart_est__gte=start, return_est__lte=end).count()
-        return range_count == 0
+        from .triprequests import TripRequest
+        queryset = TripRequest.objects.blocking().overlapping(start, end)
+        return not queryset.filter(driver=self).exists()
 
     @property
     def has_future_trips(self):
@@ -127,6 +127,8 @@ class Vehicle(models.Model):
 
     notes = models.TextField(blank=True)
 
+    updated = models.DateTimeField(auto_now=True, verbose_name='Updated')
+
     @property
     def fullname(self):
         return f'{self.year} {self.make} {self.model}'
@@ -147,6 +149,11 @@ class Vehicle(models.Model):
             activity.type = VehicleActivity.TYPE_EDITED
         activity.save()
 
+    def is_available(self, start, end):
+        from .triprequests import TripRequest
+        queryset = TripRequest.objects.blocking().overlapping(start, end)
+        return not queryset.filter(vehicle=self).exists()
+
     def get_assigned_trips(self, future_only=False):
         from .triprequests import TripRequest
         queryset = TripRequest.objects.filter(driver=self)
@@ -163,6 +170,10 @@ class Vehicle(models.Model):
 
     class Meta:
         ordering = ['num']
+        indexes = [
+            # Change feed order (see transportation.changes).
+            models.Index(fields=['updated', 'id'], name='vehicle_updated_id_idx'),
+        ]
 
 
 class VehicleActivity(models.Model):
@@ -253,6 +264,12 @@ class VehicleMaintenance(models.Model):
         verbose_name='Notes'
     )
 
+    updated = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Updated'
+    )
+
     def save(self, *args, **kwargs):
         created = self.pk is None
         user = kwargs.pop('user', None)
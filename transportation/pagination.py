@@ -0,0 +1,199 @@
+"""
+Transportation Table Pagination
+
+Keyset (cursor) pagination for the django-tables2 list views. Rather than
+counting the whole filtered table and skipping OFFSET rows, each page is
+fetched as the rows after (or before) the last (or first) row of the page the
+user came from, which an index on the ordering fields serves at any depth.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from django_tables2 import LazyPaginator
+
+
+class CursorPage:
+    """ One page of rows plus the cursors of its neighbours. """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """Pages a queryset by its unique ordering rather than by OFFSET.
+
+    Arguments:
+        queryset {QuerySet} -- Rows to page through
+        ordering {tuple} -- Field names, optionally prefixed with '-', ending in a unique field
+        per_page {int} -- Rows per page
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+
+    def _fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def encode(self, direction, row):
+        # value_to_string keeps full precision, e.g. datetime microseconds,
+        # which the seek needs to land exactly after the row.
+        opts = self.queryset.model._meta
+        values = [opts.get_field(name).value_to_string(row) for name in self._fields()]
+        data = json.dumps([direction, values])
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in ('n', 'p') or len(values) != len(self.ordering):
+                raise ValueError
+            opts = self.queryset.model._meta
+            return direction, [opts.get_field(name).to_python(value)
+                               for name, value in zip(self._fields(), values)]
+        except (ValueError, TypeError, ValidationError):
+            raise ValidationError(f'Invalid cursor: {cursor}')
+
+    def _seek(self, values, forward):
+        """ Rows strictly after (or before) values in the ordering. """
+        condition = Q()
+        for i, name in enumerate(self.ordering):
+            field = name.lstrip('-')
+            ascending = not name.startswith('-')
+            lookup = 'gt' if ascending == forward else 'lt'
+            equal = {self._fields()[j]: values[j] for j in range(i)}
+            condition |= Q(**equal, **{f'{field}__{lookup}': values[i]})
+        return condition
+
+    def _reversed(self):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+    def page(self, cursor=None):
+        """Rows for cursor, or the first page when cursor is empty.
+
+        Arguments:
+            cursor {str} -- Cursor from a previous page's next/previous link
+
+        Raises:
+            ValidationError: The cursor could not be decoded
+
+        Returns:
+            CursorPage -- The page
+        """
+        if not cursor:
+            rows = list(self.queryset.order_by(*self.ordering)[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return CursorPage(rows, next_cursor=self.encode('n', rows[-1]) if more else None)
+
+        direction, values = self.decode(cursor)
+        forward = direction == 'n'
+        ordering = self.ordering if forward else self._reversed()
+        queryset = self.queryset.filter(self._seek(values, forward)).order_by(*ordering)
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        if not rows:
+            return CursorPage(rows)
+
+        # Coming from a neighbouring page means that page exists.
+        has_next = more if forward else True
+        has_previous = True if forward else more
+        return CursorPage(
+            rows,
+            next_cursor=self.encode('n', rows[-1]) if has_next else None,
+            previous_cursor=self.encode('p', rows[0]) if has_previous else None
+        )
+
+
+class CursorPaginationMixin:
+    """Opt-in keyset pagination for SingleTableMixin list views.
+
+    With cursor_pagination enabled the table is paged by cursor_ordering and
+    rendered with next/previous links, with no COUNT or OFFSET. Links to a
+    numbered ?page= and sorted (?sort=) tables still work, falling back to
+    offset pagination with LazyPaginator, which also skips the COUNT.
+    """
+
+    cursor_pagination = False
+    cursor_ordering = ('submitted', 'id')
+    cursor_kwarg = 'cursor'
+    max_per_page = 100
+
+    cursor_page = None
+
+    def uses_cursor(self):
+        return (
+            self.cursor_pagination and
+            'page' not in self.request.GET and
+            'sort' not in self.request.GET
+        )
+
+    def get_per_page(self):
+        try:
+            per_page = int(self.request.GET.get('per_page', self.paginate_by))
+        except ValueError:
+            per_page = self.paginate_by
+        return max(1, min(per_page, self.max_per_page))
+
+    def get_paginate_by(self, queryset):
+        # The table pages itself; don't have MultipleObjectMixin COUNT it too.
+        if self.cursor_pagination:
+            return None
+        return super().get_paginate_by(queryset)
+
+    def get_table_pagination(self, table):
+        if not self.cursor_pagination:
+            return super().get_table_pagination(table)
+        if self.uses_cursor():
+            return False
+        paginate = super().get_table_pagination(table)
+        if isinstance(paginate, dict):
+            paginate.setdefault('paginator_class', LazyPaginator)
+        return paginate
+
+    def get_table_data(self):
+        data = super().get_table_data()
+        if not self.uses_cursor():
+            return data
+        paginator = KeysetPaginator(data, self.cursor_ordering, self.get_per_page())
+        try:
+            self.cursor_page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except ValidationError:
+            # A mangled or stale link just starts over from the first page.
+            self.cursor_page = paginator.page()
+        return self.cursor_page.object_list
+
+    def get_cursor_url(self, cursor):
+        params = self.request.GET.copy()
+        params[self.cursor_kwarg] = cursor
+        return f'?{params.urlencode()}'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = self.cursor_page
+        if page is not None:
+            context['cursor_page'] = page
+            context['next_page_url'] = (
+                self.get_cursor_url(page.next_cursor) if page.has_next else None)
+            context['previous_page_url'] = (
+                self.get_cursor_url(page.previous_cursor) if page.has_previous else None)
+        return context
@@ -0,0 +1,263 @@
+"""
+Transportation Reports
+
+Fleet cost & utilization over a date range, computed with grouped aggregate
+queries (one per breakdown) rather than by walking trips in Python. Results
+are plain dicts & lists so they can be kept in the shared cache for
+TP_REPORT_CACHE_TIMEOUT seconds per (report, parameters).
+
+The organization report, which spans the most trips, reads the daily
+rollups (see transportation.rollups); the others query the trips directly.
+
+Trips are the approved, returned & completed ones (TripRequest.reportable);
+pending requests may still be denied.
+Booked hours are the part of each trip's estimated interval that falls
+inside the range; trip counts, mileage & fuel cost are attributed to the
+range the trip departs in.
+"""
+
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+
+from dateutil.parser import parse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import (
+    Count, Sum, Q, F, Value, DateTimeField, DurationField, ExpressionWrapper
+)
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from transportation import models
+
+
+DEFAULT_RANGE_DAYS = 365
+
+
+class ReportRange:
+    """Inclusive range of dates a report covers.
+
+    Arguments:
+        start {date} -- First day
+        end {date} -- Last day
+    """
+
+    def __init__(self, start, end):
+        if start > end:
+            raise ValidationError(_('The report start must not be after its end'))
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_params(cls, params):
+        """ Range from the ``start`` & ``end`` query parameters, defaulting to the last year. """
+        try:
+            end = parse(params['end']).date() if params.get('end') else timezone.localdate()
+            start = parse(params['start']).date() if params.get('start') else \
+                end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+        except (ValueError, OverflowError):
+            raise ValidationError(_('start & end must be dates, e.g. 2021-01-31'))
+        return cls(start, end)
+
+    @classmethod
+    def spanning(cls, triprequests):
+        """ Range from the first departure to the last return of triprequests. """
+        if not triprequests:
+            return cls.from_params({})
+        return cls(
+            timezone.localdate(min(t.depart_est for t in triprequests)),
+            timezone.localdate(max(t.return_est for t in triprequests))
+        )
+
+    @property
+    def start_datetime(self):
+        return timezone.make_aware(datetime.combine(self.start, time.min))
+
+    @property
+    def end_datetime(self):
+        """ Midnight after the last day, i.e. the exclusive end. """
+        return timezone.make_aware(datetime.combine(self.end + timedelta(days=1), time.min))
+
+    @property
+    def hours(self):
+        return (self.end_datetime - self.start_datetime).total_seconds() / 3600
+
+    def as_params(self):
+        return {'start': self.start.isoformat(), 'end': self.end.isoformat()}
+
+
+def cached_report(name, params, loader):
+    """Report named name for params, from the cache when already computed.
+
+    Arguments:
+        name {str} -- Report name
+        params {dict} -- JSON serializable parameters the report depends on
+        loader {callable} -- Computes the report on a cache miss
+    """
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return cache.get_or_set(f'reports:{name}:{digest}', loader, settings.TP_REPORT_CACHE_TIMEOUT)
+
+
+def _trips(report_range):
+    return models.TripRequest.objects.reportable().overlapping(
+        report_range.start_datetime, report_range.end_datetime)
+
+
+def _trip_aggregates(report_range):
+    """ Aggregates shared by every trip breakdown. """
+    start = Value(report_range.start_datetime, output_field=DateTimeField())
+    end = Value(report_range.end_datetime, output_field=DateTimeField())
+    departs_in_range = Q(depart_est__gte=report_range.start_datetime,
+                         depart_est__lt=report_range.end_datetime)
+    return {
+        'trips': Count('id', filter=departs_in_range),
+        'booked': Sum(ExpressionWrapper(
+            Least(F('return_est'), end) - Greatest(F('depart_est'), start),
+            output_field=DurationField()
+        )),
+        'mileage_est': Sum('mileage_est', filter=departs_in_range),
+        'mileage_act': Sum('mileage_act', filter=departs_in_range),
+        'fuel_cost': Sum('fuel_cost', filter=departs_in_range),
+    }
+
+
+def _group_trips(queryset, report_range, *fields):
+    """ {group key: aggregates} for trips grouped by fields. """
+    rows = queryset.values(*fields).annotate(**_trip_aggregates(report_range)).order_by()
+    groups = {}
+    for row in rows:
+        key = row[fields[0]] if len(fields) == 1 else tuple(row[f] for f in fields)
+        booked = row.pop('booked')
+        row['booked_hours'] = booked.total_seconds() / 3600 if booked else 0.0
+        for name in ('trips', 'mileage_est', 'mileage_act', 'fuel_cost'):
+            row[name] = row[name] or 0
+        groups[key] = row
+    return groups
+
+
+def _maintenance_costs(queryset, report_range, field):
+    rows = queryset.filter(
+        date__gte=report_range.start, date__lte=report_range.end
+    ).values(field).annotate(cost=Sum('cost'), count=Count('id')).order_by()
+    return {row[field]: row for row in rows}
+
+
+EMPTY_TRIPS = {'trips': 0, 'booked_hours': 0.0, 'mileage_est': 0, 'mileage_act': 0, 'fuel_cost': 0}
+EMPTY_MAINTENANCE = {'cost': 0, 'count': 0}
+
+
+def _breakdown(groups, id_field, name_field):
+    return sorted(
+        ({'id': row[id_field], 'name': row[name_field], **row} for row in groups.values()),
+        key=lambda row: (row['name'] or '', row['id'] or 0)
+    )
+
+
+def vehicle_report(vehicles, report_range):
+    """Utilization, mileage, fuel & maintenance cost per vehicle.
+
+    Arguments:
+        vehicles {list} -- Vehicles to report on
+        report_range {ReportRange} -- Dates to report on
+
+    Returns:
+        list -- One dict per vehicle, in the given order
+    """
+    ids = [vehicle.pk for vehicle in vehicles]
+    trips = _group_trips(
+        _trips(report_range).filter(vehicle_id__in=ids), report_range, 'vehicle_id')
+    maintenance = _maintenance_costs(
+        models.VehicleMaintenance.objects.filter(vehicle_id__in=ids), report_range, 'vehicle_id')
+    rows = []
+    for vehicle in vehicles:
+        row = {
+            'id': vehicle.pk,
+            'name': str(vehicle),
+            **EMPTY_TRIPS, **trips.get(vehicle.pk, {}),
+            'maintenance_cost': maintenance.get(vehicle.pk, EMPTY_MAINTENANCE)['cost'],
+            'maintenance_count': maintenance.get(vehicle.pk, EMPTY_MAINTENANCE)['count'],
+        }
+        row['utilization'] = (
+            row['booked_hours'] / report_range.hours * 100 if report_range.hours else 0.0)
+        rows.append(row)
+    return rows
+
+
+def driver_report(drivers, report_range):
+    """ Trips, booked hours & mileage per driver, in the given order. """
+    ids = [driver.pk for driver in drivers]
+    trips = _group_trips(_trips(report_range).filter(driver_id__in=ids), report_range, 'driver_id')
+    return [
+        {'id': driver.pk, 'name': driver.full_name, **EMPTY_TRIPS, **trips.get(driver.pk, {})}
+        for driver in drivers
+    ]
+
+
+def _group_rollups(queryset, *fields):
+    """ {group key: totals} for DailyTripStat rows grouped by fields. """
+    rows = queryset.values(*fields).annotate(
+        trips=Sum('trips'),
+        party_count=Sum('party_count'),
+        mileage_est=Sum('mileage_est'),
+        mileage_act=Sum('mileage_act'),
+        fuel_cost=Sum('fuel_cost'),
+    ).order_by()
+    return {
+        row[fields[0]] if len(fields) == 1 else tuple(row[f] for f in fields): row
+        for row in rows
+    }
+
+
+EMPTY_ROLLUP = {'trips': 0, 'party_count': 0, 'mileage_est': 0, 'mileage_act': 0, 'fuel_cost': 0}
+
+
+def org_report(orgs, report_range):
+    """Trip & maintenance costs per organization, broken down by department & budget.
+
+    Read from the daily rollups, i.e. as of the last ``manage.py rollupstats``.
+
+    Arguments:
+        orgs {list} -- Organizations to report on
+        report_range {ReportRange} -- Dates to report on
+
+    Returns:
+        list -- One dict per organization, in the given order
+    """
+    ids = [org.pk for org in orgs]
+    in_range = Q(org_id__in=ids, date__gte=report_range.start, date__lte=report_range.end)
+    stats = models.DailyTripStat.objects.filter(in_range)
+    totals = _group_rollups(stats, 'org_id')
+    departments = _group_rollups(stats, 'org_id', 'department_id', 'department__name')
+    budgets = _group_rollups(stats, 'org_id', 'budget_id', 'budget__name')
+    maintenance = {
+        row['org_id']: row['cost'] for row in models.DailyMaintenanceStat.objects.filter(
+            in_range).values('org_id').annotate(cost=Sum('cost')).order_by()
+    }
+
+    rows = []
+    for org in orgs:
+        rows.append({
+            'id': org.pk,
+            'name': org.name,
+            **EMPTY_ROLLUP, **totals.get(org.pk, {}),
+            'maintenance_cost': maintenance.get(org.pk, 0),
+            'departments': _breakdown(
+                {k: v for k, v in departments.items() if k[0] == org.pk},
+                'department_id', 'department__name'),
+            'budgets': _breakdown(
+                {k: v for k, v in budgets.items() if k[0] == org.pk},
+                'budget_id', 'budget__name'),
+        })
+    return rows
+
+
+def triprequest_report(triprequests, report_range):
+    """ Totals of the given trip requests by organization, department & budget. """
+    trips = _trips(report_range).filter(pk__in=[triprequest.pk for triprequest in triprequests])
+    groups = _group_trips(trips, report_range, 'org__name', 'department__name', 'budget__name')
+    return sorted(groups.values(), key=lambda row: (
+        row['org__name'] or '', row['department__name'] or '', row['budget__name'] or ''))
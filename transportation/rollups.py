@@ -0,0 +1,142 @@
+"""
+Transportation Daily Rollups
+
+DailyTripStat & DailyMaintenanceStat hold trip & maintenance totals per day
+(by departure date for trips), so reports over long ranges read a few
+pre-aggregated rows per day instead of the full history.
+
+refresh() is incremental: it recomputes only the days touched by trips &
+maintenance records whose ``updated`` is past the last refresh, plus the
+StaleRollupDate days recorded by the signal handlers for deletions & moves.
+The checkpoint trails each refresh by TP_ROLLUP_LAG seconds, as a slow
+transaction may commit a row stamped before the refresh started; the days
+of rows updated within the lag are simply recomputed again next time.
+Changes made with QuerySet.update() don't touch ``updated``; run a full
+refresh after those.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from transportation import models
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = 'daily'
+
+
+def _trip_stats(days=None):
+    queryset = models.TripRequest.objects.reportable()
+    if days is not None:
+        queryset = queryset.filter(depart_est__date__in=days)
+    return queryset.annotate(day=TruncDate('depart_est')).values(
+        'day', 'org_id', 'department_id', 'budget_id', 'vehicle_type'
+    ).annotate(
+        trip_count=Count('id'),
+        party=Sum('party_count'),
+        miles_est=Sum('mileage_est'),
+        miles_act=Sum('mileage_act'),
+        fuel=Sum('fuel_cost'),
+    ).order_by()
+
+
+def _maintenance_stats(days=None):
+    queryset = models.VehicleMaintenance.objects.all()
+    if days is not None:
+        queryset = queryset.filter(date__in=days)
+    return queryset.values(
+        'date', 'vehicle__org_id', 'vehicle__type'
+    ).annotate(
+        maintenance_count=Count('id'),
+        total=Sum('cost'),
+    ).order_by()
+
+
+def _changed_days(since):
+    days = set(models.TripRequest.objects.filter(updated__gt=since).annotate(
+        day=TruncDate('depart_est')).values_list('day', flat=True).distinct())
+    days.update(models.VehicleMaintenance.objects.filter(updated__gt=since).values_list(
+        'date', flat=True).distinct())
+    days.update(models.StaleRollupDate.objects.values_list('date', flat=True))
+    days.discard(None)
+    return days
+
+
+def _rebuild(days=None):
+    trips = models.DailyTripStat.objects.all()
+    maintenance = models.DailyMaintenanceStat.objects.all()
+    if days is not None:
+        trips = trips.filter(date__in=days)
+        maintenance = maintenance.filter(date__in=days)
+    trips.delete()
+    maintenance.delete()
+
+    models.DailyTripStat.objects.bulk_create((
+        models.DailyTripStat(
+            date=row['day'], org_id=row['org_id'],
+            department_id=row['department_id'], budget_id=row['budget_id'],
+            vehicle_type=row['vehicle_type'], trips=row['trip_count'],
+            party_count=row['party'] or 0, mileage_est=row['miles_est'] or 0,
+            mileage_act=row['miles_act'] or 0, fuel_cost=row['fuel'] or 0
+        )
+        for row in _trip_stats(days).iterator()
+    ), batch_size=1000)
+    models.DailyMaintenanceStat.objects.bulk_create((
+        models.DailyMaintenanceStat(
+            date=row['date'], org_id=row['vehicle__org_id'],
+            vehicle_type=row['vehicle__type'], count=row['maintenance_count'],
+            cost=row['total'] or 0
+        )
+        for row in _maintenance_stats(days).iterator()
+    ), batch_size=1000)
+
+
+def refresh(full=False):
+    """Bring the daily rollups up to date.
+
+    Arguments:
+        full {bool} -- Rebuild every day rather than only the changed ones
+
+    Returns:
+        int -- Number of days recomputed, or None for a full rebuild
+    """
+    # Rows committed after this point are picked up by the next refresh, so
+    # are rows stamped within the lag before it that commit late.
+    started = timezone.now() - timedelta(seconds=settings.TP_ROLLUP_LAG)
+    with transaction.atomic():
+        checkpoint = models.RollupCheckpoint.objects.select_for_update().filter(
+            name=CHECKPOINT).first()
+        if full or checkpoint is None:
+            days = None
+            _rebuild()
+        else:
+            days = _changed_days(checkpoint.refreshed)
+            if days:
+                _rebuild(sorted(days))
+        stale = models.StaleRollupDate.objects.all()
+        if days is not None:
+            stale = stale.filter(date__in=days)
+        stale.delete()
+        models.RollupCheckpoint.objects.update_or_create(
+            name=CHECKPOINT, defaults={'refreshed': started})
+    refreshed = 'all days' if days is None else f'{len(days)} day(s)'
+    logger.info(f'Refreshed daily rollups: {refreshed}')
+    return None if days is None else len(days)
+
+
+def last_refreshed():
+    checkpoint = models.RollupCheckpoint.objects.filter(name=CHECKPOINT).first()
+    return checkpoint.refreshed if checkpoint is not None else None
+
+
+def mark_stale(day):
+    """ Have the next refresh recompute day. """
+    if day is not None:
+        models.StaleRollupDate.objects.get_or_create(date=day)
@@ -0,0 +1,223 @@
+"""
+Transportation Driver Search
+
+Backs the requested driver autocomplete. On PostgreSQL the name prefixes are
+matched through the pg_trgm GIN indexes on UPPER(first_name) & UPPER(last_name)
+(migration 0014) and ranked by trigram similarity. Other backends, i.e. the
+SQLite test runs, use an in-process prefix index of every driver's names.
+
+Free-text requested drivers are resolved against Driver.search_name, a
+normalized copy of the full name, and the result is cached on the trip request.
+"""
+
+import bisect
+import re
+import unicodedata
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, When, Value, IntegerField, Q
+from django.db.models.functions import Greatest
+
+from transportation import models
+
+
+# Below this a requested driver is left unmatched rather than guessed.
+MATCH_THRESHOLD = 0.75
+
+# Most drivers fetched & scored when resolving a requested driver.
+MAX_CANDIDATES = 50
+
+DriverMatch = namedtuple('DriverMatch', ('driver', 'confidence'))
+
+_prefix_index = None
+
+
+def _rank_status(status):
+    return 0 if status == models.Driver.STATUS_ACTIVE else 1
+
+
+def _build_prefix_index():
+    """ Sorted (name, driver ID) keys & the driver rows they point to. """
+    drivers = {}
+    keys = []
+    for pk, first_name, last_name, status in models.Driver.objects.values_list(
+            'id', 'first_name', 'last_name', 'status').iterator():
+        drivers[pk] = (f'{first_name} {last_name}', status)
+        keys.append((first_name.upper(), pk))
+        keys.append((last_name.upper(), pk))
+    keys.sort()
+    return keys, drivers
+
+
+def invalidate_prefix_index():
+    global _prefix_index
+    _prefix_index = None
+
+
+def _search_prefix_index(query, limit):
+    global _prefix_index
+    if _prefix_index is None:
+        _prefix_index = _build_prefix_index()
+    keys, drivers = _prefix_index
+
+    query = query.upper()
+    matches = set()
+    position = bisect.bisect_left(keys, (query, 0))
+    while position < len(keys) and keys[position][0].startswith(query):
+        matches.add(keys[position][1])
+        position += 1
+
+    def rank(pk):
+        full_name, status = drivers[pk]
+        similarity = SequenceMatcher(None, query, full_name.upper()).ratio()
+        return (_rank_status(status), -similarity, full_name)
+
+    return [{'id': pk, 'full_name': drivers[pk][0]} for pk in sorted(matches, key=rank)[:limit]]
+
+
+def _search_postgresql(query, limit):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    queryset = models.Driver.objects.filter(
+        Q(first_name__istartswith=query) | Q(last_name__istartswith=query)
+    ).annotate(
+        status_rank=Case(
+            When(status=models.Driver.STATUS_ACTIVE, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField()
+        ),
+        similarity=Greatest(
+            TrigramSimilarity('first_name', query),
+            TrigramSimilarity('last_name', query)
+        )
+    ).order_by('status_rank', '-similarity', 'last_name', 'first_name')
+
+    return [
+        {'id': pk, 'full_name': f'{first_name} {last_name}'}
+        for pk, first_name, last_name
+        in queryset.values_list('id', 'first_name', 'last_name')[:limit]
+    ]
+
+
+def search_drivers(query, limit=None):
+    """Drivers whose first or last name starts with query, best matches first.
+
+    Active drivers are ranked before inactive & retired ones, then by how
+    closely their name resembles the query.
+
+    Arguments:
+        query {str} -- Name prefix typed by the user
+        limit {int} -- Maximum number of results, defaults to TP_AUTOCOMPLETE_LIMIT
+
+    Returns:
+        list -- {'id', 'full_name'} dicts
+    """
+    query = query.strip()
+    if not query:
+        return []
+    if limit is None:
+        limit = settings.TP_AUTOCOMPLETE_LIMIT
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(query, limit)
+    return _search_prefix_index(query, limit)
+
+
+def normalize_name(name):
+    """ Lowercase, accent & punctuation free, single spaced form of a name. """
+    name = unicodedata.normalize('NFKD', name or '')
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^\w]+', ' ', name.casefold()).split())
+
+
+def _match_confidence(key, tokens, search_name):
+    if search_name == key:
+        return 1.0
+    names = search_name.split()
+    if not names:
+        return 0.0
+    total = 0.0
+    for token in tokens:
+        best = 0.0
+        for name in names:
+            if name == token:
+                best = 1.0
+                break
+            if name.startswith(token):
+                best = max(best, 0.9)
+            else:
+                best = max(best, SequenceMatcher(None, token, name).ratio())
+        total += best
+    # Anything short of the exact full name is never a certain match.
+    return 0.95 * total / len(tokens)
+
+
+def match_driver(name):
+    """Driver best matching a free-text name, or None when nothing is close.
+
+    Candidates come from indexed prefix lookups: the whole name or its first
+    word against search_name, and its last word against last_name.
+
+    Arguments:
+        name {str} -- Name as typed by the requestor
+
+    Returns:
+        DriverMatch -- Matched driver & confidence between 0 and 1
+    """
+    key = normalize_name(name)
+    if not key:
+        return None
+    tokens = key.split()
+
+    candidates = models.Driver.objects.filter(
+        Q(search_name__startswith=key) |
+        Q(search_name__startswith=f'{tokens[0]} ') |
+        Q(last_name__istartswith=tokens[-1])
+    )[:MAX_CANDIDATES]
+
+    ranked = sorted(
+        (DriverMatch(driver, _match_confidence(key, tokens, driver.search_name))
+         for driver in candidates),
+        key=lambda match: (
+            -match.confidence, _rank_status(match.driver.status), match.driver.search_name)
+    )
+    if not ranked or ranked[0].confidence < MATCH_THRESHOLD:
+        return None
+    return ranked[0]
+
+
+def recommend_driver(triprequest):
+    """Recommended driver for a trip request's requested_driver.
+
+    The match is stored on the request along with the normalized name it
+    was made for, so it is only resolved again once requested_driver changes
+    or a driver save clears requested_driver_key.
+
+    Arguments:
+        triprequest {TripRequest} -- Trip request to resolve
+
+    Returns:
+        Driver -- Recommended driver or None
+    """
+    key = normalize_name(triprequest.requested_driver)
+    if key == triprequest.requested_driver_key:
+        return triprequest.recommended_driver
+
+    match = match_driver(key)
+    driver = match.driver if match is not None else None
+    triprequest.recommended_driver = driver
+    triprequest.requested_driver_key = key
+    if triprequest.pk is not None:
+        models.TripRequest.objects.filter(pk=triprequest.pk).update(
+            recommended_driver=driver, requested_driver_key=key)
+    return driver
+
+
+def invalidate_recommendations(*drivers):
+    """ Have requests re-resolve after drivers are added, renamed or removed. """
+    models.TripRequest.objects.filter(
+        Q(recommended_driver__in=[driver.pk for driver in drivers]) |
+        (Q(recommended_driver__isnull=True) & ~Q(requested_driver_key=''))
+    ).update(requested_driver_key='')
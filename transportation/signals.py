@@ -0,0 +1,128 @@
+"""
+Transportation Signal Handlers
+
+Connected in TransportationAppConfig.ready().
+"""
+
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.utils import timezone
+from django.dispatch import receiver
+
+from transportation import models, calendars, dispatch, lookups, rollups, search
+
+
+@receiver([post_save, post_delete], sender=models.Organization)
+def invalidate_organizations(sender, **kwargs):
+    # Departments & budgets are grouped by organization name.
+    lookups.invalidate(lookups.ORGANIZATIONS_KEY, lookups.DEPARTMENTS_KEY, lookups.BUDGETS_KEY)
+
+
+@receiver([post_save, post_delete], sender=models.Department)
+def invalidate_departments(sender, **kwargs):
+    lookups.invalidate(lookups.DEPARTMENTS_KEY)
+
+
+@receiver([post_save, post_delete], sender=models.Budget)
+def invalidate_budgets(sender, **kwargs):
+    lookups.invalidate(lookups.BUDGETS_KEY)
+
+
+@receiver([post_save, post_delete], sender=models.User)
+def invalidate_moderators(sender, update_fields=None, **kwargs):
+    # Every sign in saves last_login, which doesn't affect the lookup.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    lookups.invalidate(lookups.MODERATORS_KEY)
+
+
+@receiver(post_save, sender=models.Driver)
+def invalidate_driver_search(sender, instance, created, **kwargs):
+    search.invalidate_prefix_index()
+    # Requests only match drivers by name; other edits leave them be.
+    if created or getattr(instance, '_renamed', True):
+        search.invalidate_recommendations(instance)
+
+
+@receiver(post_delete, sender=models.Driver)
+def invalidate_deleted_driver_search(sender, instance, **kwargs):
+    search.invalidate_prefix_index()
+    search.invalidate_recommendations(instance)
+
+
+# Model -> the field its rollup day comes from
+ROLLUP_DATE_FIELDS = {
+    models.TripRequest: 'depart_est',
+    models.VehicleMaintenance: 'date',
+}
+
+
+def _to_rollup_date(sender, value):
+    if sender is models.TripRequest and value is not None:
+        return timezone.localdate(value)
+    return value
+
+
+def _rollup_date(instance):
+    # Read from __dict__ so deferred fields aren't loaded just for this.
+    sender = type(instance)
+    return _to_rollup_date(sender, instance.__dict__.get(ROLLUP_DATE_FIELDS[sender]))
+
+
+def saved_rollup_dates(sender, pks):
+    """ Rollup day of each of the saved sender rows pks, as in the database. """
+    rows = sender.objects.filter(pk__in=pks).values_list('pk', ROLLUP_DATE_FIELDS[sender])
+    return {pk: _to_rollup_date(sender, value) for pk, value in rows}
+
+
+def mark_moved_rollup_dates(instances, saved):
+    """ Have the next refresh recompute the saved_rollup_dates() days instances leave. """
+    # The new day is found through ``updated``; the old one would be missed.
+    for instance in instances:
+        if instance.pk in saved and saved[instance.pk] != _rollup_date(instance):
+            rollups.mark_stale(saved[instance.pk])
+
+
+@receiver(pre_save, sender=models.TripRequest)
+@receiver(pre_save, sender=models.VehicleMaintenance)
+def mark_moved_rollup_date(sender, instance, update_fields=None, **kwargs):
+    # Only saves that write the day can move the row.
+    field = ROLLUP_DATE_FIELDS[sender]
+    if instance._state.adding or field not in instance.__dict__ or (
+            update_fields is not None and field not in update_fields):
+        return
+    mark_moved_rollup_dates([instance], saved_rollup_dates(sender, [instance.pk]))
+
+
+@receiver(post_delete, sender=models.TripRequest)
+@receiver(post_delete, sender=models.VehicleMaintenance)
+def mark_deleted_rollup_date(sender, instance, **kwargs):
+    rollups.mark_stale(_rollup_date(instance))
+
+
+@receiver([post_save, post_delete], sender=models.TripRequest)
+def invalidate_calendars(sender, instance, **kwargs):
+    # A feed the trip was just moved out of is caught by its ETag instead.
+    calendars.invalidate('driver', instance.__dict__.get('driver_id'))
+    calendars.invalidate('vehicle', instance.__dict__.get('vehicle_id'))
+    calendars.invalidate('org', instance.__dict__.get('org_id'))
+
+
+@receiver(post_save, sender=models.Driver)
+@receiver(post_save, sender=models.Organization)
+def touch_calendar_names(sender, instance, created, **kwargs):
+    # A new one isn't in any feed yet; vehicles are followed through ``updated``.
+    if not created:
+        calendars.touch_names()
+
+
+@receiver([post_save, post_delete], sender=models.TripRequest)
+@receiver([post_save, post_delete], sender=models.Vehicle)
+def invalidate_dispatch(sender, **kwargs):
+    dispatch.invalidate()
+
+
+@receiver(post_delete, sender=models.TripRequest)
+@receiver(post_delete, sender=models.Vehicle)
+def record_deletion(sender, instance, **kwargs):
+    # Read by the change feed, which can't otherwise see a row that's gone.
+    models.DeletedRecord.objects.create(model=sender._meta.model_name, object_id=instance.pk)
@@ -11,6 +11,7 @@ For more information regarding django-tables2, see:
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.contrib.humanize.templatetags.humanize import intcomma
+from django.db.models import Sum, Avg, Count
 
 # Django Tables
 
@@ -20,6 +21,7 @@ from django_tables2 import (
     CheckBoxColumn, BooleanColumn,
     LinkColumn
 )
+from django_tables2.data import TableQuerysetData
 from django_tables2.utils import A
 from django_tables2.tables import Table
 
@@ -32,17 +34,55 @@ from .models import (
 # endregion Module Imports
 
 
-class SummingColumn(Column):
-    """ Column for summing up all values in a bound column """
+class AggregateColumn(Column):
+    """Column with a footer aggregating all values in the bound column
+
+    When the table holds a queryset the footer is a single aggregate query
+    over the whole (filtered, unpaginated) queryset, otherwise the values are
+    combined in Python. Subclasses set ``aggregate`` to a Django aggregate and
+    ``combine`` to its Python equivalent.
+    """
+
+    aggregate = None
+    combine = None
+    empty = 0
 
     def render_footer(self, bound_column, table):
-        """Render a summation footer for table
+        """Render an aggregate footer for table
 
         Arguments:
             bound_column {django_tables2.Column} -- The column to display the footer value for
             table {django_tables2.Table} -- The table in context
         """
-        return sum(bound_column.accessor.resolve(row) for row in table.data)
+        if isinstance(table.data, TableQuerysetData):
+            field = str(bound_column.accessor).replace('.', '__')
+            value = table.data.data.aggregate(footer=self.aggregate(field))['footer']
+        else:
+            values = [bound_column.accessor.resolve(row) for row in table.data]
+            value = self.combine([v for v in values if v is not None])
+        return self.empty if value is None else value
+
+
+class SummingColumn(AggregateColumn):
+    """ Column for summing up all values in a bound column """
+
+    aggregate = Sum
+    combine = sum
+
+
+class AverageColumn(AggregateColumn):
+    """ Column for averaging all values in a bound column """
+
+    aggregate = Avg
+    combine = staticmethod(lambda values: sum(values) / len(values) if values else None)
+    empty = ''
+
+
+class CountColumn(AggregateColumn):
+    """ Column for counting the non-empty values in a bound column """
+
+    aggregate = Count
+    combine = len
 
 
 class OrganizationTable(Table):
@@ -1,3 +1,1103 @@
-from django.test import TestCase
-
-# Create your tests here.
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F, Sum
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
+
+from transportation import (
+    models, emails, availability, calendars, dispatch, filters, forms, lookups, middleware, reports,
+    rollups, search, tables
+)
+
+
+def create_trip_requests(count, **kwargs):
+    """ Create ``count`` pending trip requests sharing one org, department & budget. """
+    org = models.Organization.objects.create(name='Org')
+    department = models.Department.objects.create(num='100', org=org, name='Department')
+    budget = models.Budget.objects.create(num='200', org=org, name='Budget')
+    depart = timezone.now() + timedelta(days=1)
+    triprequests = []
+    for i in range(count):
+        triprequest = models.TripRequest(
+            org=org, department=department, budget=budget,
+            contact_fn='Contact', contact_ln=str(i),
+            contact_phone='434-582-2000', contact_email=f'contact{i}@example.com',
+            destination='Destination', purpose='Purpose',
+            depart_est=depart, return_est=depart + timedelta(hours=4),
+            mileage_est=10,
+            **kwargs
+        )
+        triprequest.save()
+        triprequests.append(triprequest)
+    return triprequests
+
+
+def create_vehicle(org, num=1):
+    return models.Vehicle.objects.create(
+        org=org, num=num, status=models.Vehicle.STATUS_ACTIVE,
+        year=2020, make='Make', model='Model', title_num='T', vin='V',
+        license_plate='P', reg_expire_date=timezone.now().date()
+    )
+
+
+class TripRequestTableQueryTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(
+            username='moderator', password='password', is_moderator=True)
+        self.client.force_login(self.user)
+        create_trip_requests(30, requestor=self.user)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_request_list_query_count_independent_of_page_size(self):
+        url = reverse('request-list')
+        small = self._count_queries(f'{url}?per_page=5')
+        large = self._count_queries(f'{url}?per_page=25')
+        self.assertEqual(small, large)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboundEmailTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(username='requestor', first_name='Req')
+        self.triprequest = create_trip_requests(1, requestor=self.user)[0]
+
+    def test_send_enqueues_without_delivering(self):
+        emails.TripRequestCreatedEmail(self.triprequest).send()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(models.OutboundEmail.objects.count(), 2)
+
+    def test_deliver_outbox_sends_and_marks_sent(self):
+        emails.TripRequestCreatedEmail(self.triprequest).send()
+        sent, failed = emails.deliver_outbox()
+        self.assertEqual((sent, failed), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(models.OutboundEmail.objects.filter(
+            status=models.OutboundEmail.STATUS_PENDING).exists())
+
+    def test_failed_delivery_backs_off(self):
+        email = emails.enqueue_mail('Subject', 'Body', None, ['a@example.com'])
+        email.mark_failed('relay down', max_attempts=2, retry_delay=60)
+        self.assertEqual(email.status, models.OutboundEmail.STATUS_PENDING)
+        self.assertGreater(email.next_attempt, timezone.now())
+        self.assertEqual(emails.deliver_outbox(), (0, 0))
+        email.mark_failed('relay down', max_attempts=2, retry_delay=60)
+        self.assertEqual(email.status, models.OutboundEmail.STATUS_FAILED)
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        self.triprequest = create_trip_requests(1)[0]
+        self.busy_driver = models.Driver.objects.create(first_name='Busy', last_name='Driver')
+        self.free_driver = models.Driver.objects.create(first_name='Free', last_name='Driver')
+        self.busy_vehicle = create_vehicle(self.triprequest.org, num=1)
+        self.free_vehicle = create_vehicle(self.triprequest.org, num=2)
+        self.triprequest.driver = self.busy_driver
+        self.triprequest.vehicle = self.busy_vehicle
+        self.triprequest.save()
+
+    def test_partial_overlap_is_busy(self):
+        start = self.triprequest.depart_est + timedelta(hours=2)
+        end = self.triprequest.return_est + timedelta(hours=2)
+        self.assertFalse(self.busy_driver.is_available(start, end))
+        self.assertFalse(self.busy_vehicle.is_available(start, end))
+        with self.assertNumQueries(1):
+            drivers = list(availability.available_drivers(start, end))
+        self.assertEqual(drivers, [self.free_driver])
+        with self.assertNumQueries(1):
+            vehicles = list(availability.available_vehicles(start, end))
+        self.assertEqual(vehicles, [self.free_vehicle])
+
+    def test_adjacent_window_is_free(self):
+        start = self.triprequest.return_est
+        end = start + timedelta(hours=1)
+        self.assertTrue(self.busy_driver.is_available(start, end))
+        self.assertIn(self.busy_vehicle, availability.available_vehicles(start, end))
+
+    def test_cancelled_and_excluded_trips_do_not_block(self):
+        window = (self.triprequest.depart_est, self.triprequest.return_est)
+        self.assertIn(self.busy_driver, availability.available_drivers(
+            *window, exclude_request=self.triprequest))
+        self.triprequest.status = models.TripRequest.STATUS_CANCELLED
+        self.triprequest.save()
+        self.assertTrue(self.busy_driver.is_available(*window))
+
+
+class LastActivityTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(username='moderator', is_moderator=True)
+        self.triprequest = create_trip_requests(1)[0]
+
+    def test_activity_write_updates_pointer(self):
+        self.triprequest.deny(commit=True, user=self.user)
+        self.assertEqual(self.triprequest.last_activity.type,
+                         models.TripRequestActivity.TYPE_DENIED)
+        triprequest = models.TripRequest.objects.select_related(
+            'last_activity__user').get(pk=self.triprequest.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(triprequest.last_updator, self.user)
+
+    def test_transition_writes_one_activity_and_one_update(self):
+        with CaptureQueriesContext(connection) as context:
+            self.triprequest.cancel(commit=True, user=self.user)
+        writes = [q['sql'].split()[0] for q in context.captured_queries
+                  if q['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(sorted(writes), ['INSERT', 'UPDATE'])
+        self.assertEqual(
+            list(self.triprequest.activities.order_by('id').values_list('type', flat=True)),
+            [models.TripRequestActivity.TYPE_CREATED, models.TripRequestActivity.TYPE_CANCELLED])
+        triprequest = models.TripRequest.objects.get(pk=self.triprequest.pk)
+        self.assertEqual(triprequest.status, models.TripRequest.STATUS_CANCELLED)
+        self.assertEqual(triprequest.last_activity.type, models.TripRequestActivity.TYPE_CANCELLED)
+
+    def test_compaction_removes_edited_row_before_transition(self):
+        Activity = models.TripRequestActivity
+        # As logged by older releases: an edit with no user, then the transition.
+        edited = Activity.objects.create(request=self.triprequest, type=Activity.TYPE_EDITED)
+        Activity.objects.create(
+            request=self.triprequest, user=self.user, type=Activity.TYPE_APPROVED)
+        # A real edit long before its transition is kept.
+        other = models.TripRequest.objects.get(pk=self.triprequest.pk)
+        other.pk = None
+        other.save()
+        kept = Activity.objects.create(request=other, type=Activity.TYPE_EDITED)
+        Activity.objects.filter(pk=kept.pk).update(timestamp=timezone.now() - timedelta(hours=1))
+        Activity.objects.create(request=other, type=Activity.TYPE_DENIED)
+
+        out = StringIO()
+        call_command('compactactivities', stdout=out)
+        self.assertIn('deleted 1 duplicate', out.getvalue())
+        self.assertFalse(Activity.objects.filter(pk=edited.pk).exists())
+        self.assertTrue(Activity.objects.filter(pk=kept.pk).exists())
+        self.assertEqual(models.TripRequest.objects.get(pk=self.triprequest.pk).last_activity.type,
+                         Activity.TYPE_APPROVED)
+
+
+class PrintBatchTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(username='moderator', is_moderator=True)
+        self.client.force_login(self.user)
+        self.triprequests = create_trip_requests(6, requestor=self.user)
+
+    def _get(self, name, pks):
+        url = reverse(name)
+        return self.client.get(f'{url}?pk_list={",".join(map(str, pks))}')
+
+    def test_print_tickets_preserves_order_and_reports_missing(self):
+        pks = [tr.pk for tr in reversed(self.triprequests)] + [0]
+        response = self._get('print-tickets', pks)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([tr.pk for tr in response.context['triprequests']], pks[:-1])
+        self.assertEqual(response.context['missing'], [0])
+
+    def test_print_query_count_independent_of_batch_size(self):
+        pks = [tr.pk for tr in self.triprequests]
+        for name in ('print-tickets', 'print-labels'):
+            with CaptureQueriesContext(connection) as small:
+                self._get(name, pks[:2])
+            with CaptureQueriesContext(connection) as large:
+                self._get(name, pks)
+            self.assertEqual(len(small), len(large))
+
+    @override_settings(TP_MAX_BATCH_SIZE=2)
+    def test_batch_size_is_capped(self):
+        response = self._get('print-tickets', [tr.pk for tr in self.triprequests])
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(username='moderator', is_moderator=True)
+        self.client.force_login(self.user)
+        self.triprequests = create_trip_requests(3, requestor=self.user)
+        self.triprequests[0].deny(commit=True, user=self.user)
+
+    def _export(self, query=''):
+        response = self.client.get(f"{reverse('request-export')}{query}")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_export_streams_all_rows(self):
+        lines = self._export()
+        self.assertEqual(lines[0].split(',')[:2], ['ID', 'Status'])
+        self.assertEqual(len(lines), 4)
+
+    def test_export_honours_filters(self):
+        lines = self._export(f'?status={models.TripRequest.STATUS_DENIED}')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{self.triprequests[0].pk},Denied,'))
+
+
+class LookupCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = models.Organization.objects.create(name='Org')
+        models.Department.objects.create(num='100', org=self.org, name='Department')
+
+    def test_lookups_are_cached(self):
+        lookups.get_departments()
+        with self.assertNumQueries(0):
+            self.assertEqual([d.name for d in lookups.get_departments()], ['Department'])
+
+    def test_saves_invalidate_lookups(self):
+        lookups.get_departments()
+        # The cached lookup is kept until the change commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Department.objects.create(num='101', org=self.org, name='Another')
+            self.assertEqual(len(lookups.get_departments()), 1)
+        self.assertEqual(len(lookups.get_departments()), 2)
+
+    def test_load_departments_renders_from_cache(self):
+        self.client.force_login(models.User.objects.create_user(username='user'))
+        url = f"{reverse('load-departments')}?orgs={self.org.pk}"
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertContains(response, 'Department')
+        self.assertFalse([q for q in context.captured_queries if 'department' in q['sql']])
+
+
+class DriverSearchTests(TestCase):
+    def setUp(self):
+        search.invalidate_prefix_index()
+        models.Driver.objects.create(first_name='Sam', last_name='Jones',
+                                     status=models.Driver.STATUS_RETIRED)
+        models.Driver.objects.create(first_name='Samuel', last_name='Smith')
+        models.Driver.objects.create(first_name='Alex', last_name='Samson')
+        models.Driver.objects.create(first_name='Jordan', last_name='Lee')
+
+    def test_prefix_matches_first_and_last_names(self):
+        names = [d['full_name'] for d in search.search_drivers('sam')]
+        self.assertCountEqual(names, ['Sam Jones', 'Samuel Smith', 'Alex Samson'])
+        # Retired drivers rank last.
+        self.assertEqual(names[-1], 'Sam Jones')
+
+    def test_limit_and_index_invalidation(self):
+        self.assertEqual(len(search.search_drivers('sam', limit=1)), 1)
+        models.Driver.objects.create(first_name='Samira', last_name='Khan')
+        self.assertEqual(len(search.search_drivers('sam')), 4)
+        with self.assertNumQueries(0):
+            search.search_drivers('jor')
+
+
+class DriverMatchTests(TestCase):
+    def setUp(self):
+        self.john = models.Driver.objects.create(first_name='John', last_name='Smith')
+        self.jose = models.Driver.objects.create(first_name='José', last_name='García')
+
+    def test_search_name_is_normalized(self):
+        self.assertEqual(self.jose.search_name, 'jose garcia')
+        self.assertEqual(search.normalize_name('  Smith,  JOHN '), 'smith john')
+
+    def test_match_driver_ranks_and_thresholds(self):
+        self.assertEqual(search.match_driver('john smith'), (self.john, 1.0))
+        self.assertEqual(search.match_driver('Jon Smith').driver, self.john)
+        self.assertEqual(search.match_driver('jose garcia').driver, self.jose)
+        self.assertIsNone(search.match_driver('Alex Smithers'))
+        self.assertIsNone(search.match_driver(''))
+
+    def test_recommendation_is_cached_on_the_request(self):
+        triprequest = create_trip_requests(1, requested_driver='John Smith')[0]
+        self.assertEqual(search.recommend_driver(triprequest), self.john)
+
+        triprequest.refresh_from_db()
+        self.assertEqual(triprequest.recommended_driver, self.john)
+        with self.assertNumQueries(0):
+            self.assertEqual(search.recommend_driver(triprequest), self.john)
+
+        # Other edits leave the recommendation, renaming the driver has its
+        # requests resolve again.
+        self.john.notes = 'Prefers vans'
+        self.john.save()
+        triprequest.refresh_from_db()
+        self.assertEqual(triprequest.requested_driver_key, 'john smith')
+        self.john.last_name = 'Smythe'
+        self.john.save()
+        triprequest.refresh_from_db()
+        self.assertEqual(triprequest.requested_driver_key, '')
+
+
+class QueryPlanTests(TestCase):
+    """ EXPLAIN the request list's hot queries against a seeded table. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.moderator = models.User.objects.create_user(username='moderator', is_moderator=True)
+        cls.requestors = [models.User.objects.create_user(username=f'user{i}') for i in range(20)]
+        org = models.Organization.objects.create(name='Org')
+        department = models.Department.objects.create(num='100', org=org, name='Department')
+        budget = models.Budget.objects.create(num='200', org=org, name='Budget')
+        statuses = [status for status, name in models.TripRequest.STATUS_CHOICES]
+        start = timezone.now()
+        models.TripRequest.objects.bulk_create([
+            models.TripRequest(
+                org=org, department=department, budget=budget,
+                requestor=cls.requestors[i % len(cls.requestors)],
+                status=statuses[i % len(statuses)],
+                contact_fn='Contact', contact_ln=str(i),
+                contact_phone='434-582-2000', contact_email=f'contact{i}@example.com',
+                destination='Destination', purpose='Purpose',
+                depart_est=start + timedelta(hours=i), return_est=start + timedelta(hours=i + 4),
+                mileage_est=10
+            )
+            for i in range(5000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def filtered(self, user, **data):
+        request = RequestFactory().get('/requests')
+        request.user = user
+        queryset = models.TripRequest.objects.for_table()
+        return filters.TripRequestFilter(data, queryset=queryset, request=request).qs
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_status_and_date_range(self):
+        start = timezone.now() + timedelta(days=30)
+        queryset = self.filtered(self.moderator, status=models.TripRequest.STATUS_APPROVED,
+                                 start=start, end=start + timedelta(days=7))
+        self.assertUsesIndex(queryset, 'triprequest_status_date_idx')
+
+    def test_date_range(self):
+        start = timezone.now() + timedelta(days=30)
+        queryset = self.filtered(self.moderator, start=start, end=start + timedelta(days=7))
+        self.assertUsesIndex(queryset, 'triprequest_depart_date_idx')
+
+    def test_requestor_list(self):
+        queryset = self.filtered(self.requestors[0]).order_by('submitted')[:25]
+        self.assertUsesIndex(queryset, 'triprequest_requestor_sub_idx')
+
+    def test_default_list_order(self):
+        queryset = models.TripRequest.objects.for_table().order_by('submitted')[:25]
+        self.assertUsesIndex(queryset, 'triprequest_submitted_idx')
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(username='moderator', is_moderator=True)
+        self.client.force_login(self.user)
+        self.triprequests = create_trip_requests(25, requestor=self.user)
+
+    def get_page(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+        return response
+
+    def pks(self, response):
+        return [row.record.pk for row in response.context['table'].rows]
+
+    def test_pages_forward_and_back_by_cursor(self):
+        expected = [t.pk for t in sorted(self.triprequests, key=lambda t: (t.submitted, t.pk))]
+        url = reverse('request-list')
+
+        first = self.get_page(f'{url}?per_page=10')
+        self.assertEqual(self.pks(first), expected[:10])
+        self.assertIsNone(first.context['previous_page_url'])
+
+        second = self.get_page(url + first.context['next_page_url'])
+        self.assertEqual(self.pks(second), expected[10:20])
+
+        third = self.get_page(url + second.context['next_page_url'])
+        self.assertEqual(self.pks(third), expected[20:])
+        self.assertIsNone(third.context['next_page_url'])
+
+        back = self.get_page(url + third.context['previous_page_url'])
+        self.assertEqual(self.pks(back), expected[10:20])
+
+    def test_page_links_and_bad_cursors_degrade(self):
+        url = reverse('request-list')
+        response = self.client.get(f'{url}?per_page=10&page=2')
+        self.assertNotIn('cursor_page', response.context)
+        self.assertEqual(response.context['table'].page.number, 2)
+        self.assertEqual(len(response.context['table'].page.object_list), 10)
+
+        response = self.client.get(f'{url}?cursor=garbage')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.pks(response)), 25)
+        self.assertIsNone(response.context['next_page_url'])
+
+
+class AggregateFooterTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(username='moderator', is_moderator=True)
+        self.client.force_login(self.user)
+        self.vehicle = create_vehicle(models.Organization.objects.create(name='Org'))
+
+    def add_maintenance(self, count):
+        models.VehicleMaintenance.objects.bulk_create([
+            models.VehicleMaintenance(
+                vehicle=self.vehicle, date=timezone.now().date(), cost='10.50', mileage=i)
+            for i in range(count)
+        ])
+
+    def get_detail(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('vehicle-detail', args=[self.vehicle.pk]))
+        return response, len(context.captured_queries)
+
+    def test_footer_totals_every_row_in_constant_queries(self):
+        self.add_maintenance(3)
+        response, few = self.get_detail()
+        self.assertEqual(response.context['table'].columns['cost'].footer, Decimal('31.50'))
+
+        self.add_maintenance(57)
+        response, many = self.get_detail()
+        self.assertEqual(few, many)
+        self.assertEqual(len(response.context['table'].page.object_list), 25)
+        self.assertEqual(response.context['table'].columns['cost'].footer, Decimal('630.00'))
+
+    def test_python_fallback_for_list_data(self):
+        table = tables.VehicleMaintenanceTable([
+            models.VehicleMaintenance(cost=Decimal('1.25')),
+            models.VehicleMaintenance(cost=Decimal('2.75')),
+        ])
+        self.assertEqual(table.columns['cost'].footer, Decimal('4.00'))
+
+
+class ReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = models.User.objects.create_user(username='moderator', is_moderator=True)
+        self.client.force_login(self.user)
+        self.first, self.second = create_trip_requests(
+            2, mileage_act=12, fuel_cost=Decimal('20.00'))
+        self.org = self.first.org
+        self.vehicle = create_vehicle(self.org)
+        start = timezone.make_aware(datetime(2021, 3, 1, 8))
+        # One trip inside March, one straddling its end by 4 of its 8 hours.
+        models.TripRequest.objects.filter(pk=self.first.pk).update(
+            status=models.TripRequest.STATUS_APPROVED, vehicle=self.vehicle,
+            depart_est=start, return_est=start + timedelta(hours=4))
+        models.TripRequest.objects.filter(pk=self.second.pk).update(
+            status=models.TripRequest.STATUS_COMPLETED, vehicle=self.vehicle,
+            depart_est=timezone.make_aware(datetime(2021, 3, 31, 20)),
+            return_est=timezone.make_aware(datetime(2021, 4, 1, 4)))
+        models.VehicleMaintenance.objects.create(
+            vehicle=self.vehicle, date=date(2021, 3, 15), cost=Decimal('99.99'), mileage=1)
+        self.march = reports.ReportRange(date(2021, 3, 1), date(2021, 3, 31))
+
+    def test_vehicle_report(self):
+        row, = reports.vehicle_report([self.vehicle], self.march)
+        self.assertEqual(row['trips'], 2)
+        self.assertAlmostEqual(row['booked_hours'], 8.0)
+        self.assertAlmostEqual(row['utilization'], 8.0 / (31 * 24) * 100)
+        self.assertEqual((row['mileage_act'], row['fuel_cost']), (24, Decimal('40.00')))
+        self.assertEqual(row['maintenance_cost'], Decimal('99.99'))
+
+        april, = reports.vehicle_report(
+            [self.vehicle], reports.ReportRange(date(2021, 4, 1), date(2021, 4, 30)))
+        # The straddling trip's hours count in April, its mileage in March.
+        self.assertEqual((april['trips'], april['mileage_act']), (0, 0))
+        self.assertAlmostEqual(april['booked_hours'], 4.0)
+
+    def test_pending_trips_are_excluded(self):
+        models.TripRequest.objects.filter(pk=self.second.pk).update(
+            status=models.TripRequest.STATUS_PENDING)
+        row, = reports.vehicle_report([self.vehicle], self.march)
+        self.assertEqual((row['trips'], row['mileage_act']), (1, 12))
+        self.assertAlmostEqual(row['booked_hours'], 4.0)
+
+        rollups.refresh()
+        row, = reports.org_report([self.org], self.march)
+        self.assertEqual(row['trips'], 1)
+
+    def test_org_report_breaks_down_by_department_and_budget(self):
+        rollups.refresh()
+        row, = reports.org_report([self.org], self.march)
+        self.assertEqual(row['fuel_cost'], Decimal('40.00'))
+        self.assertEqual([d['name'] for d in row['departments']], ['Department'])
+        self.assertEqual(row['budgets'][0]['trips'], 2)
+
+    def test_report_view_is_cached(self):
+        url = (f"{reverse('vehicle-report')}?pk_list={self.vehicle.pk}"
+               '&start=2021-03-01&end=2021-03-31')
+        with CaptureQueriesContext(connection) as cold:
+            response = self.client.get(url)
+        self.assertContains(response, '99.99')
+        with CaptureQueriesContext(connection) as warm:
+            self.client.get(url)
+        self.assertLess(len(warm.captured_queries), len(cold.captured_queries))
+
+        response = self.client.get(
+            f"{reverse('vehicle-report')}?pk_list={self.vehicle.pk}&start=soon")
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_reports_render(self):
+        driver = models.Driver.objects.create(first_name='John', last_name='Smith')
+        for name, pk in (('org-report', self.org.pk), ('driver-report', driver.pk),
+                         ('request-report', self.first.pk)):
+            response = self.client.get(f'{reverse(name)}?pk_list={pk},999')
+            self.assertContains(response, 'not found: 999')
+
+
+@override_settings(TP_ROLLUP_LAG=0)
+class RollupTests(TestCase):
+    def setUp(self):
+        self.first, self.second = create_trip_requests(2, party_count=3, mileage_act=10)
+        models.TripRequest.objects.update(status=models.TripRequest.STATUS_APPROVED)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.vehicle = create_vehicle(self.first.org)
+        self.day = timezone.localdate(self.first.depart_est)
+
+    def stat(self, day):
+        return models.DailyTripStat.objects.filter(date=day).aggregate(
+            trips=Sum('trips'), party=Sum('party_count'), miles=Sum('mileage_act'))
+
+    def test_full_then_incremental_refresh(self):
+        self.assertIsNone(rollups.refresh())
+        self.assertEqual(self.stat(self.day), {'trips': 2, 'party': 6, 'miles': 20})
+
+        # Nothing changed, nothing recomputed.
+        self.assertEqual(rollups.refresh(), 0)
+
+        self.second.mileage_act = 15
+        self.second.save()
+        models.VehicleMaintenance.objects.create(
+            vehicle=self.vehicle, date=self.day, cost=Decimal('5.00'), mileage=1)
+        self.assertEqual(rollups.refresh(), 1)
+        self.assertEqual(self.stat(self.day)['miles'], 25)
+        self.assertEqual(
+            models.DailyMaintenanceStat.objects.get(date=self.day).cost, Decimal('5.00'))
+
+    def test_moved_and_deleted_rows_recompute_their_old_day(self):
+        rollups.refresh()
+        later = self.day + timedelta(days=3)
+        self.second.depart_est += timedelta(days=3)
+        self.second.return_est += timedelta(days=3)
+        self.second.save()
+        self.first.delete()
+
+        self.assertEqual(rollups.refresh(), 2)
+        self.assertEqual(self.stat(self.day)['trips'], None)
+        self.assertEqual(self.stat(later)['trips'], 1)
+        self.assertFalse(models.StaleRollupDate.objects.exists())
+
+    def test_saves_not_moving_the_day_skip_the_lookup(self):
+        with CaptureQueriesContext(connection) as context:
+            self.second.save(update_fields=['mileage_act'])
+        self.assertFalse([q for q in context.captured_queries if q['sql'].startswith('SELECT')])
+
+    @override_settings(TP_ROLLUP_LAG=60)
+    def test_lag_recomputes_recent_days_again(self):
+        rollups.refresh()
+        # A row committing late with an earlier ``updated`` is still found.
+        models.TripRequest.objects.filter(pk=self.second.pk).update(
+            mileage_act=15, updated=timezone.now() - timedelta(seconds=30))
+        self.assertEqual(rollups.refresh(), 1)
+        self.assertEqual(self.stat(self.day)['miles'], 25)
+
+
+@override_settings(TP_SLOW_REQUEST_MS=0, TP_METRICS_TOKEN='secret')
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(username='moderator', is_moderator=True)
+        self.client.force_login(self.user)
+        create_trip_requests(3, requestor=self.user)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_measured_by_url_name(self):
+        before = {
+            'requests': self.sample('tp_requests_total', view='request-list', method='GET',
+                                    status='200'),
+            'count': self.sample('tp_request_duration_seconds_count', view='request-list'),
+            'queries': self.sample('tp_db_queries_total', view='request-list'),
+            'template': self.sample('tp_template_duration_seconds_total', view='request-list'),
+        }
+        with self.assertLogs('transportation.middleware', 'WARNING') as logs:
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(reverse('request-list'))
+        self.assertIn('(request-list)', logs.output[0])
+
+        self.assertEqual(self.sample('tp_requests_total', view='request-list', method='GET',
+                                     status='200'), before['requests'] + 1)
+        self.assertEqual(self.sample('tp_request_duration_seconds_count', view='request-list'),
+                         before['count'] + 1)
+        self.assertEqual(self.sample('tp_db_queries_total', view='request-list'),
+                         before['queries'] + len(context.captured_queries))
+        self.assertGreater(self.sample('tp_template_duration_seconds_total', view='request-list'),
+                           before['template'])
+
+    def test_metrics_endpoint_is_staff_or_token_only(self):
+        self.client.get(reverse('request-list'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertContains(
+            response, 'tp_requests_total{method="GET",status="200",view="request-list"}')
+        self.assertContains(response, 'tp_request_duration_seconds_bucket{')
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_metrics_are_read_from_the_shared_directory(self):
+        self.client.get(reverse('request-list'))
+        with tempfile.TemporaryDirectory() as path:
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': path}):
+                # No worker has written its values there, so nothing is reported.
+                self.assertNotIn(b'tp_requests_total', middleware.render())
+
+
+class SeedBenchmarkTests(TestCase):
+    def test_seed_then_benchmark(self):
+        out = StringIO()
+        call_command('seed', orgs=2, users=3, drivers=4, vehicles=3, requests=40,
+                     maintenance=2, stdout=out)
+        self.assertIn('seed: trip requests 40 in', out.getvalue())
+        self.assertEqual(models.TripRequest.objects.count(), 40)
+        # Names come from the seed, so the same seed gives the same data.
+        self.assertTrue(models.Organization.objects.filter(name='Organization seed0-0').exists())
+        self.assertFalse(models.TripRequest.objects.filter(last_activity=None).exists())
+        self.assertEqual(models.VehicleMaintenance.objects.count(), 6)
+        for driver in models.Driver.objects.all():
+            self.assertEqual(driver.search_name, search.normalize_name(driver.full_name))
+        # Drivers & vehicles are never double booked.
+        for trip in models.TripRequest.objects.blocking().exclude(driver=None):
+            self.assertFalse(models.TripRequest.objects.blocking().overlapping(
+                trip.depart_est, trip.return_est
+            ).filter(driver=trip.driver).exclude(pk=trip.pk).exists())
+
+        out = StringIO()
+        call_command('benchmark', iterations=1, warmup=0, stdout=out)
+        for name in ('request-list', 'request-detail', 'vehicle-detail', 'print-tickets',
+                     'query-drivers'):
+            self.assertIn(name, out.getvalue())
+
+    def test_benchmark_fails_on_more_queries_than_the_baseline(self):
+        call_command('seed', orgs=1, users=1, drivers=1, vehicles=1, requests=5,
+                     maintenance=1, stdout=StringIO())
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as baseline:
+            json.dump({'request-detail': {'p50': 1000, 'p95': 1000, 'queries': 0}}, baseline)
+            baseline.flush()
+            with self.assertRaisesMessage(CommandError, 'request-detail'):
+                call_command('benchmark', iterations=1, warmup=0, baseline=baseline.name,
+                             stdout=StringIO())
+
+
+class BulkTransitionTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(
+            username='moderator', is_moderator=True, first_name='M')
+        self.client.force_login(self.user)
+        self.triprequests = create_trip_requests(4, requestor=self.user)
+        vehicle = create_vehicle(self.triprequests[0].org)
+        driver = models.Driver.objects.create(first_name='Jane', last_name='Doe')
+        for i, triprequest in enumerate(self.triprequests[:3]):
+            # A day apart, as one driver & vehicle can't be booked twice at once.
+            models.TripRequest.objects.filter(pk=triprequest.pk).update(
+                driver=driver, vehicle=vehicle, depart_est=F('depart_est') + timedelta(days=i),
+                return_est=F('return_est') + timedelta(days=i))
+
+    def post(self, name, pks):
+        return self.client.post(reverse(name), {'pk_list': ','.join(map(str, pks))})
+
+    def test_approve_reports_each_request(self):
+        pks = [t.pk for t in self.triprequests] + [999]
+        response = self.post('approve-requests', pks)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['succeeded'], body['failed']), (3, 2))
+        self.assertEqual([r['status'] for r in body['results']], ['success'] * 3 + ['error'] * 2)
+        self.assertIn('requirements', body['results'][3]['message'])
+
+        approved = models.TripRequest.objects.filter(status=models.TripRequest.STATUS_APPROVED)
+        self.assertEqual(set(approved.values_list('pk', flat=True)), set(pks[:3]))
+        for triprequest in approved.select_related('last_activity'):
+            self.assertEqual(
+                triprequest.last_activity.type, models.TripRequestActivity.TYPE_APPROVED)
+            self.assertEqual(triprequest.last_activity.user, self.user)
+        self.assertEqual(models.OutboundEmail.objects.count(), 3)
+
+        # Approving again is reported, not repeated.
+        body = self.post('approve-requests', pks[:1]).json()
+        self.assertEqual(body['results'][0]['status'], 'error')
+        self.assertIn('already approved', body['results'][0]['message'])
+
+    def test_query_count_independent_of_batch_size(self):
+        def count(pks):
+            with CaptureQueriesContext(connection) as context:
+                self.post('cancel-requests', pks)
+            return len(context.captured_queries)
+        self.assertEqual(count([self.triprequests[0].pk]),
+                         count([t.pk for t in self.triprequests[1:]]))
+        self.assertEqual(models.TripRequest.objects.filter(
+            status=models.TripRequest.STATUS_CANCELLED).count(), 4)
+
+    def test_requires_post(self):
+        self.assertEqual(self.client.get(reverse('deny-requests')).status_code, 405)
+        self.assertEqual(self.post('deny-requests', ['x']).status_code, 400)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(
+            username='moderator', is_moderator=True, first_name='M')
+        self.client.force_login(self.user)
+        self.triprequests = create_trip_requests(5, requestor=self.user)
+        self.driver = models.Driver.objects.create(first_name='Jane', last_name='Doe')
+        models.TripRequest.objects.update(driver=self.driver)
+
+    def test_sparse_fields_and_cursor_pagination(self):
+        url = reverse('v1:request-list')
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get(url, {'fields': 'id,driver_name', 'page_size': 2})
+        body = response.json()
+        self.assertEqual(body['results'][0],
+                         {'id': self.triprequests[0].pk, 'driver_name': 'Jane Doe'})
+        self.assertIsNotNone(body['next'])
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url, {'fields': 'id,driver_name', 'page_size': 5})
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+        ids = [row['id'] for row in body['results']]
+        ids += [row['id'] for row in self.client.get(body['next']).json()['results']]
+        self.assertEqual(ids, [t.pk for t in self.triprequests[:4]])
+
+    def test_etag(self):
+        url = f"{reverse('v1:request-list')}?fields=id,status,driver"
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('transportation_triprequest"."status' in q['sql']
+                             for q in context.captured_queries))
+
+        self.triprequests[0].cancel(commit=True, user=self.user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Names from joined rows are tagged by content, so a rename shows.
+        url = reverse('v1:request-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.driver.last_name = 'Roe'
+        self.driver.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        detail = reverse('v1:driver-detail', kwargs={'pk': self.driver.pk})
+        etag = self.client.get(detail)['ETag']
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_bulk_create_and_update(self):
+        response = self.client.post(reverse('v1:driver-list'), [
+            {'first_name': 'José', 'last_name': 'Núñez'}, {'first_name': 'Ann', 'last_name': 'Lee'}
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            models.Driver.objects.get(pk=response.json()[0]['id']).search_name, 'jose nunez')
+
+        triprequest = self.triprequests[0]
+        data = {
+            'org': triprequest.org_id, 'department': triprequest.department_id,
+            'budget': triprequest.budget_id,
+            'contact_fn': 'A', 'contact_ln': 'B', 'contact_phone': '434-582-2000',
+            'contact_email': 'a@example.com', 'destination': 'D', 'purpose': 'P', 'mileage_est': 5,
+            'depart_est': triprequest.depart_est.isoformat(),
+            'return_est': triprequest.return_est.isoformat(),
+        }
+        response = self.client.post(
+            reverse('v1:request-list'), [data, data], content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        created = models.TripRequest.objects.filter(pk__in=[row['id'] for row in response.json()])
+        self.assertEqual(len(created), 2)
+        for t in created:
+            self.assertEqual((t.requestor, t.last_activity.type),
+                             (self.user, models.TripRequestActivity.TYPE_CREATED))
+
+        response = self.client.patch(reverse('v1:request-list'), [
+            {'id': self.triprequests[1].pk, 'mileage_act': 12},
+            {'id': self.triprequests[2].pk, 'mileage_act': 30}
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        updated = models.TripRequest.objects.get(pk=self.triprequests[2].pk)
+        self.assertEqual(updated.mileage_act, 30)
+        self.assertEqual(updated.last_activity.type, models.TripRequestActivity.TYPE_EDITED)
+        self.assertGreater(updated.updated, self.triprequests[2].updated)
+
+        response = self.client.patch(reverse('v1:request-list'), [{'id': 999, 'mileage_act': 1}],
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_permissions(self):
+        user = models.User.objects.create_user(username='requestor')
+        models.TripRequest.objects.filter(pk=self.triprequests[1].pk).update(requestor=user)
+        self.client.force_login(user)
+        response = self.client.get(reverse('v1:request-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()['results']],
+                         [self.triprequests[1].pk])
+        detail = reverse('v1:request-detail', kwargs={'pk': self.triprequests[0].pk})
+        self.assertEqual(self.client.get(detail).status_code, 404)
+        self.assertEqual(self.client.get(reverse('v1:driver-list')).status_code, 403)
+        self.assertEqual(self.client.patch(reverse('v1:request-list'), [],
+                                           content_type='application/json').status_code, 403)
+
+
+@override_settings(TP_CHANGE_FEED_LAG=0)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(username='moderator', is_moderator=True)
+        self.client.force_login(self.user)
+        self.triprequests = create_trip_requests(3, requestor=self.user)
+
+    def read(self, **params):
+        response = self.client.get(reverse('v1:changes', kwargs={'feed': 'requests'}), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_incremental_sync(self):
+        body = self.read(limit=2)
+        self.assertEqual([row['id'] for row in body['changed']],
+                         [t.pk for t in self.triprequests[:2]])
+        self.assertTrue(body['more'])
+        body = self.read(since=body['cursor'], limit=2)
+        self.assertEqual([row['id'] for row in body['changed']], [self.triprequests[2].pk])
+        self.assertFalse(body['more'])
+        cursor = body['cursor']
+        self.assertEqual(self.read(since=cursor)['changed'], [])
+
+        self.triprequests[1].cancel(commit=True, user=self.user)
+        deleted = self.triprequests[0].pk
+        self.triprequests[0].delete()
+        body = self.read(since=cursor)
+        self.assertEqual([row['id'] for row in body['changed']], [self.triprequests[1].pk])
+        self.assertEqual(body['changed'][0]['status'], models.TripRequest.STATUS_CANCELLED)
+        self.assertEqual(body['deleted'], [deleted])
+        body = self.read(since=body['cursor'])
+        self.assertEqual((body['changed'], body['deleted'], body['more']), ([], [], False))
+
+    def test_invalid_cursor_and_command(self):
+        response = self.client.get(
+            reverse('v1:changes', kwargs={'feed': 'requests'}), {'since': 'nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse('v1:changes', kwargs={'feed': 'nope'})).status_code, 404)
+
+        out = StringIO()
+        call_command('changefeed', 'requests', '--limit', '1', stdout=out)
+        self.assertEqual(len(json.loads(out.getvalue())['changed']), 1)
+
+    def test_api_vehicle_edits_are_in_the_feed(self):
+        vehicle = create_vehicle(self.triprequests[0].org)
+        url = reverse('v1:changes', kwargs={'feed': 'vehicles'})
+        cursor = self.client.get(url).json()['cursor']
+        response = self.client.patch(reverse('v1:vehicle-list'), [
+            {'id': vehicle.pk, 'notes': 'New tires'}
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = self.client.get(url, {'since': cursor}).json()
+        self.assertEqual([(row['id'], row['notes']) for row in body['changed']],
+                         [(vehicle.pk, 'New tires')])
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        self.driver = models.Driver.objects.create(first_name='Jane', last_name='Doe')
+        self.triprequests = create_trip_requests(2, driver=self.driver)
+        self.vehicle = create_vehicle(self.triprequests[0].org)
+        for i, triprequest in enumerate(self.triprequests):
+            triprequest.vehicle = self.vehicle
+            triprequest.depart_est += timedelta(days=i)
+            triprequest.return_est += timedelta(days=i)
+            triprequest.save()
+            triprequest.approve(commit=True)
+        self.url = calendars.feed_url('driver', self.driver.pk)
+
+    def test_feed_and_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn(f'UID:triprequest-{self.triprequests[0].pk}@transportation', body)
+        self.assertIn('Vehicle: #1 - 2020 Make Model', body)
+
+        with CaptureQueriesContext(connection) as context:
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(len(context.captured_queries), 1)
+        modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(modified.status_code, 304)
+
+        self.triprequests[1].cancel(commit=True)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode().count('BEGIN:VEVENT'), 1)
+
+    def test_driver_and_vehicle_edits_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.driver.first_name = 'Janet'
+            self.driver.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Driver: Janet Doe', response.content.decode())
+
+        # As the API's bulk edits do, without signals.
+        models.Vehicle.objects.filter(pk=self.vehicle.pk).update(
+            make='Other', updated=timezone.now() + timedelta(seconds=1))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Vehicle: #1 - 2020 Other Model', response.content.decode())
+
+    def test_token(self):
+        url = self.url.replace(calendars.make_token('driver', self.driver.pk), 'forged')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(
+            self.client.get(calendars.feed_url('vehicle', self.vehicle.pk)).status_code, 200)
+
+    def test_fold(self):
+        line = 'DESCRIPTION:' + 'é' * 80
+        folded = calendars.fold(line)
+        self.assertTrue(all(len(part.encode()) <= 75 for part in folded.split('\r\n')))
+        self.assertEqual(folded.replace('\r\n ', ''), line)
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = models.User.objects.create_user(username='moderator', is_moderator=True)
+        self.client.force_login(self.user)
+        self.triprequests = create_trip_requests(3)
+        self.org = self.triprequests[0].org
+        self.vehicle = create_vehicle(self.org)
+        models.TripRequest.objects.filter(pk=self.triprequests[0].pk).update(vehicle=self.vehicle)
+        self.triprequests[2].deny(commit=True)
+        self.url = reverse('load-dispatch')
+        self.params = {
+            'start': self.triprequests[0].depart_est.date().isoformat(), 'org': self.org.pk
+        }
+
+    def test_board(self):
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, 200)
+        board = response.json()
+        self.assertEqual(board['end'] - board['start'], 7 * 24 * 3600)
+        self.assertEqual([t[0] for t in board['vehicles'][0]['trips']], [self.triprequests[0].pk])
+        self.assertEqual([t[0] for t in board['unassigned']], [self.triprequests[1].pk])
+
+        with CaptureQueriesContext(connection) as context:
+            window = dispatch.get_window(self.triprequests[0].depart_est.date(), 'week')
+            dispatch.get_board(*window, self.org.pk)
+        self.assertEqual(len(context.captured_queries), 0)
+
+        # The cached board is kept until the change commits.
+        self.triprequests[1].vehicle = self.vehicle
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.triprequests[1].save()
+        self.assertEqual(self.client.get(self.url, self.params).json()['unassigned'][0][0],
+                         self.triprequests[1].pk)
+        for callback in callbacks:
+            callback()
+        board = self.client.get(self.url, self.params).json()
+        self.assertEqual(len(board['vehicles'][0]['trips']), 2)
+        self.assertEqual(board['unassigned'], [])
+
+    def test_window(self):
+        start, end = dispatch.get_window(date(2021, 3, 17), 'month')
+        self.assertEqual((start.date(), end.date()), (date(2021, 3, 1), date(2021, 4, 1)))
+        self.assertEqual(self.client.get(self.url, {'span': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('dispatch')).status_code, 200)
+
+
+class DoubleBookingTests(TestCase):
+    def setUp(self):
+        self.user = models.User.objects.create_user(username='moderator', is_moderator=True)
+        self.client.force_login(self.user)
+        self.triprequests = create_trip_requests(3)
+        self.vehicle = create_vehicle(self.triprequests[0].org)
+        self.driver = models.Driver.objects.create(first_name='Jane', last_name='Doe')
+        models.TripRequest.objects.update(vehicle=self.vehicle, driver=self.driver)
+        self.triprequests[0].refresh_from_db()
+        self.triprequests[0].approve(commit=True)
+
+    def test_save_refuses_double_booking(self):
+        triprequest = models.TripRequest.objects.get(pk=self.triprequests[1].pk)
+        with self.assertRaises(ValidationError) as context:
+            triprequest.approve(commit=True)
+        self.assertIn(f'trip request {self.triprequests[0].pk}',
+                      context.exception.message_dict['vehicle'][0])
+        triprequest.refresh_from_db()
+        self.assertEqual(triprequest.status, models.TripRequest.STATUS_PENDING)
+
+        # Once it no longer overlaps it can be booked.
+        triprequest.depart_est = self.triprequests[0].return_est
+        triprequest.return_est = triprequest.depart_est + timedelta(hours=1)
+        triprequest.save()
+        triprequest.approve(commit=True)
+
+    def test_bulk_approve_reports_conflicts(self):
+        pks = [t.pk for t in self.triprequests[1:]]
+        body = self.client.post(
+            reverse('approve-requests'), {'pk_list': ','.join(map(str, pks))}).json()
+        self.assertEqual(body['failed'], 2)
+        self.assertIn(f'booked by trip request {self.triprequests[0].pk}',
+                      body['results'][0]['message'])
+
+    def test_admin_form_names_conflict(self):
+        form = forms.TripRequestAdminForm(instance=self.triprequests[1])
+        form.data = {'approve': 'Approve'}
+        form.cleaned_data = {
+            'status': str(models.TripRequest.STATUS_PENDING), 'vehicle': self.vehicle,
+            'driver': self.driver, 'depart_est': self.triprequests[1].depart_est,
+            'return_est': self.triprequests[1].return_est
+        }
+        form.clean()
+        self.assertIn(f'trip request {self.triprequests[0].pk}', form.errors['vehicle'][0])
+        self.assertNotIn('driver', form.errors)
+
+    def test_driver_assignment_reports_conflict(self):
+        other = models.Driver.objects.create(first_name='John', last_name='Roe')
+        models.TripRequest.objects.filter(pk=self.triprequests[1].pk).update(
+            vehicle=create_vehicle(self.triprequests[0].org, num=2), driver=other,
+            status=models.TripRequest.STATUS_APPROVED)
+        url = reverse('request-update', kwargs={'pk': self.triprequests[1].pk})
+
+        body = self.client.post(url, {'driver': self.driver.pk}).json()
+        self.assertEqual(body['status'], 'error')
+        self.assertIn(f'trip request {self.triprequests[0].pk}', body['message'])
+        self.assertEqual(models.TripRequest.objects.get(pk=self.triprequests[1].pk).driver, other)
+
+        third = models.Driver.objects.create(first_name='Ann', last_name='Poe')
+        self.assertEqual(self.client.post(url, {'driver': third.pk}).json()['status'], 'success')
+        triprequest = models.TripRequest.objects.get(pk=self.triprequests[1].pk)
+        self.assertEqual(triprequest.driver, third)
+        self.assertEqual(triprequest.last_activity.user, self.user)
+
+    def test_api_refuses_double_booking(self):
+        second = create_vehicle(self.triprequests[0].org, num=2)
+        models.TripRequest.objects.filter(pk=self.triprequests[1].pk).update(
+            vehicle=second, driver=None, status=models.TripRequest.STATUS_APPROVED)
+        response = self.client.patch(reverse('v1:request-list'), [
+            {'id': self.triprequests[1].pk, 'vehicle': self.vehicle.pk}
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'trip request {self.triprequests[0].pk}', response.json()['vehicle'][0])
+        self.assertEqual(models.TripRequest.objects.get(pk=self.triprequests[1].pk).vehicle, second)
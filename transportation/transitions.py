@@ -0,0 +1,136 @@
+"""
+Transportation Request Transitions
+
+Applies one status transition (approve, deny, cancel, return, finalize) to
+many trip requests at once: the requests are read & checked with one query,
+as are the double bookings approving them would make, the valid ones are
+moved with a single UPDATE, their activities are bulk created and the
+notification emails are queued in the outbox, all in one transaction.
+Requests that can't make the transition are reported back rather than
+failing the batch.
+"""
+
+import logging
+from itertools import chain
+
+from django.db import transaction
+from django.utils import timezone
+
+from transportation import dispatch, emails
+from transportation.models import OutboundEmail, TripRequest, TripRequestActivity, guard_bookings
+
+
+logger = logging.getLogger(__name__)
+
+
+class Transition:
+    """A status change & the activity and email that record it.
+
+    Arguments:
+        verb {str} -- Past tense used in result messages, e.g. 'approved'
+        status {int} -- TripRequest status moved to
+        activity_type {int} -- TripRequestActivity type logged
+        email {callable} -- Builds the TripRequestEmail from (triprequest, old_status)
+        requires_assignment {bool} -- Whether a driver & vehicle must be assigned
+    """
+
+    def __init__(self, verb, status, activity_type, email, requires_assignment=False):
+        self.verb = verb
+        self.status = status
+        self.activity_type = activity_type
+        self.email = email
+        self.requires_assignment = requires_assignment
+
+    def check(self, triprequest):
+        """ Why triprequest can't make this transition, or None if it can. """
+        if triprequest.status == self.status:
+            return f'Trip request {triprequest.pk} is already {self.verb}'
+        unassigned = triprequest.driver_id is None or triprequest.vehicle_id is None
+        if self.requires_assignment and unassigned:
+            return f'Trip request {triprequest.pk} did not meet all requirements'
+        return None
+
+
+TRANSITIONS = {
+    'approve': Transition(
+        'approved', TripRequest.STATUS_APPROVED, TripRequestActivity.TYPE_APPROVED,
+        lambda triprequest, old_status: emails.TripRequestApprovedEmail(triprequest),
+        requires_assignment=True),
+    'deny': Transition(
+        'denied', TripRequest.STATUS_DENIED, TripRequestActivity.TYPE_DENIED,
+        lambda triprequest, old_status: emails.TripRequestDeniedEmail(triprequest)),
+    'cancel': Transition(
+        'cancelled', TripRequest.STATUS_CANCELLED, TripRequestActivity.TYPE_CANCELLED,
+        lambda triprequest, old_status: emails.TripRequestCanceledEmail(triprequest)),
+    'return': Transition(
+        'returned', TripRequest.STATUS_RETURNED, TripRequestActivity.TYPE_FINISHED,
+        lambda triprequest, old_status: emails.TripRequestStatusEmail(
+            triprequest, old_status, TripRequest.STATUS_RETURNED),
+        requires_assignment=True),
+    'finalize': Transition(
+        'completed', TripRequest.STATUS_COMPLETED, TripRequestActivity.TYPE_FINISHED,
+        lambda triprequest, old_status: emails.TripRequestStatusEmail(
+            triprequest, old_status, TripRequest.STATUS_COMPLETED),
+        requires_assignment=True),
+}
+
+
+def apply(name, pk_list, user=None):
+    """Apply the transition named name to the trip requests in pk_list.
+
+    Arguments:
+        name {str} -- Key of TRANSITIONS
+        pk_list {list} -- Trip request IDs
+        user {User} -- Moderator making the change, recorded on the activities
+
+    Returns:
+        list -- One {'id', 'status', 'message'} dict per ID, in the given order
+    """
+    transition = TRANSITIONS[name]
+    results = {}
+    with transaction.atomic():
+        found = TripRequest.objects.select_for_update(of=('self',)).select_related(
+            'requestor', 'manager').in_bulk(pk_list)
+        moved = []
+        for pk in pk_list:
+            triprequest = found.get(pk)
+            if triprequest is None:
+                error = f'Trip request {pk} does not exist'
+            else:
+                error = transition.check(triprequest)
+            if error is not None:
+                results[pk] = {'id': pk, 'status': 'error', 'message': error}
+            elif pk not in results:
+                results[pk] = {'id': pk, 'status': 'success',
+                               'message': f'Trip request {pk} {transition.verb}'}
+                moved.append(triprequest)
+
+        booked = moved if transition.status in TripRequest.BOOKED_STATUSES else []
+        for triprequest, field, other in TripRequest.objects.booking_conflicts(booked):
+            results[triprequest.pk] = {
+                'id': triprequest.pk, 'status': 'error',
+                'message': f'Trip request {triprequest.pk} {field} is already booked by '
+                           f'trip request {other.pk}'
+            }
+            moved.remove(triprequest)
+
+        if moved:
+            # QuerySet.update() leaves the auto_now ``updated`` alone, which the
+            # rollups rely on, so it is set along with the status.
+            with guard_bookings(moved if booked else []):
+                TripRequestActivity.log_many(
+                    [triprequest.pk for triprequest in moved], transition.activity_type, user,
+                    status=transition.status, updated=timezone.now())
+
+            outbox = []
+            for triprequest in moved:
+                old_status = triprequest.status
+                triprequest.status = transition.status
+                outbox.append(transition.email(triprequest, old_status).outbound())
+            OutboundEmail.objects.bulk_create(chain.from_iterable(outbox))
+            # The UPDATE sends no post_save, which would have done this.
+            dispatch.invalidate()
+
+    logger.info(f'Trip requests {[t.pk for t in moved]} {transition.verb} by {user}'
+                f' ({getattr(user, "pk", None)}), {len(results) - len(moved)} skipped')
+    return [results[pk] for pk in pk_list]
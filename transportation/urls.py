@@ -37,6 +37,7 @@ urlpatterns = [
 
     path('drivers/', views.DriversView.as_view(), name='driver-list'),
     path('drivers/report', views.run_driver_report, name='driver-report'),
+    path('drivers/export', views.export_drivers, name='driver-export'),
     path('drivers/new', views.CreateDriverView.as_view(), name='new-driver'),
     path('drivers/delete', views.delete_drivers, name='delete-drivers'),
     path('drivers/<int:pk>/', views.DriverDetailView.as_view(), name='driver-detail'),
@@ -47,10 +48,15 @@ urlpatterns = [
 
     path('vehicles/', views.VehiclesView.as_view(), name='vehicle-list'),
     path('vehicles/report', views.run_vehicle_report, name='vehicle-report'),
+    path('vehicles/export', views.export_vehicles, name='vehicle-export'),
+    path('vehicles/maintenance/export', views.export_vehicle_maintenances,
+         name='maintenance-export'),
     path('vehicles/new', views.CreateVehicleView.as_view(), name='new-vehicle'),
     path('vehicles/<int:pk>/edit', views.UpdateVehicleView.as_view(), name='edit-vehicle'),
     path('vehicles/<int:pk>/delete', views.delete_vehicle, name='delete-vehicle'),
     path('vehicles/<int:vehicle_pk>/', views.VehicleDetailView.as_view(), name='vehicle-detail'),
+    path('vehicles/<int:vehicle_pk>/maintenance/export',
+         views.export_vehicle_maintenances, name='vehicle-maintenance-export'),
     path('vehicles/<int:vehicle_pk>/maintenance/new',
          views.CreateVehicleMaintenanceView.as_view(), name='new-vehicle-maintenance'),
     path('vehicles/<int:vehicle_pk>/maintenance/<int:pk>/edit',
@@ -58,11 +64,26 @@ urlpatterns = [
     path('vehicles/<int:vehicle_pk>/maintenance/<int:pk>/delete',
          views.delete_vehicle_maintenance, name='delete-vehicle-maintenance'),
 
+    path('dispatch/', views.DispatchView.as_view(), name='dispatch'),
+
     path('requests/', views.TripRequestsView.as_view(), name='request-list'),
     path('requests/report', views.run_triprequest_report, name='request-report'),
+    path('requests/export', views.export_triprequests, name='request-export'),
+    path('metrics', views.metrics, name='metrics'),
+    path('calendars/<str:scope>/<int:pk>/<str:token>.ics', views.calendar_feed,
+         name='calendar-feed'),
     path('requests/print/labels', views.print_labels, name='print-labels'),
     path('requests/print/tickets', views.print_tickets, name='print-tickets'),
     path('requests/new', views.CreateTripRequestView.as_view(), name='new-request'),
+    path('requests/approve', views.transition_requests, {'transition': 'approve'},
+         name='approve-requests'),
+    path('requests/deny', views.transition_requests, {'transition': 'deny'}, name='deny-requests'),
+    path('requests/cancel', views.transition_requests, {'transition': 'cancel'},
+         name='cancel-requests'),
+    path('requests/return-vehicle', views.transition_requests, {'transition': 'return'},
+         name='return-requests-vehicle'),
+    path('requests/finalize', views.transition_requests, {'transition': 'finalize'},
+         name='finalize-requests'),
     path('requests/<int:pk>/assign-self', views.assign_request_moderator, name='request-assign-self'),
     path('requests/<int:pk>/', views.TripRequestDetailView.as_view(), name='request-detail'),
     path('requests/<int:pk>/update', views.update_request, name='request-update'),
@@ -78,6 +99,7 @@ urlpatterns = [
     path('ajax/load-departments', views.load_departments, name='load-departments'),
     path('ajax/load-budgets', views.load_budgets, name='load-budgets'),
     path('ajax/load-drivers', views.load_drivers, name='query-drivers'),
+    path('ajax/load-dispatch', views.load_dispatch, name='load-dispatch'),
 
     path('', views.HomeView.as_view(), name='home')
 ]
@@ -10,23 +10,32 @@ from dateutil.parser import parse
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.conf import settings
 from django.contrib import auth, messages
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView as DjangoLoginView
-from django.http import HttpResponseRedirect, JsonResponse, HttpResponse
+from django.http import Http404, HttpResponseRedirect, JsonResponse, HttpResponse
 from django.shortcuts import render
 from django.urls import reverse, reverse_lazy
 from django.views.generic import TemplateView
 from django.views.generic.edit import CreateView, UpdateView
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Sum, Q, Value, CharField
-from django.db.models.functions import Concat
+from django.views.decorators.http import require_POST, require_safe
+from django.db.models import Sum, Q
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy as _
 
 from django_tables2 import SingleTableMixin, LazyPaginator, MultiTableMixin
 from django_filters.views import FilterView
+from prometheus_client import CONTENT_TYPE_LATEST
 
-from transportation import models, forms, tables, filters, emails
+from transportation import (
+    models, forms, tables, filters, emails, exports, calendars, dispatch,
+    lookups, middleware, pagination, reports, rollups, search, transitions
+)
 from transportation.auth.mixins import (
     ModeratorRequiredMixin, superuser_required, moderator_required
 )
@@ -222,7 +231,12 @@ def update_request(request, pk, *args, **kwargs):
 
         original_driver = triprequest.driver
         triprequest.driver = driver
-        triprequest.save(kwargs={'user': request.user})
+        try:
+            triprequest.save(user=request.user)
+        except ValidationError as ve:
+            message = f'Failed to assign driver {driver_pk} to request {pk}. {ve.messages[0]}'
+            logger.error(message)
+            return JsonResponse({'status': 'error', 'message': message})
 
         logger.info(
             f"Trip request {pk}'s driver updated from {original_driver} to {driver} by {request.user} ({request.user.pk})")
@@ -282,7 +296,7 @@ def cancel_trip_request(request, pk, *args, **kwargs):
     """ Delete trip request given the ID. """
     try:
         triprequest = models.TripRequest.objects.get(pk=pk)
-        triprequest.cancel(commit=True, kwargs={'user': request.user, 'request': triprequest})
+        triprequest.cancel(commit=True, user=request.user)
         logger.info(f'Trip request {pk} cancelled by {request.user} ({request.user.pk})')
     except models.TripRequest.DoesNotExist as dne:
         message = f'Failed to cancel trip request with ID: {pk}'
@@ -333,7 +347,7 @@ def approve_request(request, pk, *args, **kwargs):
         logger.error(message)
         return JsonResponse({'status': 'error', 'message': message})
     except ValidationError as ve:
-        message = f'Failed to approve TripRequest, ID: {pk}. Did not meet all requirements.'
+        message = f'Failed to approve TripRequest, ID: {pk}. {ve.messages[0]}'
         logger.error(message)
         return JsonResponse({'status': 'error', 'message': message})
 
@@ -352,8 +366,9 @@ def pending_request(request, pk, *args, **kwargs):
         original_status = triprequest.status
         if original_status == models.TripRequest.STATUS_PENDING:
             return JsonResponse({'error': 'This trip request is already pending'})
-        triprequest.status = models.TripRequest.STATUS_PENDING
-        triprequest.save(user=request.user)
+        triprequest.transition(
+            models.TripRequest.STATUS_PENDING, models.TripRequestActivity.TYPE_PENDING,
+            request.user)
         logger.info(f'Trip request {pk} set to pending by {request.user} ({request.user.pk})')
     except models.TripRequest.DoesNotExist as dne:
         message = f'Failed to change status of TripRequest, ID: {pk}'
@@ -408,6 +423,9 @@ def return_request_vehicle(request, pk, *args, **kwargs):
     except ValueError as ve:
         message = f'Failed to change status to returned for TripRequest, ID: {pk}'
         return JsonResponse({'error': message})
+    except ValidationError as ve:
+        message = f'Failed to change status to returned for TripRequest, ID: {pk}. {ve.messages[0]}'
+        return JsonResponse({'error': message})
 
     email = emails.TripRequestStatusEmail(triprequest, old_status, new_status)
     email.send()
@@ -459,72 +477,239 @@ def chunks(lst, n):
         yield lst[i:i + n]
 
 
+def parse_pk_list(value):
+    """ IDs in a comma separated ``pk_list`` value, at most TP_MAX_BATCH_SIZE of them. """
+    try:
+        pk_list = [int(pk) for pk in value.split(',') if pk.strip()]
+    except ValueError:
+        raise ValidationError(_('pk_list must be a comma separated list of IDs'))
+    if len(pk_list) > settings.TP_MAX_BATCH_SIZE:
+        raise ValidationError(
+            _(f'Unable to process more than {settings.TP_MAX_BATCH_SIZE} IDs at once'))
+    return pk_list
+
+
+def resolve_pk_list(request, queryset):
+    """Resolve the ``pk_list`` query parameter with a single query.
+
+    Arguments:
+        request {HttpRequest} -- Request carrying a comma separated ``pk_list``
+        queryset {QuerySet} -- Query-planned queryset to fetch the objects from
+
+    Returns:
+        tuple -- (objects in the requested order, IDs that do not exist)
+    """
+    pk_list = parse_pk_list(request.GET.get('pk_list', ''))
+    found = queryset.in_bulk(pk_list)
+    objects = [found[pk] for pk in pk_list if pk in found]
+    missing = [pk for pk in pk_list if pk not in found]
+    if missing:
+        logger.warning(f'{queryset.model.__name__} IDs not found: {missing}')
+    return objects, missing
+
+
+def batch_error_response(ve):
+    return JsonResponse({'status': 'error', 'message': ve.messages[0]}, status=400)
+
+
+@moderator_required
+@require_POST
+def transition_requests(request, transition, *args, **kwargs):
+    """Apply a status transition to the trip requests in the posted ``pk_list``.
+
+    Arguments:
+        request {HttpRequest} -- POST carrying a comma separated ``pk_list``
+        transition {str} -- Key of transitions.TRANSITIONS, set by the URL
+
+    Returns:
+        JsonResponse -- Per-request results & success/error counts
+    """
+    try:
+        pk_list = parse_pk_list(request.POST.get('pk_list', ''))
+    except ValidationError as ve:
+        return batch_error_response(ve)
+    try:
+        results = transitions.apply(transition, pk_list, user=request.user)
+    except ValidationError as ve:
+        # A trip booked concurrently, after apply() checked for conflicts.
+        return batch_error_response(ve)
+    succeeded = sum(1 for result in results if result['status'] == 'success')
+    return JsonResponse({
+        'status': 'success' if succeeded == len(results) else 'error',
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results
+    })
+
+
 @moderator_required
 def print_labels(request, *args, **kwargs):
-    """ Delete vehicle maintenance given the ID. """
-    pk_list = request.GET.get('pk_list', None)
-    trip_requests = []
-    for pk in pk_list.split(','):
-        tr = models.TripRequest.objects.get(pk=int(pk))
-        trip_requests.append(tr)
+    """ Print labels for a list of trip requests. """
+    try:
+        trip_requests, missing = resolve_pk_list(
+            request, models.TripRequest.objects.select_related('department', 'vehicle', 'driver'))
+    except ValidationError as ve:
+        return batch_error_response(ve)
     context = {
-        'triprequests': chunks(trip_requests, 3)
+        'triprequests': chunks(trip_requests, 3),
+        'missing': missing
     }
     return render(request, 'transportation/labels.html', context)
 
 
 @moderator_required
 def print_tickets(request, *args, **kwargs):
-    """ Delete vehicle maintenance given the ID. """
-    pk_list = request.GET.get('pk_list', None)
-    context = {'triprequests': []}
-    for pk in pk_list.split(','):
-        tr = models.TripRequest.objects.get(pk=int(pk))
-        context['triprequests'].append(tr)
+    """ Print tickets for a list of trip requests. """
+    try:
+        trip_requests, missing = resolve_pk_list(
+            request, models.TripRequest.objects.select_related(
+                'department', 'budget', 'vehicle', 'driver', 'requestor', 'manager'))
+    except ValidationError as ve:
+        return batch_error_response(ve)
+    context = {
+        'triprequests': trip_requests,
+        'missing': missing
+    }
     return render(request, 'transportation/print-tickets.html', context)
 
 
+def render_report(request, name, objects, missing, report_range, build, **extra_context):
+    """Render reports/<name>.html for objects, computing the report at most once per cache timeout.
+
+    Arguments:
+        request {HttpRequest} -- The request
+        name {str} -- Report & template name
+        objects {list} -- Objects resolved from pk_list
+        missing {list} -- Requested IDs that do not exist
+        report_range {ReportRange} -- Dates to report on
+        build {callable} -- reports function taking (objects, report_range)
+        extra_context -- Added to the template context
+    """
+    params = {'pk_list': [obj.pk for obj in objects], **report_range.as_params()}
+    context = {
+        'rows': reports.cached_report(name, params, lambda: build(objects, report_range)),
+        'range': report_range,
+        'missing': missing,
+        **extra_context,
+    }
+    return render(request, f'transportation/reports/{name}.html', context)
+
+
 @moderator_required
 def run_org_report(request, *args, **kwargs):
-    pk_list = request.GET.get('pk_list', None)
-    context = {'orgs': []}
-    for pk in pk_list.split(','):
-        org = models.Organization.objects.get(pk=int(pk))
-        context['orgs'].append(org)
-    return render(request, 'transportation/reports/soon.html', context)
+    try:
+        orgs, missing = resolve_pk_list(request, models.Organization.objects.all())
+        report_range = reports.ReportRange.from_params(request.GET)
+    except ValidationError as ve:
+        return batch_error_response(ve)
+    return render_report(request, 'org', orgs, missing, report_range, reports.org_report,
+                         refreshed=rollups.last_refreshed())
 
 
 @moderator_required
 def run_vehicle_report(request, *args, **kwargs):
-    """ Delete vehicle maintenance given the ID. """
-    pk_list = request.GET.get('pk_list', None)
-    context = {'vehicles': []}
-    for pk in pk_list.split(','):
-        vehicle = models.Vehicle.objects.get(pk=int(pk))
-        context['vehicles'].append(vehicle)
-    return render(request, 'transportation/reports/soon.html', context)
+    try:
+        vehicles, missing = resolve_pk_list(request, models.Vehicle.objects.select_related('org'))
+        report_range = reports.ReportRange.from_params(request.GET)
+    except ValidationError as ve:
+        return batch_error_response(ve)
+    return render_report(
+        request, 'vehicle', vehicles, missing, report_range, reports.vehicle_report)
 
 
 @moderator_required
 def run_triprequest_report(request, *args, **kwargs):
-    """ Delete vehicle maintenance given the ID. """
-    pk_list = request.GET.get('pk_list', None)
-    context = {'vehicles': []}
-    for pk in pk_list.split(','):
-        vehicle = models.TripRequest.objects.get(pk=int(pk))
-        context['vehicles'].append(vehicle)
-    return render(request, 'transportation/reports/soon.html', context)
+    try:
+        triprequests, missing = resolve_pk_list(
+            request, models.TripRequest.objects.only('id', 'depart_est', 'return_est'))
+        if request.GET.get('start') or request.GET.get('end'):
+            report_range = reports.ReportRange.from_params(request.GET)
+        else:
+            report_range = reports.ReportRange.spanning(triprequests)
+    except ValidationError as ve:
+        return batch_error_response(ve)
+    return render_report(
+        request, 'request', triprequests, missing, report_range, reports.triprequest_report)
 
 
 @moderator_required
 def run_driver_report(request, *args, **kwargs):
-    """ Delete vehicle maintenance given the ID. """
-    pk_list = request.GET.get('pk_list', None)
-    context = {'drivers': []}
-    for pk in pk_list.split(','):
-        driver = models.Driver.objects.get(pk=int(pk))
-        context['drivers'].append(driver)
-    return render(request, 'transportation/reports/soon.html', context)
+    try:
+        drivers, missing = resolve_pk_list(request, models.Driver.objects.all())
+        report_range = reports.ReportRange.from_params(request.GET)
+    except ValidationError as ve:
+        return batch_error_response(ve)
+    return render_report(request, 'driver', drivers, missing, report_range, reports.driver_report)
+
+
+def metrics(request, *args, **kwargs):
+    """ Request metrics of every worker in the Prometheus text format, for staff or a token. """
+    token = settings.TP_METRICS_TOKEN
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized and token:
+        authorized = constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(middleware.render(), content_type=CONTENT_TYPE_LATEST)
+
+
+@require_safe
+def calendar_feed(request, scope, pk, token, *args, **kwargs):
+    """ iCalendar feed of a driver's, vehicle's or organization's trips, for a signed URL. """
+    if scope not in calendars.SCOPES or not calendars.check_token(scope, pk, token):
+        raise Http404
+    etag, updated = calendars.get_validators(scope, pk)
+    last_modified = int(updated.timestamp()) if updated is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        try:
+            obj = calendars.SCOPES[scope][0].objects.get(pk=pk)
+        except ObjectDoesNotExist:
+            raise Http404
+        response = HttpResponse(calendars.get_feed(scope, pk, str(obj), etag),
+                                content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required(login_url=reverse_lazy('sign-in'))
+def export_triprequests(request, *args, **kwargs):
+    """ Stream trip requests matching the request list filters as CSV. """
+    filterset = filters.TripRequestFilter(
+        request.GET, queryset=models.TripRequest.objects.all(), request=request)
+    queryset = filterset.qs.order_by('submitted', 'id')
+    return exports.stream_csv(queryset, exports.TRIPREQUEST_COLUMNS, 'requests.csv')
+
+
+@moderator_required
+def export_vehicles(request, *args, **kwargs):
+    """ Stream vehicles matching the vehicle list filters as CSV. """
+    filterset = filters.VehicleFilter(request.GET, queryset=models.Vehicle.objects.all())
+    queryset = filterset.qs.order_by('num', 'id')
+    return exports.stream_csv(queryset, exports.VEHICLE_COLUMNS, 'vehicles.csv')
+
+
+@moderator_required
+def export_drivers(request, *args, **kwargs):
+    """ Stream drivers matching the driver list filters as CSV. """
+    filterset = filters.DriverFilter(request.GET, queryset=models.Driver.objects.all())
+    queryset = filterset.qs.order_by('last_name', 'first_name', 'id')
+    return exports.stream_csv(queryset, exports.DRIVER_COLUMNS, 'drivers.csv')
+
+
+@moderator_required
+def export_vehicle_maintenances(request, vehicle_pk=None, *args, **kwargs):
+    """ Stream vehicle maintenance, optionally for a single vehicle, as CSV. """
+    queryset = models.VehicleMaintenance.objects.all()
+    if vehicle_pk is not None:
+        queryset = queryset.filter(vehicle_id=vehicle_pk)
+    filterset = filters.VehicleMaintenanceFilter(request.GET, queryset=queryset)
+    queryset = filterset.qs.order_by('date', 'id')
+    return exports.stream_csv(queryset, exports.VEHICLE_MAINTENANCE_COLUMNS, 'maintenance.csv')
 
 
 def load_departments(request, *args, **kwargs):
@@ -536,12 +721,11 @@ def load_departments(request, *args, **kwargs):
     }
 
     if org_ids is not None:
-        org_ids_list = map(int, org_ids.split(','))
-        orgs = models.Organization.objects.filter(pk__in=org_ids_list)
-        departments = models.Department.objects.filter(org_id__in=org_ids_list).order_by('name')
-        context['orgs'] = [o for o in orgs]
+        org_ids_list = set(map(int, org_ids.split(',')))
+        context['orgs'] = [o for o in lookups.get_organizations() if o.pk in org_ids_list]
+        departments = [o for o in lookups.get_departments() if o.org_id in org_ids_list]
     else:
-        departments = models.Department.objects.none()
+        departments = []
 
     context['departments'] = departments
     return render(request, 'transportation/partial/departments-dropdown.html', context)
@@ -556,33 +740,55 @@ def load_budgets(request, *args, **kwargs):
     }
 
     if org_ids is not None:
-        org_ids_list = map(int, org_ids.split(','))
-        orgs = models.Organization.objects.filter(pk__in=org_ids_list)
-        budgets = models.Budget.objects.filter(org_id__in=org_ids_list).order_by('name')
-        context['orgs'] = [o for o in orgs]
+        org_ids_list = set(map(int, org_ids.split(',')))
+        context['orgs'] = [o for o in lookups.get_organizations() if o.pk in org_ids_list]
+        budgets = [o for o in lookups.get_budgets() if o.org_id in org_ids_list]
     else:
-        budgets = models.Budget.objects.none()
+        budgets = []
 
     context['budgets'] = budgets
     return render(request, 'transportation/partial/budgets-dropdown.html', context)
 
 
+class DispatchView(ModeratorRequiredMixin, TemplateView):
+    """ Timeline of every vehicle's trips over a week or month, drawn from load_dispatch. """
+
+    template_name = 'transportation/dispatch.html'
+    login_url = reverse_lazy('sign-in')
+
+    def get_context_data(self, *args, **kwargs):
+        data = super().get_context_data(*args, **kwargs)
+        data['orgs'] = lookups.get_organizations()
+        data['spans'] = list(dispatch.SPANS)
+        data['statuses'] = dict(models.TripRequest.STATUS_CHOICES)
+        return data
+
+
+@moderator_required
+def load_dispatch(request, *args, **kwargs):
+    """ Dispatch board of the ``span`` (week or month) containing ``start``, for ``org`` or all. """
+    span = request.GET.get('span', 'week')
+    try:
+        day = timezone.localdate()
+        if request.GET.get('start'):
+            day = parse(request.GET['start']).date()
+        org = int(request.GET['org']) if request.GET.get('org') else None
+    except (ValueError, OverflowError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid start or org'}, status=400)
+    if span not in dispatch.SPANS:
+        message = f'span must be one of {list(dispatch.SPANS)}'
+        return JsonResponse({'status': 'error', 'message': message}, status=400)
+    start, end = dispatch.get_window(day, span)
+    return JsonResponse(dispatch.get_board(start, end, org))
+
+
 def load_drivers(request, *args, **kwargs):
     query = request.GET.get('q', None)
 
     if query is None:
         return JsonResponse([], safe=False)
 
-    qs = models.Driver.objects.filter(Q(first_name__istartswith=query) | Q(last_name__istartswith=query)).annotate(
-        full_name=Concat(
-            'first_name', Value(' '), 'last_name',
-            output_field=CharField()
-        )
-    )
-
-    data = list(qs.values('id', 'full_name'))
-
-    return JsonResponse(data, safe=False)
+    return JsonResponse(search.search_drivers(query), safe=False)
 
 
 class BudgetsView(ModeratorRequiredMixin, SingleTableMixin, FilterView):
@@ -815,6 +1021,7 @@ class OrganizationDetailView(ModeratorRequiredMixin, FilterView):
     def get_context_data(self, *args, **kwargs):
         data = super().get_context_data(*args, **kwargs)
         data['org'] = self.org
+        data['calendar_url'] = calendars.feed_url('org', self.org.pk)
         data['departments_table'] = self.departments_table_class(self.get_departments_table_data())
         data['budgets_table'] = self.budgets_table_class(self.get_budgets_table_data())
         return data
@@ -922,7 +1129,7 @@ class DriverDetailView(ModeratorRequiredMixin, FilterView):
     driver = None
 
     def get_table_data(self):
-        return self.driver.get_assigned_trips()
+        return models.TripRequest.objects.for_table().filter(driver=self.driver)
 
     def dispatch(self, request, *args, **kwargs):
         self.driver_pk = kwargs[self.driver_url_kwarg]
@@ -933,6 +1140,7 @@ class DriverDetailView(ModeratorRequiredMixin, FilterView):
     def get_context_data(self, *args, **kwargs):
         data = super().get_context_data(*args, **kwargs)
         data['driver'] = self.driver
+        data['calendar_url'] = calendars.feed_url('driver', self.driver.pk)
         data['table'] = self.table_class(self.get_table_data())
         return data
 
@@ -1090,7 +1298,7 @@ class VehicleDetailView(ModeratorRequiredMixin, SingleTableMixin, FilterView):
     paginate_by = 25
 
     table2_class = tables.TripRequestTable
-    table2_data = models.TripRequest.objects.all()
+    table2_data = models.TripRequest.objects.for_table()
     table2_filterset_class = filters.TripRequestFilter
 
     vehicle_url_kwarg = 'vehicle_pk'
@@ -1099,7 +1307,7 @@ class VehicleDetailView(ModeratorRequiredMixin, SingleTableMixin, FilterView):
 
     def get_table_data(self):
         table_data = super().get_table_data()
-        return table_data.filter(vehicle=self.vehicle)
+        return table_data.filter(vehicle=self.vehicle).order_by('date')
 
     def get_table2_data(self):
         queryset = self.table2_data
@@ -1114,7 +1322,7 @@ class VehicleDetailView(ModeratorRequiredMixin, SingleTableMixin, FilterView):
     def get_context_data(self, *args, **kwargs):
         data = super().get_context_data(*args, **kwargs)
         data['vehicle'] = self.vehicle
-        data['table'] = self.table_class(self.get_table_data().order_by('date'))
+        data['calendar_url'] = calendars.feed_url('vehicle', self.vehicle.pk)
         data['tripstable'] = self.table2_class(self.get_table2_data().order_by('depart_est'))
         return data
 
@@ -1206,7 +1414,8 @@ class UpdateVehicleMaintenanceView(ModeratorRequiredMixin, UpdateView):
         return context
 
 
-class TripRequestsView(LoginRequiredMixin, SingleTableMixin, FilterView):
+class TripRequestsView(LoginRequiredMixin, pagination.CursorPaginationMixin, SingleTableMixin,
+                       FilterView):
     """ Trip request table view. """
 
     template_name = 'transportation/requests.html'
@@ -1215,9 +1424,11 @@ class TripRequestsView(LoginRequiredMixin, SingleTableMixin, FilterView):
 
     model = models.TripRequest
     table_class = tables.TripRequestTable
-    queryset = models.TripRequest.objects.order_by('submitted')
+    queryset = models.TripRequest.objects.for_table().order_by('submitted')
     filterset_class = filters.TripRequestFilter
     paginate_by = 25
+    cursor_pagination = True
+    cursor_ordering = ('submitted', 'id')
 
 
 class CreateTripRequestView(LoginRequiredMixin, CreateView):
@@ -1243,16 +1454,7 @@ class CreateTripRequestView(LoginRequiredMixin, CreateView):
         self.object.requestor = self.request.user
 
         if self.object.requested_driver is not None and self.object.requested_driver:
-            existing_driver = models.Driver.objects.annotate(
-                full_name=Concat(
-                    'first_name', Value(' '), 'last_name',
-                    output_field=CharField()
-                )
-            ).filter(
-                Q(first_name__icontains=self.object.requested_driver) |
-                Q(last_name__icontains=self.object.requested_driver) |
-                Q(full_name__icontains=self.object.requested_driver)
-            ).first()
+            existing_driver = search.recommend_driver(self.object)
 
             if existing_driver is not None:
                 self.object.driver = existing_driver
@@ -1264,6 +1466,7 @@ class CreateTripRequestView(LoginRequiredMixin, CreateView):
                         last_name=split_fullname[1]
                     )
                     self.object.driver = new_driver
+                    self.object.recommended_driver = new_driver
                 except:
                     self.object.driver = None
 
@@ -1296,26 +1499,17 @@ class TripRequestDetailView(LoginRequiredMixin, TemplateView):
     def dispatch(self, request, *args, **kwargs):
         self.request_pk = kwargs[self.request_url_kwarg]
         kwargs.pop(self.request_url_kwarg, None)
-        self.triprequest = self.model.objects.get(pk=self.request_pk)
+        self.triprequest = self.model.objects.select_related(
+            'org', 'department', 'budget', 'requestor', 'manager',
+            'driver', 'vehicle', 'last_activity__user', 'recommended_driver'
+        ).get(pk=self.request_pk)
         return super().dispatch(request, *args, **kwargs)
 
     def get_context_data(self, *args, **kwargs):
         data = super().get_context_data(*args, **kwargs)
         data['triprequest'] = self.triprequest
 
-        existing_driver = None
-
-        if self.triprequest.requested_driver is not None and self.triprequest.requested_driver:
-            existing_driver = models.Driver.objects.annotate(
-                full_name=Concat(
-                    'first_name', Value(' '), 'last_name',
-                    output_field=CharField()
-                )
-            ).filter(
-                Q(first_name__icontains=self.triprequest.requested_driver) |
-                Q(last_name__icontains=self.triprequest.requested_driver) |
-                Q(full_name__icontains=self.triprequest.requested_driver)
-            ).first()
+        existing_driver = search.recommend_driver(self.triprequest)
 
         data['recommended_driver'] = existing_driver
 
@@ -1358,9 +1552,15 @@ class UpdateTripRequestView(LoginRequiredMixin, UpdateView):
 
         if self.request.user.is_moderator or self.request.user.is_staff or self.object.is_pending:
             response = super().post(request, *args, **kwargs)
-            if 'approve' in request.POST:
+            # Only approve what was saved, i.e. the form was valid & redirected.
+            if 'approve' in request.POST and isinstance(response, HttpResponseRedirect):
                 original_status = self.object.status
-                self.object.approve(commit=True, user=self.request.user)
+                try:
+                    self.object.approve(commit=True, user=self.request.user)
+                except ValidationError as ve:
+                    form = self.get_form()
+                    form.add_error(None, ve.messages)
+                    return self.form_invalid(form)
                 if original_status != models.TripRequest.STATUS_APPROVED:
                     email = emails.TripRequestApprovedEmail(self.object)
                     email.send()
@@ -1371,7 +1571,12 @@ class UpdateTripRequestView(LoginRequiredMixin, UpdateView):
     def form_valid(self, form):
         old_status = self.object.status
         triprequest = form.save(commit=False)
-        triprequest.save(user=self.request.user)
+        try:
+            triprequest.save(user=self.request.user)
+        except ValidationError as ve:
+            # Double booked by a trip saved since the form was validated.
+            form.add_error(None, ve.messages)
+            return self.form_invalid(form)
         self.object = triprequest
         new_status = self.object.status
 